@@ -51,6 +51,9 @@ tests_require = [
 
 if sys.version_info < (2, 7):
     install_requires.append('unittest2 >= 0.5.1')
+if sys.version_info < (3,):
+    # concurrent.futures backport, used by graph.run_dag
+    install_requires.append('futures')
 if os.name == 'nt':
     install_requires.append('colorama')
 
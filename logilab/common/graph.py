@@ -30,6 +30,12 @@ import sys
 import tempfile
 import codecs
 import errno
+import time
+from array import array
+from collections import deque
+
+from six import string_types
+from six.moves import range
 
 def escape(value):
     """Make <value> usable in a dot file."""
@@ -45,14 +51,123 @@ def target_info_from_filename(filename):
     return storedir, basename, target
 
 
+class _FormatCache(dict):
+    """dictionary of strings formatted by `format` from their key, computed
+    on lookup. At most `maxsize` strings are kept, and only those whose key
+    satisfies `cacheable`: by default text keys or (name, value) items whose
+    value is text, since 1, 1.0 and True are equal keys but aren't formatted
+    the same.
+    """
+    def __init__(self, format, maxsize=None, cacheable=None):
+        super(_FormatCache, self).__init__()
+        self.format = format
+        self.maxsize = maxsize
+        self.cacheable = cacheable
+
+    def __missing__(self, key):
+        formatted = self.format(key)
+        if self.maxsize is None or len(self) < self.maxsize:
+            if self.cacheable is not None:
+                cacheable = self.cacheable(key)
+            else:
+                cacheable = isinstance(key[-1] if type(key) is tuple else key,
+                                       string_types)
+            if cacheable:
+                self[key] = formatted
+        return formatted
+
+    def lookup(self, key):
+        """returns the string formatted from `key`, which is formatted without
+        being cached if it isn't hashable (e.g. a list)
+        """
+        try:
+            return self[key]
+        except TypeError:
+            return self.format(key)
+
+    def lookup_all(self, keys):
+        """returns the list of strings formatted from the `keys` sequence,
+        see :meth:`lookup`
+        """
+        try:
+            return list(map(self.__getitem__, keys))
+        except TypeError:
+            return list(map(self.lookup, keys))
+
+
+class GraphEmitter:
+    """Output core shared by graph writers (:class:`DotBackend` and
+    :class:`logilab.common.vcgutils.VCGPrinter`).
+
+    Text is written to `stream` by chunks of about `chunk_size` characters
+    (call :meth:`flush` once done). Formatted node ids and attributes are
+    memoized, since a graph refers to the same nodes and attribute values
+    again and again: `ids.lookup(nid)` is `nid` formatted with `id_format`,
+    see :meth:`attributes` for attributes. Unhashable node ids or attribute
+    values are formatted without being cached.
+    """
+    max_cached = 10000
+
+    def __init__(self, stream=None, chunk_size=65536, id_format='"%s"'):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.ids = _FormatCache(lambda nid: id_format % (nid,))
+        self._chunks = []
+        self._size = 0
+        self._attributes = {}
+
+    def write(self, text):
+        """buffers `text`, writing the buffer to the stream when full"""
+        self._chunks.append(text)
+        self._size += len(text)
+        if self._size >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """writes buffered text to the stream"""
+        if self._chunks:
+            self.stream.write(''.join(self._chunks))
+            self._chunks = []
+            self._size = 0
+
+    def attributes(self, format_attribute, cacheable=None):
+        """returns a dictionary mapping (name, value) items to attributes
+        formatted by `format_attribute(item)`, for at most `max_cached`
+        distinct items so that unique values (e.g. labels) don't fill the
+        memory. Only items whose value is text are cached, unless
+        `cacheable(item)` tells otherwise. Errors raised by
+        `format_attribute` are propagated.
+        """
+        try:
+            return self._attributes[format_attribute]
+        except KeyError:
+            cache = self._attributes[format_attribute] = _FormatCache(
+                format_attribute, self.max_cached, cacheable)
+            return cache
+
+
+def _dot_attribute(item):
+    return '%s="%s"' % item
+
+
 class DotBackend:
-    """Dot File backend."""
+    """Dot File backend.
+
+    Emitted lines are kept in memory until the source is generated, unless
+    they are streamed to a file (see :meth:`stream_to`) or to the renderer
+    (see :meth:`start_rendering`).
+    """
     def __init__(self, graphname, rankdir=None, size=None, ratio=None,
             charset='utf-8', renderer='dot', additionnal_param={}):
         self.graphname = graphname
         self.renderer = renderer
         self.lines = []
         self._source = None
+        self._stream = None
+        self._rendering = None
+        self._emitter = GraphEmitter()
+        self._ids = self._emitter.ids
+        self._attributes = self._emitter.attributes(_dot_attribute)
         self.emit("digraph %s {" % normalize_node_id(graphname))
         if rankdir:
             self.emit('rankdir=%s' % rankdir)
@@ -70,6 +185,9 @@ class DotBackend:
     def get_source(self):
         """returns self._source"""
         if self._source is None:
+            if self._stream is not None:
+                raise ValueError('the source of %s is being streamed'
+                                 % self.graphname)
             self.emit("}\n")
             self._source = '\n'.join(self.lines)
             del self.lines
@@ -77,6 +195,39 @@ class DotBackend:
 
     source = property(get_source)
 
+    def stream_to(self, stream):
+        """Writes lines emitted so far to `stream` (a file object accepting
+        text, e.g. opened with :func:`codecs.open`), then next ones by chunks
+        (see :class:`GraphEmitter`) instead of keeping them in memory. Call
+        :meth:`close` once the graph is complete.
+        """
+        self._emitter.stream = self._stream = stream
+        for line in self.lines:
+            self._emitter.write(line + '\n')
+        self.lines = []
+
+    def close(self):
+        """Ends the graph streamed by :meth:`stream_to` (the stream itself
+        isn't closed)
+        """
+        self._emitter.write('}\n')
+        self._emitter.flush()
+        self._emitter.stream = self._stream = None
+
+    def start_rendering(self, outputfile=None, mapfile=None):
+        """Starts the renderer and streams the graph to its standard input
+        (see :meth:`stream_to`), so that nodes and edges emitted next are
+        neither kept in memory nor written to a temporary file. Call
+        :meth:`generate` once the graph is complete to wait for the
+        rendering, arguments are the same.
+        """
+        target, outputfile, dotfile = self._output(outputfile, None)
+        if target == 'dot':
+            raise ValueError('use stream_to to write dot files')
+        process = self._spawn(target, outputfile, mapfile)
+        self._rendering = (process, outputfile)
+        self.stream_to(codecs.getwriter('utf-8')(process.stdin))
+
     def generate(self, outputfile=None, dotfile=None, mapfile=None):
         """Generates a graph file.
 
@@ -86,68 +237,117 @@ class DotBackend:
         :rtype: str
         :return: a path to the generated file
         """
-        import subprocess # introduced in py 2.4
-        name = self.graphname
+        if self._rendering is not None:
+            process, outputfile = self._rendering
+            self._rendering = None
+            self.close()
+            process.stdin.close()
+            process.wait()
+            return outputfile
+        target, outputfile, dot_sourcepath = self._output(outputfile, dotfile)
+        if target == 'dot':
+            pdot = codecs.open(dot_sourcepath, 'w', encoding='utf8')
+            pdot.write(self.source)
+            pdot.close()
+        else:
+            # the source is given on the renderer's standard input
+            process = self._spawn(target, outputfile, mapfile)
+            process.communicate(self.source.encode('utf8'))
+        return outputfile
+
+    def _output(self, outputfile, dotfile):
+        """returns the output format, the output file and the dot file path
+        (only used when the output format is dot)
+        """
+        if outputfile is None:
+            ppng, outputfile = tempfile.mkstemp(".png", self.graphname)
+            os.close(ppng)
+            return 'png', outputfile, None
+        storedir, basename, target = target_info_from_filename(outputfile)
         if not dotfile:
             # if 'outputfile' is a dot file use it as 'dotfile'
-            if outputfile and outputfile.endswith(".dot"):
+            if outputfile.endswith(".dot"):
                 dotfile = outputfile
             else:
-                dotfile = '%s.dot' % name
-        if outputfile is not None:
-            storedir, basename, target = target_info_from_filename(outputfile)
-            if target != "dot":
-                pdot, dot_sourcepath = tempfile.mkstemp(".dot", name)
-                os.close(pdot)
-            else:
-                dot_sourcepath = osp.join(storedir, dotfile)
-        else:
-            target = 'png'
-            pdot, dot_sourcepath = tempfile.mkstemp(".dot", name)
-            ppng, outputfile = tempfile.mkstemp(".png", name)
-            os.close(pdot)
-            os.close(ppng)
-        pdot = codecs.open(dot_sourcepath, 'w', encoding='utf8')
-        pdot.write(self.source)
-        pdot.close()
-        if target != 'dot':
-            if sys.platform == 'win32':
-                use_shell = True
-            else:
-                use_shell = False
-            try:
-                if mapfile:
-                    subprocess.call([self.renderer,  '-Tcmapx', '-o', mapfile, '-T', target, dot_sourcepath, '-o', outputfile],
-                                    shell=use_shell)
-                else:
-                    subprocess.call([self.renderer, '-T',  target,
-                                     dot_sourcepath, '-o',  outputfile],
-                                    shell=use_shell)
-            except OSError as e:
-                if e.errno == errno.ENOENT:
-                    e.strerror = 'File not found: {0}'.format(self.renderer)
-                    raise
-            os.unlink(dot_sourcepath)
-        return outputfile
+                dotfile = '%s.dot' % self.graphname
+        return target, outputfile, osp.join(storedir, dotfile)
+
+    def _spawn(self, target, outputfile, mapfile=None):
+        """starts the renderer, reading the source on its standard input"""
+        import subprocess
+        command = [self.renderer]
+        if mapfile:
+            command += ['-Tcmapx', '-o', mapfile]
+        command += ['-T', target, '-o', outputfile]
+        try:
+            return subprocess.Popen(command, stdin=subprocess.PIPE,
+                                    shell=sys.platform == 'win32')
+        except OSError as e:
+            if e.errno == errno.ENOENT:
+                e.strerror = 'File not found: {0}'.format(self.renderer)
+            raise
 
     def emit(self, line):
         """Adds <line> to final output."""
-        self.lines.append(line)
+        if self._stream is not None:
+            self._emitter.write(line + '\n')
+        else:
+            self.lines.append(line)
 
     def emit_edge(self, name1, name2, **props):
         """emit an edge from <name1> to <name2>.
         edge properties: see http://www.graphviz.org/doc/info/attrs.html
         """
-        attrs = ['%s="%s"' % (prop, value) for prop, value in props.items()]
-        n_from, n_to = normalize_node_id(name1), normalize_node_id(name2)
+        attrs = self._attributes.lookup_all(props.items())
+        n_from, n_to = self._ids.lookup(name1), self._ids.lookup(name2)
         self.emit('%s -> %s [%s];' % (n_from, n_to, ', '.join(sorted(attrs))) )
 
     def emit_node(self, name, **props):
         """emit a node with given properties.
         node properties: see http://www.graphviz.org/doc/info/attrs.html
         """
-        attrs = ['%s="%s"' % (prop, value) for prop, value in props.items()]
-        self.emit('%s [%s];' % (normalize_node_id(name), ', '.join(sorted(attrs))))
+        attrs = self._attributes.lookup_all(props.items())
+        self.emit('%s [%s];' % (self._ids.lookup(name), ', '.join(sorted(attrs))))
+
+def generate_graphs(jobs, max_processes=None):
+    """Renders graphs concurrently. `jobs` is an iterable of (backend,
+    outputfile) or (backend, outputfile, mapfile) tuples, `backend` being a
+    :class:`DotBackend` whose graph is complete. At most `max_processes`
+    renderers run at once (the number of CPUs by default).
+
+    Returns the list of generated files. If a rendering fails, the first
+    error is raised once the others are done.
+    """
+    import threading
+    if max_processes is None:
+        import multiprocessing
+        max_processes = multiprocessing.cpu_count()
+    pending = deque(enumerate(jobs))
+    outputfiles = [None] * len(pending)
+    errors = []
+    def render():
+        # each thread feeds and waits for a renderer at a time
+        while True:
+            try:
+                index, job = pending.popleft()
+            except IndexError:
+                return
+            backend, outputfile = job[:2]
+            mapfile = job[2] if len(job) > 2 else None
+            try:
+                outputfiles[index] = backend.generate(outputfile,
+                                                      mapfile=mapfile)
+            except Exception as error:
+                errors.append(error)
+    threads = [threading.Thread(target=render)
+               for index in range(min(max_processes, len(pending)))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return outputfiles
 
 def normalize_node_id(nid):
     """Returns a suitable DOT node id for `nid`."""
@@ -182,101 +382,743 @@ def ordered_nodes(graph):
 
     If there is some cycle in the graph, :exc:`UnorderableGraph` will be raised.
 
-    Also the given graph dict will be emptied.
+    The given graph dict is left untouched. A :class:`CompactGraph` may be
+    given as well.
     """
-    # check graph consistency
-    cycles = get_cycles(graph)
-    if cycles:
+    if isinstance(graph, CompactGraph):
+        nodes = graph.nodes
+        levels = _dependency_levels(graph.adjacency)
+        levels = dict((nodes[index], level) for index, level in levels.items())
+    else:
+        levels = _dependency_levels(graph)
+    return tuple(sorted(levels, key=lambda node: (-levels[node], node)))
+
+def _dependency_levels(graph, dependents=None, pending=None):
+    """returns a dictionary mapping each node of a dependency graph dict to its
+    level: 0 for nodes without dependencies, else one more than the highest
+    level of its dependencies. `dependents` and `pending` may be given as
+    returned by :func:`_dependents`, `pending` is then modified.
+
+    Raises :exc:`UnorderableGraph` if some nodes are missing or if there are
+    cycles in the graph.
+    """
+    # Kahn's algorithm: a node is ready once all its dependencies are
+    if dependents is None:
+        dependents, pending = _dependents(graph)
+    levels = dict.fromkeys(graph, 0)
+    ready = [node for node, count in pending.items() if not count]
+    nb_ordered = 0
+    while ready:
+        node = ready.pop()
+        nb_ordered += 1
+        level = levels[node] + 1
+        for dependent in dependents[node]:
+            if levels[dependent] < level:
+                levels[dependent] = level
+            pending[dependent] -= 1
+            if not pending[dependent]:
+                ready.append(dependent)
+    if nb_ordered < len(graph):
+        # remaining nodes are on a cycle or depend on one
+        blocked = [node for node, count in pending.items() if count]
+        cycles = get_cycles(graph, blocked)
+        if isinstance(graph, _CompactAdjacency):
+            cycles = sorted(_rotate([graph.nodes[index] for index in cycle])
+                            for cycle in cycles)
         cycles = '\n'.join([' -> '.join(cycle) for cycle in cycles])
         raise UnorderableGraph('cycles in graph: %s' % cycles)
-    vertices = set(graph)
-    to_vertices = set()
-    for edges in graph.values():
-        to_vertices |= set(edges)
-    missing_vertices = to_vertices - vertices
+    return levels
+
+def _dependents(graph):
+    """returns a dictionary mapping each node of a dependency graph dict to the
+    list of nodes depending on it, and one mapping each node to its number of
+    dependencies.
+
+    Raises :exc:`UnorderableGraph` if some nodes are missing.
+    """
+    dependents = dict((node, []) for node in graph)
+    pending = {}
+    missing_vertices = set()
+    for node, node_deps in graph.items():
+        pending[node] = len(node_deps)
+        for dep in node_deps:
+            try:
+                dependents[dep].append(node)
+            except KeyError:
+                missing_vertices.add(dep)
     if missing_vertices:
         raise UnorderableGraph('missing vertices: %s' % ', '.join(missing_vertices))
-    # order vertices
-    order = []
-    order_set = set()
-    old_len = None
-    while graph:
-        if old_len == len(graph):
-            raise UnorderableGraph('unknown problem with %s' % graph)
-        old_len = len(graph)
-        deps_ok = []
-        for node, node_deps in graph.items():
-            for dep in node_deps:
-                if dep not in order_set:
-                    break
-            else:
-                deps_ok.append(node)
-        order.append(deps_ok)
-        order_set |= set(deps_ok)
-        for node in deps_ok:
-            del graph[node]
-    result = []
-    for grp in reversed(order):
-        result.extend(sorted(grp))
-    return tuple(result)
+    return dependents, pending
+
+
+class DagRun:
+    """Outcome of :func:`run_dag`:
+
+    * `results`, dictionary mapping processed nodes to the value returned for
+      them
+    * `durations`, dictionary mapping processed nodes to the time spent
+      processing them, in seconds
+    * `errors`, dictionary mapping nodes whose processing failed to the raised
+      exception
+    * `skipped`, set of nodes which weren't processed since one of their
+      dependencies failed
+    """
+
+    def __init__(self, graph, levels):
+        self.graph = graph
+        self._levels = levels
+        self.results = {}
+        self.durations = {}
+        self.errors = {}
+        self.skipped = set()
+
+    def critical_path(self):
+        """Returns a (duration, nodes) tuple for the chain of dependent
+        processed nodes with the highest total duration, which bounds the
+        time needed to process the graph whatever the number of workers.
+        Nodes are given in processing order.
+        """
+        finish = {}
+        previous = {}
+        for node in sorted(self.durations, key=self._levels.get):
+            best = None
+            for dep in self.graph[node]:
+                if best is None or finish[dep] > finish[best]:
+                    best = dep
+            previous[node] = best
+            finish[node] = self.durations[node]
+            if best is not None:
+                finish[node] += finish[best]
+        if not finish:
+            return 0, []
+        node = max(finish, key=finish.get)
+        duration = finish[node]
+        nodes = []
+        while node is not None:
+            nodes.append(node)
+            node = previous[node]
+        nodes.reverse()
+        return duration, nodes
+
+def run_dag(graph, func, executor=None, max_workers=None):
+    """takes a dependency graph dict (see :func:`ordered_nodes`) and calls
+    `func(node)` for each node as soon as all of its dependencies have been
+    successfully processed, in parallel.
+
+    Calls are submitted to `executor`, a :class:`concurrent.futures.Executor`
+    (e.g. a process pool, `func` and nodes have then to be picklable), or to a
+    pool of `max_workers` threads by default. At most `max_workers` calls are
+    pending at once, without limit if it's None and an executor is given.
+
+    If a call raises an exception, nodes depending on it, directly or not, are
+    skipped, while other nodes are still processed. Returns a :class:`DagRun`.
+
+    If there is some cycle in the graph, :exc:`UnorderableGraph` will be raised
+    before any call.
+    """
+    from concurrent import futures # 'futures' backport on python 2
+    dependents, pending = _dependents(graph)
+    levels = _dependency_levels(graph, dependents, dict(pending))
+    run = DagRun(graph, levels)
+    ready = deque(sorted(node for node, count in pending.items() if not count))
+    own_executor = executor is None
+    if own_executor:
+        if max_workers is None:
+            import multiprocessing
+            max_workers = multiprocessing.cpu_count()
+        executor = futures.ThreadPoolExecutor(max_workers)
+    running = {}
+    try:
+        while ready or running:
+            while ready and (max_workers is None or len(running) < max_workers):
+                node = ready.popleft()
+                running[executor.submit(_timed_call, func, node)] = node
+            done = futures.wait(running, return_when=futures.FIRST_COMPLETED)[0]
+            for future in done:
+                node = running.pop(future)
+                error = future.exception()
+                if error is not None:
+                    run.errors[node] = error
+                    failed = [node]
+                    while failed:
+                        for dependent in dependents[failed.pop()]:
+                            if dependent not in run.skipped:
+                                run.skipped.add(dependent)
+                                failed.append(dependent)
+                    continue
+                run.results[node], run.durations[node] = future.result()
+                for dependent in dependents[node]:
+                    pending[dependent] -= 1
+                    if not pending[dependent] and dependent not in run.skipped:
+                        ready.append(dependent)
+    finally:
+        if own_executor:
+            executor.shutdown()
+    return run
+
+def _timed_call(func, node):
+    """returns the result of `func(node)` and the time it took"""
+    start = time.time()
+    result = func(node)
+    return result, time.time() - start
+
+
+class DynamicDAG:
+    """A dependency graph kept acyclic as edges are added, along with an order
+    of its nodes such as returned by :func:`ordered_nodes`: nodes come before
+    their dependencies.
+
+    Edges are checked and the order updated using Pearce and Kelly's
+    algorithm, which only visits nodes between both ends of the edge in the
+    current order, instead of searching cycles in the whole graph.
+    """
+
+    def __init__(self, graph=None):
+        # node -> set of its dependencies / of nodes depending on it
+        self._successors = {}
+        self._predecessors = {}
+        # nodes in order, and node -> index in this order
+        self._order = []
+        self._position = {}
+        if graph:
+            for node in ordered_nodes(graph):
+                self.add_node(node)
+            for node, node_deps in graph.items():
+                self._successors[node].update(node_deps)
+                for dep in node_deps:
+                    self._predecessors[dep].add(node)
+
+    def __len__(self):
+        return len(self._order)
+
+    def __contains__(self, node):
+        return node in self._position
+
+    def add_node(self, node):
+        """Adds `node`, without dependencies, if it's not in the graph yet"""
+        if node not in self._position:
+            self._position[node] = len(self._order)
+            self._order.append(node)
+            self._successors[node] = set()
+            self._predecessors[node] = set()
+
+    def add_edge(self, node, dep):
+        """Makes `node` depend on `dep`, adding them if needed.
+
+        If this would create a cycle, :exc:`UnorderableGraph` is raised and
+        the graph is left unchanged.
+        """
+        self.add_node(node)
+        self.add_node(dep)
+        if dep in self._successors[node]:
+            return
+        if node == dep:
+            raise UnorderableGraph('cycles in graph: %s' % node)
+        lower, upper = self._position[dep], self._position[node]
+        if lower < upper:
+            # `dep` and the nodes it depends on, up to `node`, should move
+            # after `node` and the nodes depending on it
+            forward = self._forward(dep, node, upper)
+            backward = self._backward(node, lower)
+            self._reorder(backward, forward)
+        self._successors[node].add(dep)
+        self._predecessors[dep].add(node)
+
+    def remove_edge(self, node, dep):
+        """Removes the dependency of `node` on `dep`
+        Raises a KeyError if there is no such edge
+        """
+        self._successors[node].remove(dep)
+        self._predecessors[dep].remove(node)
+
+    def _forward(self, start, node, upper):
+        """returns nodes `start` depends on, directly or not, up to the
+        `upper` position in the order, raising :exc:`UnorderableGraph` if
+        `node` is one of them
+        """
+        position = self._position
+        parents = {start: None}
+        stack = [start]
+        while stack:
+            current = stack.pop()
+            for dep in self._successors[current]:
+                if dep == node:
+                    cycle = [node]
+                    while current is not None:
+                        cycle.append(current)
+                        current = parents[current]
+                    cycle = [cycle[0]] + cycle[:0:-1]
+                    raise UnorderableGraph('cycles in graph: %s'
+                                           % ' -> '.join(map(str, cycle)))
+                if dep not in parents and position[dep] < upper:
+                    parents[dep] = current
+                    stack.append(dep)
+        return list(parents)
+
+    def _backward(self, start, lower):
+        """returns nodes depending on `start`, directly or not, down to the
+        `lower` position in the order
+        """
+        position = self._position
+        visited = set([start])
+        stack = [start]
+        while stack:
+            for dependent in self._predecessors[stack.pop()]:
+                if dependent not in visited and position[dependent] > lower:
+                    visited.add(dependent)
+                    stack.append(dependent)
+        return list(visited)
+
+    def _reorder(self, backward, forward):
+        """moves `backward` then `forward` nodes to the positions they occupy,
+        keeping the relative order of nodes of each list
+        """
+        position = self._position
+        positions = sorted(position[node] for node in backward + forward)
+        moved = sorted(backward, key=position.get)
+        moved += sorted(forward, key=position.get)
+        for index, node in zip(positions, moved):
+            position[node] = index
+            self._order[index] = node
+
+    def ordered_nodes(self):
+        """Returns a tuple of the nodes, starting with the outermost ones and
+        up to nodes without dependencies, as :func:`ordered_nodes` does (but
+        nodes of a same level aren't sorted).
+        """
+        return tuple(self._order)
+
+    def to_dict(self):
+        """Returns the graph as a dependency graph dict"""
+        return dict((node, list(node_deps))
+                    for node, node_deps in self._successors.items())
 
 
 def get_cycles(graph_dict, vertices=None):
     '''given a dictionary representing an ordered graph (i.e. key are vertices
     and values is a list of destination vertices representing edges), return a
     list of detected cycles
+
+    Each elementary cycle reachable from `vertices` (default to all vertices)
+    is given once, as a list of vertices starting with the lowest one, and the
+    list of cycles is sorted. Cycles are searched in each strongly connected
+    component using Johnson's algorithm; beware that their number may grow
+    exponentially with the size of the components, use
+    :func:`strongly_connected_components` to only check for their existence.
+
+    A :class:`CompactGraph` may be given as well.
     '''
     if not graph_dict:
         return ()
-    result = []
+    if isinstance(graph_dict, CompactGraph):
+        if vertices is not None:
+            vertices = [graph_dict.index(vertice) for vertice in vertices]
+        nodes = graph_dict.nodes
+        cycles = get_cycles(graph_dict.adjacency, vertices)
+        return sorted(_rotate([nodes[index] for index in cycle])
+                      for cycle in cycles)
+    result = set()
+    for component in strongly_connected_components(graph_dict, vertices):
+        for vertice in component:
+            if vertice in graph_dict.get(vertice, ()):
+                result.add((vertice,))
+        if len(component) > 1:
+            _get_cycles(graph_dict, component, result)
+    return sorted(list(cycle) for cycle in result)
+
+def _rotate(cycle):
+    '''returns `cycle` rotated to start with its lowest vertice'''
+    index = cycle.index(min(cycle))
+    return cycle[index:] + cycle[:index]
+
+def _get_cycles(graph_dict, component, result):
+    '''adds cycles of the strongly connected `component` of the graph, but
+    cycles of a single vertice, to the `result` set, using Johnson's algorithm
+    '''
+    components = [component]
+    while components:
+        members = set(components.pop())
+        successors = dict((vertice, _successors(graph_dict, vertice, members))
+                          for vertice in members)
+        start = min(members)
+        # vertices are blocked while on the path, and remain so until one of
+        # the vertices they lead to gets on a cycle (see _unblock)
+        blocked = set([start])
+        blocking = dict((vertice, set()) for vertice in members)
+        closed = set()
+        path = [start]
+        stack = [(start, list(successors[start]))]
+        while stack:
+            vertice, next_vertices = stack[-1]
+            if next_vertices:
+                next_vertice = next_vertices.pop()
+                if next_vertice == start:
+                    result.add(tuple(path))
+                    closed.update(path)
+                elif next_vertice not in blocked:
+                    path.append(next_vertice)
+                    stack.append((next_vertice,
+                                  list(successors[next_vertice])))
+                    closed.discard(next_vertice)
+                    blocked.add(next_vertice)
+                    continue
+            if not next_vertices:
+                if vertice in closed:
+                    _unblock(vertice, blocked, blocking)
+                else:
+                    for next_vertice in successors[vertice]:
+                        blocking[next_vertice].add(vertice)
+                stack.pop()
+                path.pop()
+        # go on with cycles of the component without the start vertice
+        members.remove(start)
+        subgraph = dict((vertice, _successors(successors, vertice, members))
+                        for vertice in members)
+        components.extend(subcomponent for subcomponent
+                          in strongly_connected_components(subgraph)
+                          if len(subcomponent) > 1)
+
+def _successors(graph_dict, vertice, members):
+    '''returns the list of distinct destinations of edges from `vertice` which
+    are in `members`, but `vertice` itself
+    '''
+    successors = []
+    seen = set([vertice])
+    for node in graph_dict.get(vertice, ()):
+        if node in members and node not in seen:
+            seen.add(node)
+            successors.append(node)
+    return successors
+
+def _unblock(vertice, blocked, blocking):
+    '''unblocks `vertice` and recursively the vertices it blocks'''
+    pending = [vertice]
+    while pending:
+        vertice = pending.pop()
+        if vertice in blocked:
+            blocked.remove(vertice)
+            pending.extend(blocking[vertice])
+            blocking[vertice].clear()
+
+def strongly_connected_components(graph_dict, vertices=None):
+    '''given a dictionary representing an ordered graph (see
+    :func:`get_cycles`), return the list of its strongly connected components
+    reachable from `vertices` (default to all vertices), each as a list of
+    vertices.
+
+    Components are given in reverse topological order: edges only go from a
+    component to itself or to the previous ones. There are cycles in the
+    graph if a component has several vertices or a vertice has an edge to
+    itself. A :class:`CompactGraph` may be given as well.
+    '''
+    if isinstance(graph_dict, CompactGraph):
+        if vertices is not None:
+            vertices = [graph_dict.index(vertice) for vertice in vertices]
+        nodes = graph_dict.nodes
+        return [[nodes[index] for index in component] for component
+                in strongly_connected_components(graph_dict.adjacency,
+                                                 vertices)]
+    # iterative version of Tarjan's algorithm
     if vertices is None:
-        vertices = graph_dict.keys()
-    for vertice in vertices:
-        _get_cycles(graph_dict, [], set(), result, vertice)
+        vertices = graph_dict
+    index = {}
+    lowlink = {}
+    stack = []
+    on_stack = set()
+    result = []
+    for root in vertices:
+        if root in index:
+            continue
+        index[root] = lowlink[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(graph_dict.get(root, ())))]
+        while work:
+            vertice, next_vertices = work[-1]
+            for next_vertice in next_vertices:
+                if next_vertice not in index:
+                    index[next_vertice] = lowlink[next_vertice] = len(index)
+                    stack.append(next_vertice)
+                    on_stack.add(next_vertice)
+                    work.append((next_vertice,
+                                 iter(graph_dict.get(next_vertice, ()))))
+                    break
+                if next_vertice in on_stack \
+                       and index[next_vertice] < lowlink[vertice]:
+                    lowlink[vertice] = index[next_vertice]
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    if lowlink[vertice] < lowlink[parent]:
+                        lowlink[parent] = lowlink[vertice]
+                if lowlink[vertice] == index[vertice]:
+                    component = []
+                    while True:
+                        node = stack.pop()
+                        on_stack.remove(node)
+                        component.append(node)
+                        if node == vertice:
+                            break
+                    result.append(component)
     return result
 
-def _get_cycles(graph_dict, path, visited, result, vertice):
-    """recursive function doing the real work for get_cycles"""
-    if vertice in path:
-        cycle = [vertice]
-        for node in path[::-1]:
-            if node == vertice:
-                break
-            cycle.insert(0, node)
-        # make a canonical representation
-        start_from = min(cycle)
-        index = cycle.index(start_from)
-        cycle = cycle[index:] + cycle[0:index]
-        # append it to result if not already in
-        if not cycle in result:
-            result.append(cycle)
-        return
-    path.append(vertice)
-    try:
-        for node in graph_dict[vertice]:
-            # don't check already visited nodes again
-            if node not in visited:
-                _get_cycles(graph_dict, path, visited, result, node)
-                visited.add(node)
-    except KeyError:
-        pass
-    path.pop()
-
 def has_path(graph_dict, fromnode, tonode, path=None):
     """generic function taking a simple graph definition as a dictionary, with
     node has key associated to a list of nodes directly reachable from it.
 
     Return None if no path exists to go from `fromnode` to `tonode`, else the
-    first path found (as a list including the destination node at last)
+    first path found by a depth first search (as a list including the
+    destination node at last). Nodes of `path` are avoided.
+
+    A :class:`CompactGraph` may be given as well.
     """
+    if isinstance(graph_dict, CompactGraph):
+        return graph_dict._search(has_path, fromnode, tonode, path)
     if path is None:
         path = []
     elif fromnode in path:
         return None
-    path.append(fromnode)
-    for destnode in graph_dict[fromnode]:
-        if destnode == tonode or has_path(graph_dict, destnode, tonode, path):
-            return path[1:] + [tonode]
-    path.pop()
+    visited = set(path)
+    visited.add(fromnode)
+    path = path + [fromnode]
+    stack = [iter(graph_dict[fromnode])]
+    while stack:
+        for destnode in stack[-1]:
+            if destnode == tonode:
+                return path[1:] + [tonode]
+            if destnode not in visited:
+                visited.add(destnode)
+                path.append(destnode)
+                stack.append(iter(graph_dict[destnode]))
+                break
+        else:
+            stack.pop()
+            path.pop()
     return None
 
+def shortest_path(graph_dict, fromnode, tonode):
+    """same as :func:`has_path` but returns a path with the least number of
+    edges, using a breadth first search
+    """
+    if isinstance(graph_dict, CompactGraph):
+        return graph_dict._search(shortest_path, fromnode, tonode)
+    parents = {fromnode: None}
+    queue = deque([fromnode])
+    while queue:
+        node = queue.popleft()
+        for destnode in graph_dict[node]:
+            if destnode == tonode:
+                path = [tonode]
+                while node != fromnode:
+                    path.append(node)
+                    node = parents[node]
+                path.reverse()
+                return path
+            if destnode not in parents:
+                parents[destnode] = node
+                queue.append(destnode)
+    return None
+
+
+class ReachabilityIndex:
+    """Index of the paths between vertices of a graph given as a dictionary
+    (see :func:`get_cycles`), built once so that :meth:`reachable` doesn't
+    search the graph. Later changes of the graph aren't taken into account.
+
+    The index is the transitive closure of the strongly connected components
+    of the graph, each storing the set of components it leads to as a bitset
+    (hence using up to C**2 / 8 bytes for C components).
+    """
+
+    def __init__(self, graph_dict):
+        components = strongly_connected_components(graph_dict)
+        # vertice -> index of its component. Components being in reverse
+        # topological order, they only lead to components of lower index
+        self._components = {}
+        for index, component in enumerate(components):
+            for vertice in component:
+                self._components[vertice] = index
+        # indexes of components holding a cycle
+        self._cyclic = set()
+        self._closure = []
+        for index, component in enumerate(components):
+            next_indexes = set()
+            for vertice in component:
+                for destnode in graph_dict.get(vertice, ()):
+                    next_indexes.add(self._components[destnode])
+            if len(component) > 1 or index in next_indexes:
+                self._cyclic.add(index)
+                next_indexes.discard(index)
+            closure = 0
+            for next_index in next_indexes:
+                closure |= self._closure[next_index] | (1 << next_index)
+            self._closure.append(closure)
+
+    def reachable(self, fromnode, tonode):
+        """Returns True if there is a path from `fromnode` to `tonode`, as
+        :func:`has_path` would find.
+        Raises a KeyError if one of the nodes isn't in the graph
+        """
+        from_index = self._components[fromnode]
+        to_index = self._components[tonode]
+        if from_index == to_index:
+            return from_index in self._cyclic
+        return to_index < from_index \
+               and bool(self._closure[from_index] >> to_index & 1)
+
+
+class CompactGraph:
+    """A read-only graph storing its edges in compressed sparse row form: node
+    ids are interned to integers, the destinations of the edges from each
+    node being stored contiguously in an array of integers, along with an
+    array of the offsets of each node's edges. This takes 4 bytes per edge
+    instead of a reference to a node id in a list per node.
+
+    It behaves as a read-only graph dict (see :func:`get_cycles`), and
+    :func:`ordered_nodes`, :func:`get_cycles`,
+    :func:`strongly_connected_components`, :func:`has_path` and
+    :func:`shortest_path` run on the integers directly when given one.
+    Nodes only found as destination of edges are nodes without edges.
+    """
+
+    def __init__(self, nodes, offsets, targets):
+        # nodes[i] is the id of the node interned to i, whose edges lead to
+        # targets[offsets[i]:offsets[i+1]]
+        self.nodes = nodes
+        self._indexes = dict((node, index) for index, node in enumerate(nodes))
+        self.offsets = offsets
+        self.targets = targets
+        self.adjacency = _CompactAdjacency(self)
+
+    @classmethod
+    def from_dict(cls, graph_dict):
+        """Returns a compact copy of a graph dict"""
+        nodes = list(graph_dict)
+        indexes = dict((node, index) for index, node in enumerate(nodes))
+        offsets = array('l', [0])
+        targets = array('i')
+        # nodes are appended while iterating when found as destination only
+        for node in nodes:
+            for destnode in graph_dict.get(node, ()):
+                try:
+                    targets.append(indexes[destnode])
+                except KeyError:
+                    targets.append(len(nodes))
+                    indexes[destnode] = len(nodes)
+                    nodes.append(destnode)
+            offsets.append(len(targets))
+        return cls(nodes, offsets, targets)
+
+    @classmethod
+    def from_edges(cls, edges, nodes=()):
+        """Returns a compact graph built from an iterable of (from node,
+        to node) tuples, without building a graph dict. Additional `nodes`,
+        possibly without edges, come first in the graph's order of nodes.
+        """
+        nodes = list(nodes)
+        indexes = dict((node, index) for index, node in enumerate(nodes))
+        sources = array('i')
+        destinations = array('i')
+        for edge in edges:
+            for node, column in zip(edge, (sources, destinations)):
+                try:
+                    column.append(indexes[node])
+                except KeyError:
+                    column.append(len(nodes))
+                    indexes[node] = len(nodes)
+                    nodes.append(node)
+        # counting sort of edges by source, keeping their order
+        offsets = array('l', [0]) * (len(nodes) + 1)
+        for source in sources:
+            offsets[source + 1] += 1
+        for index in range(len(nodes)):
+            offsets[index + 1] += offsets[index]
+        positions = offsets[:-1]
+        targets = array('i', [0]) * len(destinations)
+        for source, destination in zip(sources, destinations):
+            targets[positions[source]] = destination
+            positions[source] += 1
+        return cls(nodes, offsets, targets)
+
+    def to_dict(self):
+        """Returns the graph as a graph dict"""
+        return dict(self.items())
+
+    def index(self, node):
+        """Returns the integer `node` is interned to
+        Raises a KeyError if there is no such node
+        """
+        return self._indexes[node]
+
+    def _search(self, search, fromnode, tonode, path=None):
+        """runs a path `search` function (e.g. :func:`has_path`) on the
+        integers, returning the path found as a list of node ids
+        """
+        if tonode not in self._indexes:
+            tonode = -1
+        else:
+            tonode = self._indexes[tonode]
+        args = (self.adjacency, self._indexes[fromnode], tonode)
+        if path is not None:
+            args += ([self._indexes[node] for node in path
+                      if node in self._indexes],)
+        found = search(*args)
+        if found is None:
+            return None
+        return [self.nodes[index] for index in found]
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __iter__(self):
+        return iter(self.nodes)
+
+    def __contains__(self, node):
+        return node in self._indexes
+
+    def __getitem__(self, node):
+        nodes = self.nodes
+        return [nodes[index] for index in self.adjacency[self._indexes[node]]]
+
+    def get(self, node, default=None):
+        if node in self._indexes:
+            return self[node]
+        return default
+
+    def keys(self):
+        return list(self.nodes)
+
+    def items(self):
+        return [(node, self[node]) for node in self.nodes]
+
+
+class _CompactAdjacency:
+    """a read-only graph dict on the integers of a :class:`CompactGraph`"""
+
+    def __init__(self, graph):
+        self.nodes = graph.nodes
+        self._offsets = graph.offsets
+        self._targets = graph.targets
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __iter__(self):
+        return iter(range(len(self.nodes)))
+
+    def __contains__(self, index):
+        return 0 <= index < len(self.nodes)
+
+    def __getitem__(self, index):
+        if not 0 <= index < len(self.nodes):
+            raise KeyError(index)
+        return self._targets[self._offsets[index]:self._offsets[index + 1]]
+
+    def get(self, index, default=None):
+        if 0 <= index < len(self.nodes):
+            return self[index]
+        return default
+
+    def items(self):
+        return [(index, self[index]) for index in range(len(self.nodes))]
@@ -85,8 +85,10 @@ import pkgutil
 import types
 import weakref
 import traceback as tb
+from bisect import bisect, insort
 from os import listdir, stat
-from os.path import join, isdir, exists
+from os.path import join, isdir, islink, exists, basename
+from time import time
 from logging import getLogger
 from warnings import warn
 
@@ -97,6 +99,11 @@ from logilab.common.logging_ext import set_log_methods
 from logilab.common.decorators import classproperty
 from logilab.common.deprecation import deprecated
 
+try:
+    from os import scandir
+except ImportError: # python < 3.5
+    scandir = None
+
 
 class RegistryException(Exception):
     """Base class for registry exception."""
@@ -158,8 +165,7 @@ def _toload_info(path, extrapath, _toload=None):
         _toload = {}, []
     for fileordir in path:
         if isdir(fileordir) and exists(join(fileordir, '__init__.py')):
-            subfiles = [join(fileordir, fname) for fname in listdir(fileordir)]
-            _toload_info(subfiles, extrapath, _toload)
+            _package_toload_info(fileordir, extrapath, _toload)
         elif fileordir[-3:] == '.py':
             modname = _modname_from_path(fileordir, extrapath)
             _toload[0][modname] = fileordir
@@ -167,6 +173,45 @@ def _toload_info(path, extrapath, _toload=None):
     return _toload
 
 
+def _package_toload_info(directory, extrapath, _toload):
+    """Fill `_toload` (see :func:`_toload_info`) with modules found walking
+    down the `directory` package.
+
+    The package's module name is computed once, names of modules in the
+    directory are deduced from it.
+    """
+    pkgname = _modname_from_path(join(directory, '__init__.py'), extrapath)
+    for filepath, isdirectory, is_link in _scandir(directory):
+        if isdirectory:
+            if exists(join(filepath, '__init__.py')):
+                _package_toload_info(filepath, extrapath, _toload)
+        elif filepath[-3:] == '.py':
+            name = basename(filepath)[:-3]
+            if is_link:
+                # may be a link to a module of another package
+                modname = _modname_from_path(filepath, extrapath)
+            elif name == '__init__':
+                modname = pkgname
+            else:
+                modname = '%s.%s' % (pkgname, name)
+            _toload[0][modname] = filepath
+            _toload[1].append((filepath, modname))
+
+
+def _scandir(directory):
+    """Return an iterator on (path, is directory, is link) for each entry of
+    `directory`, using :func:`os.scandir` when available to avoid a stat per
+    entry.
+    """
+    if scandir is None:
+        for fname in listdir(directory):
+            filepath = join(directory, fname)
+            yield filepath, isdir(filepath), islink(filepath)
+    else:
+        for entry in scandir(directory):
+            yield entry.path, entry.is_dir(), entry.is_symlink()
+
+
 class RegistrableObject(object):
     """This is the base class for registrable objects which are selected
     according to a context.
@@ -229,6 +274,58 @@ class RegistrableInstance(RegistrableObject):
         super(RegistrableInstance, self).__init__()
 
 
+class _Positions(object):
+    """positions of the objects registered for an identifier, so that they
+    can be removed from their list without scanning it.
+
+    Each object has a slot, its position when slots were last numbered. Slots
+    of objects removed since then are kept sorted, so that the current position
+    of an object is its slot minus the number of removed slots before it. Slots
+    are numbered again once more objects have been removed than remain.
+    """
+    __slots__ = ('slots', 'removed')
+
+    def __init__(self, objects):
+        self.renumber(objects)
+
+    def renumber(self, objects):
+        self.slots = dict((id(obj), i) for i, obj in enumerate(objects))
+        self.removed = []
+
+    def appended(self, objects):
+        """the last object of `objects` has just been appended"""
+        self.slots[id(objects[-1])] = len(objects) - 1 + len(self.removed)
+
+    def index(self, objects, obj):
+        """return the position of `obj` (compared by identity) in `objects`, or
+        None if it isn't there
+        """
+        if len(self.slots) != len(objects):
+            # `objects` has been modified without using the registry api
+            self.renumber(objects)
+        slot = self.slots.get(id(obj))
+        if slot is None:
+            return None
+        index = slot - bisect(self.removed, slot)
+        if index < len(objects) and objects[index] is obj:
+            return index
+        self.renumber(objects)
+        return self.slots.get(id(obj))
+
+    def remove(self, objects, obj):
+        """remove `obj` (compared by identity) from `objects` and return True,
+        or return False if it isn't there
+        """
+        index = self.index(objects, obj)
+        if index is None:
+            return False
+        del objects[index]
+        insort(self.removed, self.slots.pop(id(obj)))
+        if len(self.removed) > len(objects):
+            self.renumber(objects)
+        return True
+
+
 class Registry(dict):
     """The registry store a set of implementations associated to identifier:
 
@@ -259,12 +356,18 @@ class Registry(dict):
 
     .. automethod:: select
     .. automethod:: select_or_none
+    .. automethod:: select_many
     .. automethod:: possible_objects
     .. automethod:: object_by_id
     """
     def __init__(self, debugmode):
         super(Registry, self).__init__()
         self.debugmode = debugmode
+        # (oid, objid) -> registered objects in registration order and oid ->
+        # positions of registered objects, so that unregistration and
+        # replacement don't have to scan the list of objects for an identifier
+        self._objids = {}
+        self._positions = {}
 
     def __getitem__(self, name):
         """return the registry (list of implementation objects) associated to
@@ -287,6 +390,12 @@ class Registry(dict):
         """returns a readable name for an object stored in the registry"""
         return getattr(obj, '__name__', id(obj))
 
+    def clear(self):
+        """remove all objects from this registry"""
+        super(Registry, self).clear()
+        self._objids.clear()
+        self._positions.clear()
+
     def initialization_completed(self):
         """call method __registered__() on registered objects when the callback
         is defined"""
@@ -306,27 +415,28 @@ class Registry(dict):
         assert oid, ('no explicit name supplied to register object %s, '
                      'which has no __regid__ set' % obj)
         if clear:
+            for registered in self.get(oid, ()):
+                self._objids.pop((oid, self.objid(registered)), None)
             objects = self[oid] =  []
+            self._positions[oid] = _Positions(objects)
         else:
             objects = self.setdefault(oid, [])
-        assert not obj in objects, 'object %s is already registered' % obj
+        positions = self._positions.get(oid)
+        if positions is None:
+            positions = self._positions[oid] = _Positions(objects)
+        assert positions.index(objects, obj) is None, \
+               'object %s is already registered' % obj
         objects.append(obj)
+        positions.appended(objects)
+        self._objids.setdefault((oid, self.objid(obj)), []).append(obj)
 
     def register_and_replace(self, obj, replaced):
         """remove <replaced> and register <obj>"""
-        # XXXFIXME this is a duplication of unregister()
-        # remove register_and_replace in favor of unregister + register
-        # or simplify by calling unregister then register here
         if not isinstance(replaced, string_types):
             replaced = self.objid(replaced)
         # prevent from misspelling
         assert obj is not replaced, 'replacing an object by itself: %s' % obj
-        registered_objs = self.get(obj.__regid__, ())
-        for index, registered in enumerate(registered_objs):
-            if self.objid(registered) == replaced:
-                del registered_objs[index]
-                break
-        else:
+        if self._remove(obj.__regid__, replaced) is None:
             self.warning('trying to replace %s that is not registered with %s',
                          replaced, obj)
         self.register(obj)
@@ -335,16 +445,40 @@ class Registry(dict):
         """remove object <obj> from this registry"""
         objid = self.objid(obj)
         oid = obj.__regid__
-        for registered in self.get(oid, ()):
-            # use self.objid() to compare objects because vreg will probably
-            # have its own version of the object, loaded through execfile
-            if self.objid(registered) == objid:
-                self[oid].remove(registered)
-                break
-        else:
+        if self._remove(oid, objid) is None:
             self.warning('can\'t remove %s, no id %s in the registry',
                          objid, oid)
 
+    def _remove(self, oid, objid):
+        """remove the object whose identifier is `objid` from the objects
+        registered for `oid` and return it, or None if there is no such object.
+
+        Objects are compared using :meth:`objid` and not by identity because the
+        vreg will probably have its own version of the object, loaded through
+        execfile.
+        """
+        objects = self.get(oid, [])
+        registereds = self._objids.get((oid, objid))
+        if registereds:
+            # objects sharing an identifier are removed in registration order,
+            # i.e. the first one found in the list goes first
+            registered = registereds.pop(0)
+            if not registereds:
+                del self._objids[(oid, objid)]
+            positions = self._positions.get(oid)
+            if positions is None:
+                positions = self._positions[oid] = _Positions(objects)
+            if positions.remove(objects, registered):
+                return registered
+        # not indexed (e.g. the list has been modified without using the
+        # registry's api): fall back to a linear scan
+        for index, registered in enumerate(objects):
+            if self.objid(registered) == objid:
+                del objects[index]
+                self._positions[oid] = _Positions(objects)
+                return registered
+        return None
+
     def all_objects(self):
         """return a list containing all objects in this registry.
         """
@@ -382,6 +516,55 @@ class Registry(dict):
             raise NoSelectableObject(args, kwargs, self[__oid] )
         return obj
 
+    def select_many(self, oid, contexts):
+        """return the list of the most specific objects among those with the
+        given oid according to each context of `contexts`, an iterable of
+        (args, kwargs) tuples.
+
+        Candidates are only evaluated once for contexts sharing the same key,
+        as computed by the :meth:`~Predicate.context_key` method of their
+        selectors. Contexts for which a selector answers :data:`UNCACHEABLE`
+        are always evaluated.
+
+        raise :exc:`ObjectNotFound` if there are no object with id `oid` in this
+        registry
+
+        raise :exc:`NoSelectableObject` if no object can be selected for some
+        context
+        """
+        objects = self[oid]
+        winners = {}
+        result = []
+        for args, kwargs in contexts:
+            key = self._context_key(objects, args, kwargs)
+            if key is UNCACHEABLE:
+                winner = self._select_winner(objects, args, kwargs)
+            else:
+                try:
+                    winner = winners[key]
+                except KeyError:
+                    winner = winners[key] = self._select_winner(objects, args,
+                                                                kwargs)
+            if winner is None:
+                raise NoSelectableObject(args, kwargs, objects)
+            result.append(self.selected(winner, args, kwargs))
+        return result
+
+    def _context_key(self, objects, args, kwargs):
+        """return a key identifying the given context for selection among
+        `objects`, or :data:`UNCACHEABLE` if some selector doesn't support it
+        """
+        keys = []
+        for obj in objects:
+            context_key = getattr(obj.__select__, 'context_key', None)
+            if context_key is None:
+                return UNCACHEABLE
+            key = context_key(obj, *args, **kwargs)
+            if key is UNCACHEABLE:
+                return UNCACHEABLE
+            keys.append(key)
+        return tuple(keys)
+
     def select_or_none(self, __oid, *args, **kwargs):
         """return the most specific object among those with the given oid
         according to the given context, or None if no object applies.
@@ -409,6 +592,16 @@ class Registry(dict):
         it's costly when searching objects using `possible_objects`
         (e.g. searching for hooks).
         """
+        winner = self._select_winner(objects, args, kwargs)
+        if winner is None:
+            return None
+        # return the result of calling the object
+        return self.selected(winner, args, kwargs)
+
+    def _select_winner(self, objects, args, kwargs):
+        """return the most specific object according to parameters, without
+        calling it, or None if no object apply
+        """
         score, winners = 0, None
         for obj in objects:
             objectscore = obj.__select__(obj, *args, **kwargs)
@@ -425,8 +618,7 @@ class Registry(dict):
                 # raise bare exception in debug mode
                 raise SelectAmbiguity(msg % (winners, args, kwargs.keys()))
             self.error(msg, winners, args, kwargs.keys())
-        # return the result of calling the object
-        return self.selected(winners[0], args, kwargs)
+        return winners[0]
 
     def selected(self, winner, args, kwargs):
         """override here if for instance you don't want "instanciation"
@@ -503,6 +695,11 @@ class RegistryStore(dict):
 
     .. automethod:: register_modnames
 
+    The time spent loading each module and the number of objects it registered
+    are recorded, use :meth:`load_report` to find the slowest ones.
+
+    .. automethod:: load_report
+
     For each module, by default, all compatible objects are registered
     automatically. However if some objects come as replacement of
     other objects, or have to be included only if some condition is
@@ -566,6 +763,8 @@ class RegistryStore(dict):
     def __init__(self, debugmode=False):
         super(RegistryStore, self).__init__()
         self.debugmode = debugmode
+        self._loadstats = {}
+        self._loadstack = []
 
     def reset(self):
         """clear all registries managed by this store"""
@@ -573,6 +772,9 @@ class RegistryStore(dict):
         for subdict in self.values():
             subdict.clear()
         self._lastmodifs = {}
+        # modname -> [load time, number of registered objects]
+        self._loadstats = {}
+        self._loadstack = []
 
     def __getitem__(self, name):
         """return the registry (dictionary of class objects) associated to
@@ -647,6 +849,9 @@ class RegistryStore(dict):
             self.debug("register %s in %s['%s']",
                        registry.objname(obj), registryname, oid or obj.__regid__)
             self._loadedmods.setdefault(obj.__module__, {})[registry.objid(obj)] = obj
+        stats = self._loadstats.get(obj.__module__)
+        if stats is not None:
+            stats[1] += 1
 
     def unregister(self, obj, registryname=None):
         """unregister `obj` object from the registry `registryname` or
@@ -765,8 +970,34 @@ class RegistryStore(dict):
         # load the module
         if sys.version_info < (3,) and not isinstance(modname, str):
             modname = str(modname)
-        module = __import__(modname, fromlist=modname.split('.')[:-1])
-        self.load_module(module)
+        stats = self._loadstats[modname] = [0., 0]
+        self._loadstack.append(stats)
+        start = time()
+        try:
+            module = __import__(modname, fromlist=modname.split('.')[:-1])
+            self.load_module(module)
+        finally:
+            elapsed = time() - start
+            self._loadstack.pop()
+            stats[0] += elapsed
+            if self._loadstack:
+                # don't account time spent loading this module to the module
+                # which triggered its loading
+                self._loadstack[-1][0] -= elapsed
+
+    def load_report(self, limit=10):
+        """return a list of (module name, load time in seconds, number of
+        registered objects) for the `limit` slowest modules loaded since the
+        last reset, slowest first (all loaded modules if `limit` is None).
+
+        The load time of a module includes its import and the registration of
+        its objects, but not the loading of other modules it triggered.
+        """
+        report = sorted(((modname, loadtime, nbobjects)
+                         for modname, (loadtime, nbobjects)
+                         in self._loadstats.items()),
+                        key=lambda info: info[1], reverse=True)
+        return report[:limit]
 
     def load_module(self, module):
         """Automatically handle module objects registration.
@@ -944,6 +1175,10 @@ class traced_selection(object): # pylint: disable=C0103
 
 # selector base classes and operations ########################################
 
+#: value returned by :meth:`Predicate.context_key` when the score of a predicate
+#: can't be reused from one context to another
+UNCACHEABLE = object()
+
 def objectify_predicate(selector_func):
     """Most of the time, a simple score function is enough to build a selector.
     The :func:`objectify_predicate` decorator turn it into a proper selector
@@ -1015,6 +1250,18 @@ class Predicate(object):
             return self
         return None
 
+    def context_key(self, cls, *args, **kwargs):
+        """return a hashable key identifying the parts of the context the score
+        of this predicate depends on: contexts with equal keys are expected to
+        get the same score, which may then be computed once (see
+        :meth:`Registry.select_many`).
+
+        Return :data:`UNCACHEABLE` when the score may differ for each context,
+        e.g. because it depends on the context instances themselves. This is
+        the default, predicates have to explicitly declare their key.
+        """
+        return UNCACHEABLE
+
     def __str__(self):
         return self.__class__.__name__
 
@@ -1090,6 +1337,15 @@ class MultiPredicate(Predicate):
         # if not found in children, maybe we are looking for self?
         return super(MultiPredicate, self).search_selector(selector)
 
+    def context_key(self, cls, *args, **kwargs):
+        keys = []
+        for selector in self.selectors:
+            key = selector.context_key(cls, *args, **kwargs)
+            if key is UNCACHEABLE:
+                return UNCACHEABLE
+            keys.append(key)
+        return tuple(keys)
+
 
 class AndPredicate(MultiPredicate):
     """and-chained selectors"""
@@ -1121,6 +1377,9 @@ class NotPredicate(Predicate):
         score = self.selector(cls, *args, **kwargs)
         return int(not score)
 
+    def context_key(self, cls, *args, **kwargs):
+        return self.selector.context_key(cls, *args, **kwargs)
+
     def __str__(self):
         return 'NOT(%s)' % self.selector
 
@@ -1140,6 +1399,9 @@ class yes(Predicate): # pylint: disable=C0103
     def __call__(self, *args, **kwargs):
         return self.score
 
+    def context_key(self, *args, **kwargs):
+        return ()
+
 
 # deprecated stuff #############################################################
 
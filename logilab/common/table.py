@@ -15,474 +15,2874 @@
 #
 # You should have received a copy of the GNU Lesser General Public License along
 # with logilab-common.  If not, see <http://www.gnu.org/licenses/>.
-"""Table management module."""
+"""Table management module.
+
+:class:`Table` stores its data as a list of rows. :class:`ColumnarTable`
+provides the same api while storing data by column, using compact arrays for
+columns of integers or floats, and :class:`SparseTable` while storing only
+cells whose value isn't the default one.
+
+Indexing a table gives views on its cells rather than copies:
+:class:`TableView` for sub-tables (also used for transposition),
+:class:`RowView` and :class:`ColumnView` for rows and columns.
+
+Tables may be read from and written to CSV files by chunks of rows, see
+:meth:`Table.from_csv`, :meth:`Table.iter_csv` and :meth:`Table.to_csv`. They
+may also be written in a binary format which is memory mapped when read back,
+see :meth:`Table.to_binary` and :meth:`Table.open_mmap`.
+"""
 
 from __future__ import print_function
 
-__docformat__ = "restructuredtext en"
+__docformat__ = "restructuredtext en"
+
+import csv
+import json
+import mmap
+import struct
+import sys
+from array import array
+from bisect import bisect_left, insort
+from itertools import chain, groupby, islice
+
+from six import integer_types, string_types
+from six.moves import filter, range
+
+from logilab.common.compat import StringIO
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+class Table(object):
+    """Table defines a data table with column and row names.
+    inv:
+        len(self.data) <= len(self.row_names)
+        forall(self.data, lambda x: len(x) <= len(self.col_names))
+    """
+
+    def __init__(self, default_value=0, col_names=None, row_names=None):
+        self._aggregates = []
+        self._aggregate_vectors = {}
+        self.col_names = []
+        self.row_names = []
+        self.data = []
+        self.default_value = default_value
+        if col_names:
+            self.create_columns(col_names)
+        if row_names:
+            self.create_rows(row_names)
+
+    def _next_row_name(self):
+        return 'row%s' % (len(self.row_names)+1)
+
+    # row and column names are indexed so that access by name doesn't imply a
+    # lookup in the list of names. Indexes are updated when names are
+    # appended, inserted or deleted, and rebuilt on next access when they are
+    # reordered. Lists of names should hence not be modified in place, though
+    # they may be replaced.
+
+    def _get_row_names(self):
+        return self._row_names
+    def _set_row_names(self, row_names):
+        self._row_names = row_names
+        self._row_indexes = None
+    row_names = property(_get_row_names, _set_row_names)
+
+    def _get_col_names(self):
+        return self._col_names
+    def _set_col_names(self, col_names):
+        self._col_names = col_names
+        self._col_indexes = None
+        self._value_indexes = {}
+    col_names = property(_get_col_names, _set_col_names)
+
+    def _row_index(self, row_id):
+        """Returns the index of the 'row_id' row
+        Raises a KeyError if row_id is not found
+        """
+        if self._row_indexes is None:
+            self._row_indexes = _names_index(self.row_names)
+        try:
+            return self._row_indexes[row_id]
+        except KeyError:
+            raise KeyError("Row (%s) not found in table" % (row_id))
+
+    def _col_index(self, col_id):
+        """Returns the index of the 'col_id' column
+        Raises a KeyError if col_id is not found
+        """
+        if self._col_indexes is None:
+            self._col_indexes = _names_index(self.col_names)
+        try:
+            return self._col_indexes[col_id]
+        except KeyError:
+            raise KeyError("Column (%s) not found in table" % (col_id))
+
+    def _rows_appended(self, row_names):
+        """updates the rows index after row_names have been appended"""
+        if self._row_indexes is not None:
+            index = len(self._row_names) - len(row_names)
+            for row_name in row_names:
+                self._row_indexes.setdefault(row_name, index)
+                index += 1
+
+    def _cols_appended(self, col_names):
+        """updates the columns index after col_names have been appended"""
+        if self._col_indexes is not None:
+            index = len(self._col_names) - len(col_names)
+            for col_name in col_names:
+                self._col_indexes.setdefault(col_name, index)
+                index += 1
+
+    def _row_name_inserted(self, index):
+        """updates the rows index after a row name has been inserted before
+        'index'
+        """
+        if self._row_indexes is not None:
+            _name_inserted(self._row_indexes, self._row_names, index)
+
+    def _row_name_deleted(self, index, row_name):
+        """updates the rows index after 'row_name' has been deleted from
+        'index'
+        """
+        if self._row_indexes is not None:
+            _name_deleted(self._row_indexes, self._row_names, index, row_name)
+
+    def _col_name_inserted(self, index):
+        """updates the columns index after a column name has been inserted
+        before 'index'
+        """
+        if self._col_indexes is not None:
+            _name_inserted(self._col_indexes, self._col_names, index)
+
+    def _col_name_deleted(self, index, col_name):
+        """updates the columns index after 'col_name' has been deleted from
+        'index'
+        """
+        if self._col_indexes is not None:
+            _name_deleted(self._col_indexes, self._col_names, index, col_name)
+
+    # rows may be indexed by the values of some columns (see create_index).
+    # Those indexes catch up with appended rows on next query, are updated
+    # when a cell changes or rows are inserted or deleted, and rebuilt on
+    # next query when rows are reordered. Cells should hence be modified
+    # through the table's methods. Renaming columns drops their indexes.
+
+    def _cells_changing(self, row_index, cells):
+        """updates values indexes of the columns, and aggregates of ranges
+        holding cells of the 'row_index' row, before values are stored in
+        them. `cells` are (col_index, value) tuples. Returns the aggregate
+        cells to store once they are (see _write_aggregates).
+
+        New values are checked first: nothing is updated if one can't be
+        indexed or aggregated (e.g. a string in a summed range)
+        """
+        if row_index < 0:
+            row_index += len(self)
+        ncols = len(self.col_names)
+        row_aggregates = self._aggregate_vectors.get((1, row_index), ())
+        changes = []
+        changed = []
+        totals = {}
+        for col_index, value in cells:
+            if col_index < 0:
+                col_index += ncols
+            old = self.get_cell(row_index, col_index)
+            col_name = self.col_names[col_index]
+            index = self._value_indexes.get(col_name)
+            if index is not None and self._col_index(col_name) == col_index:
+                hash(value) # raises TypeError on unhashable values
+                changes.append((index, old, value))
+            for aggregate in chain(self._aggregate_vectors.get((0, col_index),
+                                                               ()),
+                                   row_aggregates):
+                if aggregate.covers(row_index, col_index):
+                    if aggregate not in totals:
+                        totals[aggregate] = aggregate.total
+                        changed.append(aggregate)
+                    totals[aggregate] = aggregate.replaced(totals[aggregate],
+                                                           old, value)
+        for index, old, value in changes:
+            index.update(row_index, old, value)
+        for aggregate in changed:
+            aggregate.total = totals[aggregate]
+        return changed
+
+    def _column_changed(self, col_index):
+        """invalidates the values index of the 'col_index' column, if any"""
+        col_name = self.col_names[col_index]
+        if col_name in self._value_indexes:
+            self._value_indexes[col_name] = None
+
+    def _rows_moved(self):
+        """invalidates values indexes once rows have been reordered"""
+        for col_name in self._value_indexes:
+            self._value_indexes[col_name] = None
+
+    def _row_inserting(self, index, row_data):
+        """updates values indexes and aggregate cells before `row_data` is
+        inserted at 'index' (as given to list.insert), and returns aggregate
+        cells to store once it is (see _write_aggregates). Nothing is updated
+        if a value can't be indexed or aggregated
+        """
+        nrows = len(self)
+        if index < 0:
+            index = max(index + nrows, 0)
+        index = min(index, nrows)
+        values = [(values_index, row_data[self._col_index(col_name)])
+                  for col_name, values_index in self._value_indexes.items()
+                  if values_index is not None]
+        for values_index, value in values:
+            hash(value) # raises TypeError on unhashable values
+        totals = self._aggregate_totals(index, row_data.__getitem__, True)
+        for values_index, value in values:
+            values_index.insert(index, value)
+        return self._aggregate_row_inserting(index, totals)
+
+    def _index_row_deleting(self, index):
+        """updates values indexes before the row at 'index' is deleted
+        Raises an IndexError if index is out of range
+        """
+        nrows = len(self)
+        if not -nrows <= index < nrows:
+            raise IndexError('row index out of range')
+        index %= nrows
+        for col_name, values_index in self._value_indexes.items():
+            if values_index is not None:
+                values_index.delete(index, self.get_cell(
+                    index, self._col_index(col_name)))
+
+    def _cells_changed(self):
+        """invalidates values indexes and computes aggregate cells again once
+        cells may have been modified without set_cell (e.g. by stylesheet
+        rules)
+        """
+        self._rows_moved()
+        for aggregate in self._aggregates:
+            aggregate.total = aggregate.count = 0
+            for vector in self._aggregate_range(aggregate):
+                for value in vector:
+                    aggregate.add(value)
+        self._write_aggregates(self._aggregates)
+
+    def _rows_reordered(self):
+        """drops aggregate cells and invalidates values indexes once rows have
+        been reordered or replaced
+        """
+        self._drop_aggregates()
+        self._rows_moved()
+
+    def _value_index(self, col_name):
+        """returns the up to date values index of the 'col_name' column"""
+        index = self._value_indexes[col_name]
+        if index is None:
+            index = self._value_indexes[col_name] = _ValueIndex()
+        if index.nrows < len(self):
+            index.extend(self._column_values(self._col_index(col_name),
+                                             index.nrows))
+        return index
+
+    # aggregate cells (see add_aggregate_cell) are updated when a cell of
+    # their range is set and when rows are appended, inserted or deleted.
+    # They are dropped when rows are reordered or replaced, and when columns
+    # are inserted or deleted.
+
+    def _index_aggregates(self):
+        """indexes aggregate cells by the column (axis 0) or row (axis 1)
+        holding their range, once they have been added, removed or moved
+        """
+        vectors = self._aggregate_vectors = {}
+        for aggregate in self._aggregates:
+            vectors.setdefault((aggregate.axis, aggregate.index),
+                               []).append(aggregate)
+
+    def _drop_aggregates(self):
+        """drops all aggregate cells"""
+        self._aggregates = []
+        self._aggregate_vectors = {}
+
+    def _write_aggregates(self, aggregates):
+        """stores values of `aggregates` in their cells"""
+        written = set()
+        for aggregate in aggregates:
+            if aggregate not in written:
+                written.add(aggregate)
+                self.set_cell(aggregate.row, aggregate.col, aggregate.value())
+
+    def _aggregate_rows_added(self, start):
+        """updates aggregates of column ranges open to appended rows, once
+        rows from 'start' have been appended
+        """
+        changed = [aggregate for aggregate in self._aggregates
+                   if aggregate.axis == 0 and aggregate.stop is None]
+        # totals are all computed before any aggregate is updated
+        columns = [self._column_values(aggregate.index,
+                                       max(start, aggregate.start))
+                   for aggregate in changed]
+        totals = [aggregate.added(aggregate.total, column)
+                  for aggregate, column in zip(changed, columns)]
+        for aggregate, column, total in zip(changed, columns, totals):
+            aggregate.total = total
+            aggregate.count += len(column)
+        self._write_aggregates(changed)
+
+    def _aggregate_totals(self, index, value_of, inserted):
+        """returns totals of aggregates of column ranges holding the 'index'
+        row once its values (given by the `value_of` function of column
+        indexes) have been added to them if `inserted`, else removed, so that
+        they are all computed before any is updated
+        """
+        totals = {}
+        for aggregate in self._aggregates:
+            if aggregate.axis == 0 and aggregate.covers(index, aggregate.index) \
+                   and (inserted or aggregate.row != index):
+                value = value_of(aggregate.index)
+                if inserted:
+                    totals[aggregate] = aggregate.replaced(aggregate.total, 0,
+                                                           value)
+                else:
+                    totals[aggregate] = aggregate.replaced(aggregate.total,
+                                                           value, 0)
+        return totals
+
+    def _aggregate_row_inserting(self, index, totals):
+        """updates aggregate cells before a row is inserted at the positive
+        'index', given `totals` of those whose range holds it (see
+        _aggregate_totals), and returns those to store once it is
+        """
+        changed = []
+        for aggregate in self._aggregates:
+            if aggregate.row >= index:
+                aggregate.row += 1
+            if aggregate.axis == 1:
+                if aggregate.index >= index:
+                    aggregate.index += 1
+            elif index < aggregate.start:
+                aggregate.start += 1
+                if aggregate.stop is not None:
+                    aggregate.stop += 1
+            elif aggregate.stop is None or index < aggregate.stop:
+                if aggregate.stop is not None:
+                    aggregate.stop += 1
+                aggregate.total = totals[aggregate]
+                aggregate.count += 1
+                changed.append(aggregate)
+        self._index_aggregates()
+        return changed
+
+    def _aggregate_row_deleting(self, index):
+        """updates aggregate cells before the row at 'index' is deleted, and
+        returns those to store once it is (see _write_aggregates)
+        Raises an IndexError if index is out of range
+        """
+        nrows = len(self)
+        if not -nrows <= index < nrows:
+            raise IndexError('row index out of range')
+        index %= nrows
+        totals = self._aggregate_totals(
+            index, lambda col_index: self.get_cell(index, col_index), False)
+        kept = []
+        changed = []
+        for aggregate in self._aggregates:
+            if aggregate.row == index or (aggregate.axis == 1
+                                          and aggregate.index == index):
+                continue
+            if aggregate.row > index:
+                aggregate.row -= 1
+            if aggregate.axis == 1:
+                if aggregate.index > index:
+                    aggregate.index -= 1
+            else:
+                if aggregate.covers(index, aggregate.index):
+                    aggregate.total = totals[aggregate]
+                    aggregate.count -= 1
+                    changed.append(aggregate)
+                if index < aggregate.start:
+                    aggregate.start -= 1
+                if aggregate.stop is not None and index < aggregate.stop:
+                    aggregate.stop -= 1
+            kept.append(aggregate)
+        self._aggregates = kept
+        self._index_aggregates()
+        return changed
+
+    def _check_length(self, values, expected, what):
+        if len(values) != expected:
+            raise ValueError('%s should have %s values, got %s'
+                             % (what, expected, len(values)))
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __eq__(self, other):
+        if other is None:
+            return False
+        else:
+            return list(self) == list(other)
+
+    __hash__ = object.__hash__
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __len__(self):
+        return len(self.row_names)
+
+    ## Rows / Columns creation #################################################
+    def create_rows(self, row_names):
+        """Appends row_names to the list of existing rows
+        """
+        row_names = list(row_names)
+        self.row_names.extend(row_names)
+        self._rows_appended(row_names)
+        for row_name in row_names:
+            self.data.append([self.default_value]*len(self.col_names))
+        if self._aggregates:
+            self._aggregate_rows_added(len(self) - len(row_names))
+
+    def create_columns(self, col_names):
+        """Appends col_names to the list of existing columns
+        """
+        for col_name in col_names:
+            self.create_column(col_name)
+
+    def create_row(self, row_name=None):
+        """Creates a rowname to the row_names list
+        """
+        row_name = row_name or self._next_row_name()
+        self.row_names.append(row_name)
+        self._rows_appended((row_name,))
+        self.data.append([self.default_value]*len(self.col_names))
+        if self._aggregates:
+            self._aggregate_rows_added(len(self) - 1)
+
+
+    def create_column(self, col_name):
+        """Creates a colname to the col_names list
+        """
+        self.col_names.append(col_name)
+        self._cols_appended((col_name,))
+        for row in self.data:
+            row.append(self.default_value)
+
+    ## Sort by column ##########################################################
+    def sort_by_column_id(self, col_id, method = 'asc'):
+        """Sorts the table (in-place) according to data stored in col_id
+        """
+        self.sort_by_column_index(self._col_index(col_id), method)
+
+
+    def sort_by_column_index(self, col_index, method = 'asc'):
+        """Sorts the table 'in-place' according to data stored in col_index
+
+        method should be in ('asc', 'desc')
+        """
+        column = self._column_values(col_index)
+        order = []
+        rows = None
+        # rows holding equal values are sorted according to the whole rows
+        # then to their names, and the whole order is reversed for 'desc'
+        for value, group in groupby(sorted(range(len(self)),
+                                           key=column.__getitem__),
+                                    column.__getitem__):
+            group = list(group)
+            if len(group) > 1:
+                if rows is None:
+                    rows = list(zip(*[self._column_values(index)
+                                      for index in range(self.shape[1])]))
+                group.sort(key=self.row_names.__getitem__)
+                group.sort(key=rows.__getitem__)
+            order += group
+        if method.lower() == 'desc':
+            order.reverse()
+        self._permute(order)
+
+    def sort(self, keys=None, reverse=False, key=None):
+        """Sorts the table 'in-place' according to data stored in the `keys`
+        columns (given by name or index, all columns by default), the first
+        one being the most significant.
+
+        If given, `key` is a function called on each of those values, whose
+        result is compared instead of the value. The sort is stable: rows
+        comparing equal keep their order, even when `reverse` is true.
+
+        A permutation of rows indexes is sorted once per key column, least
+        significant first, without building tuples of values, then applied
+        to rows and row names.
+        """
+        ncols = self.shape[1]
+        if keys is None:
+            keys = range(ncols)
+        order = list(range(len(self)))
+        for col_id in reversed(list(keys)):
+            if isinstance(col_id, integer_types):
+                if not -ncols <= col_id < ncols:
+                    raise IndexError('column index out of range')
+                col_index = col_id % ncols
+            else:
+                col_index = self._col_index(col_id)
+            column = self._column_values(col_index)
+            if key is None:
+                sort_key = column.__getitem__
+            else:
+                sort_key = lambda index, column=column: key(column[index])
+            order.sort(key=sort_key, reverse=reverse)
+        self._permute(order)
+
+    def _permute(self, order):
+        """reorders rows so that the row at index i is the one which was at
+        index order[i]
+        """
+        self.data = list(map(self.data.__getitem__, order))
+        self.row_names = list(map(self.row_names.__getitem__, order))
+        self._rows_reordered()
+
+    def groupby(self, colname, *others):
+        """builds indexes of data
+        :returns: a :class:`GroupBy`, nested dictionaries pointing to actual
+          rows, which also computes aggregates per group
+        """
+        return GroupBy(self, (colname,) + others)
+
+    def join(self, other, on, how='inner'):
+        """Returns a new table joining rows of this table with rows of the
+        `other` table having the same values in the `on` column(s) (a column
+        name or a list of names).
+
+        The new table has the columns of this table, followed by the other
+        columns of `other`, and a row for each pair of matching rows, named
+        after the row of this table. If `how` is 'left', rows of this table
+        matching no row of `other` are kept as well, with the default value in
+        `other`'s columns.
+
+        Rows of `other` are hashed by their values in the `on` columns (or
+        its index is used, see :meth:`create_index`), then rows of this table
+        are looked up in a single pass.
+        """
+        if how not in ('inner', 'left'):
+            raise ValueError('unknown join type %r' % how)
+        if isinstance(on, string_types):
+            on = [on]
+        keys = [self._column_values(self._col_index(colname))
+                for colname in on]
+        other_keys = [other._col_index(colname) for colname in on]
+        other_cols = [col_index for col_index in range(other.shape[1])
+                      if col_index not in other_keys]
+        if len(on) == 1 and on[0] in other._value_indexes:
+            matches = other._value_index(on[0]).rows
+            keys = keys[0]
+        else:
+            matches = {}
+            for row_index, key in enumerate(zip(*[other._column_values(col)
+                                                  for col in other_keys])):
+                matches.setdefault(key, []).append(row_index)
+            keys = zip(*keys)
+        other_columns = [other._column_values(col) for col in other_cols]
+        missing = [[self.default_value] * len(other_cols)]
+        if self.shape[1]:
+            data = zip(*self._cells(slice(None), slice(None)))
+        else:
+            data = [()] * len(self)
+        rows = []
+        row_names = []
+        for row, row_name, key in zip(data, self.row_names, keys):
+            if key in matches:
+                other_rows = [[column[row_index] for column in other_columns]
+                              for row_index in matches[key]]
+            elif how == 'left':
+                other_rows = missing
+            else:
+                continue
+            for other_row in other_rows:
+                rows.append(list(row) + other_row)
+                row_names.append(row_name)
+        col_names = self.col_names + [other.col_names[col_index]
+                                      for col_index in other_cols]
+        return self._new_table(col_names, row_names, rows)
+
+    def create_index(self, colname):
+        """Indexes rows by the values of the 'colname' column, which should be
+        hashable, so that :meth:`where` and :meth:`select` don't have to scan
+        the table. The index is maintained as the table is modified.
+        """
+        self._col_index(colname)
+        self._value_indexes.setdefault(colname, None)
+
+    def drop_index(self, colname):
+        """Drops the index of the 'colname' column
+        """
+        del self._value_indexes[colname]
+
+    def where(self, **conditions):
+        """Returns a view (see :class:`TableView`) on rows whose values in
+        the columns given as keyword arguments equal the associated values.
+
+        If some of those columns are indexed (see :meth:`create_index`), only
+        rows holding the least frequent of their values are looked at.
+        """
+        checks = [(self._col_index(colname), value)
+                  for colname, value in conditions.items()]
+        candidates = None
+        for colname, value in conditions.items():
+            if colname in self._value_indexes:
+                rows = self._value_index(colname).rows.get(value, ())
+                if candidates is None or len(rows) < len(candidates):
+                    candidates = rows
+        if not checks:
+            rows = list(range(len(self)))
+        elif candidates is None:
+            columns = [self._column_values(col_index)
+                       for col_index, value in checks]
+            values = [value for col_index, value in checks]
+            rows = [row_index for row_index, row in enumerate(zip(*columns))
+                    if list(row) == values]
+        else:
+            get_cell = self.get_cell
+            rows = [row_index for row_index in candidates
+                    if all(get_cell(row_index, col_index) == value
+                           for col_index, value in checks)]
+        return TableView(self, rows=rows)
+
+    def select(self, colname, value):
+        """Returns a view (see :class:`TableView`) on rows whose value in the
+        'colname' column equals value
+        """
+        return self.where(**{colname: value})
+
+    def remove(self, colname, value):
+        """Deletes rows whose value in the 'colname' column equals value
+        """
+        col_index = self._col_index(colname)
+        kept = [index for index, row in enumerate(self.data)
+                if not row[col_index] == value]
+        self.data = [self.data[index] for index in kept]
+        self.row_names = [self.row_names[index] for index in kept]
+        self._rows_reordered()
+
+
+    ## The 'setter' part #######################################################
+    def set_cell(self, row_index, col_index, data):
+        """sets value of cell 'row_indew', 'col_index' to data
+        """
+        changed = None
+        if self._value_indexes or self._aggregates:
+            changed = self._cells_changing(row_index, [(col_index, data)])
+        self.data[row_index][col_index] = data
+        if changed:
+            self._write_aggregates(changed)
+
+
+    def set_cell_by_ids(self, row_id, col_id, data):
+        """sets value of cell mapped by row_id and col_id to data
+        Raises a KeyError if row_id or col_id are not found in the table
+        """
+        row_index = self._row_index(row_id)
+        col_index = self._col_index(col_id)
+        self.set_cell(row_index, col_index, data)
+
+
+    def set_row(self, row_index, row_data):
+        """sets the 'row_index' row
+        pre:
+            type(row_data) == types.ListType
+            len(row_data) == len(self.col_names)
+        """
+        changed = None
+        if self._value_indexes or self._aggregates:
+            changed = self._cells_changing(row_index, enumerate(row_data))
+        self.data[row_index] = row_data
+        if changed:
+            self._write_aggregates(changed)
+
+
+    def set_row_by_id(self, row_id, row_data):
+        """sets the 'row_id' column
+        pre:
+            type(row_data) == types.ListType
+            len(row_data) == len(self.row_names)
+        Raises a KeyError if row_id is not found
+        """
+        self.set_row(self._row_index(row_id), row_data)
+
+
+    def append_row(self, row_data, row_name=None):
+        """Appends a row to the table
+        pre:
+            type(row_data) == types.ListType
+            len(row_data) == len(self.col_names)
+        """
+        row_name = row_name or self._next_row_name()
+        self.row_names.append(row_name)
+        self._rows_appended((row_name,))
+        self.data.append(row_data)
+        if self._aggregates:
+            self._aggregate_rows_added(len(self.data) - 1)
+        return len(self.data) - 1
+
+    def insert_row(self, index, row_data, row_name=None):
+        """Appends row_data before 'index' in the table. To make 'insert'
+        behave like 'list.insert', inserting in an out of range index will
+        insert row_data to the end of the list
+        pre:
+            type(row_data) == types.ListType
+            len(row_data) == len(self.col_names)
+        """
+        row_name = row_name or self._next_row_name()
+        changed = None
+        if self._value_indexes or self._aggregates:
+            changed = self._row_inserting(index, row_data)
+        self.row_names.insert(index, row_name)
+        self._row_name_inserted(index)
+        self.data.insert(index, row_data)
+        if changed:
+            self._write_aggregates(changed)
+
+
+    def delete_row(self, index):
+        """Deletes the 'index' row in the table, and returns it.
+        Raises an IndexError if index is out of range
+        """
+        changed = self._aggregates and self._aggregate_row_deleting(index)
+        if self._value_indexes:
+            self._index_row_deleting(index)
+        self._row_name_deleted(index, self.row_names.pop(index))
+        row = self.data.pop(index)
+        if changed:
+            self._write_aggregates(changed)
+        return row
+
+
+    def delete_row_by_id(self, row_id):
+        """Deletes the 'row_id' row in the table.
+        Raises a KeyError if row_id was not found.
+        """
+        self.delete_row(self._row_index(row_id))
+
+
+    def set_column(self, col_index, col_data):
+        """sets the 'col_index' column
+        pre:
+            type(col_data) == types.ListType
+            len(col_data) == len(self.row_names)
+        """
+        self._column_changed(col_index)
+        if self._aggregates:
+            for row_index, cell_data in enumerate(col_data):
+                self.set_cell(row_index, col_index, cell_data)
+        else:
+            for row_index, cell_data in enumerate(col_data):
+                self.data[row_index][col_index] = cell_data
+
+
+    def set_column_by_id(self, col_id, col_data):
+        """sets the 'col_id' column
+        pre:
+            type(col_data) == types.ListType
+            len(col_data) == len(self.col_names)
+        Raises a KeyError if col_id is not found
+        """
+        self.set_column(self._col_index(col_id), col_data)
+
+
+    def append_column(self, col_data, col_name):
+        """Appends the 'col_index' column
+        pre:
+            type(col_data) == types.ListType
+            len(col_data) == len(self.row_names)
+        """
+        self.col_names.append(col_name)
+        self._cols_appended((col_name,))
+        for row_index, cell_data in enumerate(col_data):
+            self.data[row_index].append(cell_data)
+
+
+    def insert_column(self, index, col_data, col_name):
+        """Appends col_data before 'index' in the table. To make 'insert'
+        behave like 'list.insert', inserting in an out of range index will
+        insert col_data to the end of the list
+        pre:
+            type(col_data) == types.ListType
+            len(col_data) == len(self.row_names)
+        """
+        self.col_names.insert(index, col_name)
+        self._col_name_inserted(index)
+        self._drop_aggregates()
+        for row_index, cell_data in enumerate(col_data):
+            self.data[row_index].insert(index, cell_data)
+
+
+    def delete_column(self, index):
+        """Deletes the 'index' column in the table, and returns it.
+        Raises an IndexError if index is out of range
+        """
+        col_name = self.col_names.pop(index)
+        self._value_indexes.pop(col_name, None)
+        self._col_name_deleted(index, col_name)
+        self._drop_aggregates()
+        return [row.pop(index) for row in self.data]
+
+
+    def delete_column_by_id(self, col_id):
+        """Deletes the 'col_id' col in the table.
+        Raises a KeyError if col_id was not found.
+        """
+        self.delete_column(self._col_index(col_id))
+
+
+    ## The 'getter' part #######################################################
+
+    def get_shape(self):
+        """Returns a tuple which represents the table's shape
+        """
+        return len(self.row_names), len(self.col_names)
+    shape = property(get_shape)
+
+    def __getitem__(self, indices):
+        """provided for convenience: rows and columns are given by index, name
+        or slice. Sub-tables, rows and columns are returned as views on this
+        table's cells (see :class:`TableView`, :class:`RowView` and
+        :class:`ColumnView`).
+        """
+        rows, cols = None, None
+        if isinstance(indices, tuple):
+            rows = indices[0]
+            if len(indices) > 1:
+                cols = indices[1]
+        else:
+            rows = indices
+        # define row slice
+        if isinstance(rows, str):
+            rows = self._row_index(rows)
+        if not isinstance(rows, (int, slice)):
+            rows = slice(None)
+        # define col slice
+        if isinstance(cols, str):
+            cols = self._col_index(cols)
+        if not isinstance(cols, (int, slice)):
+            cols = slice(None)
+        if isinstance(rows, int):
+            if isinstance(cols, int):
+                return self.get_cell(rows, cols)
+            if cols != slice(None):
+                return RowView(TableView(self, cols=cols), rows)
+            return RowView(self, rows)
+        if isinstance(cols, int):
+            if rows != slice(None):
+                return ColumnView(TableView(self, rows=rows), cols)
+            return ColumnView(self, cols)
+        return TableView(self, rows, cols)
+
+    def get_cell(self, row_index, col_index):
+        """Returns the element at [row_index][col_index]
+        """
+        return self.data[row_index][col_index]
+
+    def get_cell_by_ids(self, row_id, col_id):
+        """Returns the element at [row_id][col_id]
+        """
+        return self.get_cell(self._row_index(row_id), self._col_index(col_id))
+
+    def get_row_by_id(self, row_id):
+        """Returns the 'row_id' row
+        """
+        return self.data[self._row_index(row_id)]
+
+    def get_column_by_id(self, col_id, distinct=False):
+        """Returns the 'col_id' col
+        """
+        return self.get_column(self._col_index(col_id), distinct)
+
+    def get_columns(self):
+        """Returns all the columns in the table
+        """
+        return [self.get_column(index) for index in range(len(self.col_names))]
+
+    def get_column(self, col_index, distinct=False):
+        """get a column by index"""
+        col = [row[col_index] for row in self.data]
+        if distinct:
+            col = list(set(col))
+        return col
+
+    def apply_stylesheet(self, stylesheet):
+        """Applies the stylesheet to this table
+        """
+        cells_changed = False
+        for instruction in stylesheet.instructions:
+            if callable(instruction):
+                instruction(self)
+            else:
+                eval(instruction)
+                # the rule may have written cells without set_cell
+                cells_changed = cells_changed or 'data' in instruction.co_names
+        if cells_changed:
+            self._cells_changed()
+
+    def _as_slice(self, index, index_of):
+        """returns a slice for `index`, which may be None (everything), an
+        integer, a name (given to `index_of`) or a slice
+        """
+        if index is None:
+            return slice(None)
+        if isinstance(index, string_types):
+            index = index_of(index)
+        if isinstance(index, int):
+            return slice(index, index + 1 or None)
+        return index
+
+    def _cells(self, rows, cols):
+        """returns the list of columns of the block of cells selected by the
+        `rows` and `cols` slices, each as a sequence of values
+        """
+        data = self.data[rows]
+        return [[row[col_index] for row in data]
+                for col_index in range(*cols.indices(self.shape[1]))]
+
+    def _column_values(self, col_index, start=0):
+        """returns the sequence of values of the 'col_index' column, from the
+        'start' row
+        """
+        if col_index < 0:
+            col_index += self.shape[1]
+        return self._cells(slice(start, None),
+                           slice(col_index, col_index + 1))[0]
+
+    def _new_table(self, col_names, row_names, rows):
+        """returns a new table of the same class as this one, holding `rows`
+        """
+        table = self.__class__(default_value=self.default_value,
+                               col_names=col_names)
+        table.row_names = row_names
+        table.data = rows
+        return table
+
+    def aggregate(self, func, rows=None, cols=None, axis=None):
+        """Returns the aggregate of the cells selected by `rows` and `cols`
+        (each may be an index, a name, a slice or None for all of them).
+
+        `func` is the name of an aggregate function, see :data:`AGGREGATES`
+        (e.g. 'sum', 'avg', 'min', 'max', 'count', 'median'), or a function
+        taking a list of sequences of values (see :func:`percentile`).
+
+        If `axis` is None, a single value is returned for the whole block of
+        cells, else a list with a value per column (`axis` = 0) or per row
+        (`axis` = 1).
+        """
+        if not callable(func):
+            func = AGGREGATES[func]
+        columns = self._cells(self._as_slice(rows, self._row_index),
+                              self._as_slice(cols, self._col_index))
+        if axis is None:
+            return func(columns)
+        if axis == 0:
+            return [func([column]) for column in columns]
+        return [func([row]) for row in zip(*columns)]
+
+    def add_aggregate_cell(self, dest_cell, func, rows=None, cols=None):
+        """Stores in the cell at `dest_cell` (a (row, col) tuple of indexes or
+        names) the aggregate of a range of cells, and keeps it up to date: it
+        is updated in constant time when a cell of the range is set and when
+        rows are appended, inserted or deleted, instead of being computed
+        again over the whole range as stylesheets do.
+
+        `func` is 'sum', 'avg' or 'count'. The range is a part of a column
+        when `cols` is an index or a name and `rows` a slice, or None for all
+        rows including rows appended later. It is a part of a row when `rows`
+        is an index or a name and `cols` a slice, or None for all columns.
+        The aggregate cell may be in the range of other aggregate cells, but
+        not in its own.
+
+        Aggregate cells and their ranges follow rows inserted or deleted
+        before them. An aggregate cell is dropped when its row or the row it
+        aggregates is deleted, and all of them are when rows are reordered or
+        replaced (e.g. by :meth:`sort` or :meth:`remove`) or when columns are
+        inserted or deleted. Beware that rounding errors accumulate in sums
+        of floats.
+        """
+        if func not in ('sum', 'avg', 'count'):
+            raise ValueError("func should be 'sum', 'avg' or 'count', got %r"
+                             % (func,))
+        nrows, ncols = self.shape
+        row = self._position(dest_cell[0], self._row_index, nrows)
+        col = self._position(dest_cell[1], self._col_index, ncols)
+        if cols is not None and not isinstance(cols, slice) \
+               and not isinstance(rows, integer_types + string_types):
+            axis, index = 0, self._position(cols, self._col_index, ncols)
+            span, size = rows, nrows
+        elif rows is not None and not isinstance(rows, slice) \
+               and not isinstance(cols, integer_types + string_types):
+            axis, index = 1, self._position(rows, self._row_index, nrows)
+            span, size = cols, ncols
+        else:
+            raise ValueError('one of rows and cols should be an index or a '
+                             'name, the other a slice or None')
+        span = span or slice(None)
+        if span.step not in (None, 1):
+            raise ValueError("aggregate cells don't support slice steps")
+        start, stop = span.indices(size)[:2]
+        if axis == 0 and span.stop is None:
+            stop = None
+        aggregate = _AggregateCell(func, row, col, axis, index, start, stop)
+        # check the aggregate cell isn't in its own range, directly or
+        # through other aggregate cells
+        aggregates = self._aggregates + [aggregate]
+        pending = [aggregate]
+        while pending:
+            dest = pending.pop()
+            for other in aggregates:
+                if other.covers(dest.row, dest.col):
+                    if other is aggregate:
+                        raise ValueError('aggregate cell %s is in its own '
+                                         'range' % (dest_cell,))
+                    pending.append(other)
+        for vector in self._aggregate_range(aggregate):
+            for value in vector:
+                aggregate.add(value)
+        self._aggregates.append(aggregate)
+        self._index_aggregates()
+        self._write_aggregates([aggregate])
+
+    def _aggregate_range(self, aggregate):
+        """returns the cells in the range of `aggregate` (see _cells)"""
+        span = slice(aggregate.start, aggregate.stop)
+        index = slice(aggregate.index, aggregate.index + 1)
+        if aggregate.axis == 0:
+            return self._cells(span, index)
+        return self._cells(index, span)
+
+    def remove_aggregate_cell(self, dest_cell):
+        """Stops updating the aggregate cell at `dest_cell` (a (row, col)
+        tuple of indexes or names), which keeps its last value.
+        Raises a KeyError if there is no aggregate cell there
+        """
+        nrows, ncols = self.shape
+        row = self._position(dest_cell[0], self._row_index, nrows)
+        col = self._position(dest_cell[1], self._col_index, ncols)
+        for aggregate in self._aggregates:
+            if aggregate.row == row and aggregate.col == col:
+                self._aggregates.remove(aggregate)
+                self._index_aggregates()
+                return
+        raise KeyError('no aggregate cell at %s' % (dest_cell,))
+
+    def _position(self, index, index_of, size):
+        """returns the positive index of a row or column given by its index or
+        name (given to `index_of`) in a range of `size` rows or columns
+        Raises an IndexError if index is out of range
+        """
+        if not isinstance(index, integer_types):
+            return index_of(index)
+        if not -size <= index < size:
+            raise IndexError('index %s out of range' % index)
+        return index % size
+
+
+    def transpose(self):
+        """Keeps the self object intact, and returns the transposed (rotated)
+        table, as a view on this table's cells (use its `copy` method to get an
+        independent table).
+        """
+        return TableView(self, transposed=True)
+
+    def copy(self):
+        """Returns a copy of this table, sharing no data with it
+        """
+        table = self.__class__(default_value=self.default_value)
+        table.col_names = list(self.col_names)
+        table.row_names = list(self.row_names)
+        table.data = [list(row) for row in self.data]
+        return table
+
+    def _extend(self, columns, row_names):
+        """appends rows whose values are given by column"""
+        self.row_names.extend(row_names)
+        self._rows_appended(row_names)
+        if columns:
+            self.data.extend([list(row) for row in zip(*columns)])
+        else:
+            self.data.extend([[] for row_name in row_names])
+        if self._aggregates:
+            self._aggregate_rows_added(len(self) - len(row_names))
+
+    ## CSV import / export #####################################################
+    @classmethod
+    def from_csv(cls, stream, chunk_rows=10000, row_names=False, types=None,
+                 **fmtparams):
+        """Returns a new table holding rows read from `stream` (a file object
+        as expected by the :mod:`csv` module) by chunks of `chunk_rows` rows.
+
+        The first line holds the names of the columns. If `row_names` is
+        true, the first field of each line holds the name of the row, else
+        rows are named 'row1', 'row2', etc. Extra keyword arguments are given
+        to :func:`csv.reader`, e.g. `delimiter='\t'` for TSV files.
+
+        `types` is an optional list of functions converting fields of each
+        column (e.g. `[str, int, float]`). By default, fields of a column are
+        converted to integers if they all are, else to floats if they all
+        are, else kept as strings. Fields are then all read before being
+        converted.
+        """
+        chunks = list(_csv_chunks(stream, chunk_rows, row_names, types,
+                                  fmtparams))
+        if not chunks:
+            return cls()
+        col_names, names, columns, converters = chunks[0]
+        _convert_csv_columns([chunk[2] for chunk in chunks], converters,
+                             types is None)
+        table = cls(col_names=col_names)
+        # release chunks as they are stored in the table
+        chunks.reverse()
+        while chunks:
+            col_names, names, columns, converters = chunks.pop()
+            table._extend(columns, names)
+        return table
+
+    @classmethod
+    def iter_csv(cls, stream, chunk_rows=10000, row_names=False, types=None,
+                 **fmtparams):
+        """Iterates on tables holding successive chunks of at most
+        `chunk_rows` rows read from `stream`, so that files larger than the
+        available memory may be processed. Arguments are the same as for
+        :meth:`from_csv`, but types of columns are inferred chunk by chunk:
+        once a column has been kept as floats or strings, it is in the
+        following chunks as well.
+        """
+        for col_names, names, columns, converters in _csv_chunks(
+                stream, chunk_rows, row_names, types, fmtparams):
+            _convert_csv_columns([columns], converters, types is None)
+            table = cls(col_names=col_names)
+            table._extend(columns, names)
+            yield table
+
+    def to_csv(self, stream, chunk_rows=10000, row_names=False, **fmtparams):
+        """Writes the table to `stream` (a file object as expected by the
+        :mod:`csv` module), `chunk_rows` rows at a time.
+
+        The first line holds the names of the columns. If `row_names` is
+        true, the name of each row is written as the first field of its line.
+        Extra keyword arguments are given to :func:`csv.writer`.
+        """
+        writer = csv.writer(stream, **fmtparams)
+        header = list(self.col_names)
+        if row_names:
+            header.insert(0, '')
+        writer.writerow(header)
+        rows = self._iter_rows(chunk_rows)
+        if row_names:
+            names = self.row_names
+            rows = ((names[row_index],) + row
+                    for row_index, row in enumerate(rows))
+        writer.writerows(rows)
+
+    ## Binary format ###########################################################
+    def to_binary(self, path):
+        """Writes the table to the file at `path` in a binary format which may
+        be memory mapped by :meth:`open_mmap`: a header holding names and
+        types, followed by a block of fixed-width values for each column.
+
+        Columns should hold only integers (stored on 64 bits), only floats or
+        only strings (stored in UTF-8 and padded with null bytes to the longest
+        one), else TypeError is raised, or OverflowError for integers which
+        don't fit in 64 bits. Row names should be strings as well.
+        """
+        _write_binary(path, self)
+
+    @classmethod
+    def open_mmap(cls, path):
+        """Returns a read-only :class:`MmapTable` on the file at `path`,
+        written by :meth:`to_binary`.
+        """
+        return MmapTable(path)
+
+
+    def _iter_rows(self, chunk_rows=10000):
+        """iterates on rows as tuples of values, reading cells `chunk_rows`
+        rows at a time
+        """
+        ncols = self.shape[1]
+        for start in range(0, len(self), chunk_rows):
+            rows = slice(start, start + chunk_rows)
+            if ncols:
+                for row in zip(*self._cells(rows, slice(None))):
+                    yield row
+            else:
+                for row_name in self.row_names[rows]:
+                    yield ()
+
+    def pprint(self):
+        """returns a string representing the table in a pretty
+        printed 'text' format.
+        """
+        stream = StringIO()
+        self.write_pprint(stream)
+        return stream.getvalue()
+
+    def write_pprint(self, stream, sample_rows=None):
+        """Writes the table to `stream` in the pretty printed 'text' format of
+        :meth:`pprint`, a line at a time.
+
+        The width of the frame is computed by a first pass over the cells, or
+        over the first `sample_rows` rows only if given, in which case longer
+        lines of next rows overflow the frame.
+        """
+        # The maximum row name (to know the start_index of the first col)
+        max_row_name = 0
+        for row_name in self.row_names:
+            if len(row_name) > max_row_name:
+                max_row_name = len(row_name)
+        col_start = max_row_name + 5
+        # minimal width of cells of each column
+        widths = [len(col_name) + 5 for col_name in self.col_names]
+        # The 'first' line <=> the col_names one, starting with an empty cell
+        header = '|' + '|'.join([' '*col_start] +
+                                [col_name + ' '*5
+                                 for col_name in self.col_names]) + '|'
+        # Frame width: length of the longest line
+        max_line_length = len(header)
+        base_length = col_start + len(widths) + 2
+        for row_index, row in enumerate(self._iter_rows()):
+            if sample_rows is not None and row_index >= sample_rows:
+                break
+            line_length = base_length + sum(map(max, widths,
+                                                map(len, map(str, row))))
+            if line_length > max_line_length:
+                max_line_length = line_length
+        frame = '-'*max_line_length
+        stream.write(frame + '\n' + header + '\n')
+        row_names = self.row_names
+        for row_index, row in enumerate(self._iter_rows()):
+            row_name = row_names[row_index]
+            line = [row_name + ' '*(col_start-len(row_name))]
+            for width, cell in zip(widths, row):
+                data = str(cell)
+                line.append(data + ' '*(width - len(data)))
+            stream.write('|' + '|'.join(line) + '|\n')
+        stream.write(frame)
+
+
+    def __repr__(self):
+        return repr(self.data)
+
+    def as_text(self):
+        stream = StringIO()
+        self.write_text(stream)
+        return stream.getvalue()
+
+    def write_text(self, stream):
+        """Writes the table to `stream` in the tab separated format of
+        :meth:`as_text`, a line at a time.
+        """
+        for row_index, row in enumerate(self._iter_rows()):
+            if row_index:
+                stream.write('\n')
+            stream.write('\t'.join([str(cell) for cell in row]))
+
+
+
+def _names_index(names):
+    """returns a dictionary mapping each name of `names` to the index of its
+    first occurrence
+    """
+    # iterate backward so that the first occurrence wins
+    return dict(zip(reversed(names), range(len(names) - 1, -1, -1)))
+
+def _name_inserted(indexes, names, index):
+    """updates `indexes`, as built by _names_index, once a name has been
+    inserted in `names` before `index` (as given to list.insert)
+    """
+    size = len(names) - 1
+    if index < 0:
+        index = max(index + size, 0)
+    index = min(index, size)
+    # names after the inserted one moved forward: iterate backward so that
+    # only the first occurrence of each name is moved
+    for position in range(size, index, -1):
+        name = names[position]
+        if indexes.get(name) == position - 1:
+            indexes[name] = position
+    name = names[index]
+    if indexes.get(name, index) >= index:
+        indexes[name] = index
+
+def _name_deleted(indexes, names, index, name):
+    """updates `indexes`, as built by _names_index, once `name` has been
+    deleted from `names` at `index`
+    """
+    if index < 0:
+        index += len(names) + 1
+    if indexes.get(name) == index:
+        # its next occurrence, if any, is found below
+        del indexes[name]
+    for position in range(index, len(names)):
+        other = names[position]
+        first = indexes.get(other)
+        if first is None or first == position + 1:
+            indexes[other] = position
+
+
+class GroupBy(dict):
+    """Rows of a table grouped by the values of some of its columns, see
+    :meth:`Table.groupby`.
+
+    It is a dictionary mapping values of the first grouping column to
+    nested dictionaries for the next ones, down to tables holding the rows
+    of each group. Use :meth:`agg` to compute aggregates per group, which
+    are read from the rows of the grouped table.
+    """
+
+    def __init__(self, table, colnames):
+        dict.__init__(self)
+        self.table = table
+        self.colnames = colnames
+        self._col_indexes = col_indexes = [table._col_index(col_id)
+                                           for col_id in colnames]
+        # gather rows of each group before building its table
+        groups = {}
+        keys = []
+        for row in table.data:
+            key = tuple([row[col_index] for col_index in col_indexes])
+            try:
+                groups[key].append(tuple(row))
+            except KeyError:
+                groups[key] = [tuple(row)]
+                keys.append(key)
+        for key in keys:
+            ptr = self
+            for value in key[:-1]:
+                ptr = ptr.setdefault(value, {})
+            rows = groups[key]
+            group = Table(default_value=table.default_value,
+                          col_names=table.col_names)
+            group.row_names = ['row%s' % (index + 1)
+                               for index in range(len(rows))]
+            group.data = rows
+            ptr[key[-1]] = group
+
+    def agg(self, *aggregates):
+        """Returns a new table with a row per group, holding values of the
+        grouping columns followed by the given aggregates, in order of first
+        appearance of the groups.
+
+        Each aggregate is a (colname, func) tuple, where func is the name of
+        an aggregate function (see :data:`AGGREGATES`) or a function taking a
+        list of sequences of values (see :func:`percentile`). The resulting
+        column is named `<func>_<colname>`, e.g. 'sum_usage'.
+
+        Rows are read once: sums, counts, averages, minimums and maximums are
+        computed progressively, other aggregates get the values of each group.
+        """
+        table = self.table
+        nkeys = len(self._col_indexes)
+        col_indexes = self._col_indexes + [table._col_index(colname)
+                                           for colname, func in aggregates]
+        factories = []
+        col_names = list(self.colnames)
+        for colname, func in aggregates:
+            if callable(func):
+                factories.append(lambda func=func: _Accumulator(func))
+                col_names.append('%s_%s' % (func.__name__, colname))
+            else:
+                factories.append(_ACCUMULATORS.get(func)
+                                 or (lambda func=func:
+                                     _Accumulator(AGGREGATES[func])))
+                col_names.append('%s_%s' % (func, colname))
+        groups = {}
+        keys = []
+        columns = [table._column_values(col_index)
+                   for col_index in col_indexes]
+        for row in zip(*columns):
+            key = row[:nkeys]
+            try:
+                accumulators = groups[key]
+            except KeyError:
+                accumulators = groups[key] = [factory()
+                                              for factory in factories]
+                keys.append(key)
+            for accumulator, value in zip(accumulators, row[nkeys:]):
+                accumulator.add(value)
+        rows = [list(key) + [accumulator.result()
+                             for accumulator in groups[key]]
+                for key in keys]
+        row_names = ['row%s' % (index + 1) for index in range(len(rows))]
+        return table._new_table(col_names, row_names, rows)
+
+
+class _ValueIndex(object):
+    """index of the rows of a table by the values of one of its columns"""
+    __slots__ = ('rows', 'nrows')
+
+    def __init__(self):
+        # value -> sorted list of indexes of the rows holding it
+        self.rows = {}
+        # number of rows indexed so far
+        self.nrows = 0
+
+    def extend(self, values):
+        """indexes values of rows appended to the table"""
+        rows = self.rows
+        for row_index, value in enumerate(values, self.nrows):
+            try:
+                rows[value].append(row_index)
+            except KeyError:
+                rows[value] = [row_index]
+        self.nrows += len(values)
+
+    def update(self, row_index, old, new):
+        """moves the 'row_index' row from the rows of 'old' to those of 'new'
+        """
+        if row_index >= self.nrows:
+            return
+        rows = self.rows[old]
+        rows.remove(row_index)
+        if not rows:
+            del self.rows[old]
+        insort(self.rows.setdefault(new, []), row_index)
+
+    def insert(self, row_index, value):
+        """indexes 'value' of a row inserted at 'row_index', after the
+        following rows have been moved down
+        """
+        if row_index > self.nrows:
+            return
+        # raises TypeError on unhashable values before rows are moved
+        value_rows = self.rows.setdefault(value, [])
+        for rows in self.rows.values():
+            _shift(rows, row_index, 1)
+        insort(value_rows, row_index)
+        self.nrows += 1
+
+    def delete(self, row_index, value):
+        """drops 'value' of the deleted 'row_index' row, and moves the
+        following rows up
+        """
+        if row_index >= self.nrows:
+            return
+        rows = self.rows[value]
+        del rows[bisect_left(rows, row_index)]
+        if not rows:
+            del self.rows[value]
+        for rows in self.rows.values():
+            _shift(rows, row_index, -1)
+        self.nrows -= 1
+
+
+def _shift(rows, row_index, offset):
+    """adds 'offset' to indexes of the sorted 'rows' list from 'row_index'"""
+    start = bisect_left(rows, row_index)
+    if start < len(rows):
+        rows[start:] = [index + offset for index in rows[start:]]
+
+
+def _csv_chunks(stream, chunk_rows, row_names, types, fmtparams):
+    """reads `stream` as a CSV file and yields (col_names, row_names, columns)
+    for each chunk of `chunk_rows` rows, along with the list of functions
+    converting values of each column given `types` (see _convert_csv_columns
+    and :meth:`Table.from_csv`). Values are yielded as strings
+    """
+    reader = csv.reader(stream, **fmtparams)
+    try:
+        col_names = next(reader)
+    except StopIteration:
+        return
+    if row_names:
+        col_names = col_names[1:]
+    width = len(col_names) + bool(row_names)
+    if types is None:
+        converters = [int] * len(col_names)
+    else:
+        converters = list(types)
+        if len(converters) != len(col_names):
+            raise ValueError('types should have %s functions, got %s'
+                             % (len(col_names), len(converters)))
+    def check(row):
+        """tells whether `row` isn't a blank line, which are skipped"""
+        if len(row) != width and row:
+            raise ValueError('line %s should have %s fields, got %s'
+                             % (reader.line_num, width, len(row)))
+        return row
+    lines = filter(check, reader)
+    nrows = 0
+    while True:
+        rows = list(islice(lines, chunk_rows))
+        if not rows:
+            return
+        columns = [list(column) for column in zip(*rows)]
+        if row_names:
+            names = columns.pop(0)
+        else:
+            names = ['row%s' % index
+                     for index in range(nrows + 1, nrows + len(rows) + 1)]
+        nrows += len(rows)
+        yield col_names, names, columns, converters
+
+def _convert_csv_columns(chunks, converters, infer):
+    """converts in place values of the columns of `chunks` (lists of columns
+    of successive rows) using functions in `converters`. If `infer` is true,
+    an int converter is replaced by float and a float one by str as soon as
+    a value doesn't fit, and values of the column are converted again in all
+    `chunks`.
+    """
+    for col_index, convert in enumerate(converters):
+        while convert is not str:
+            try:
+                values = [[convert(value) for value in columns[col_index]]
+                          for columns in chunks]
+            except ValueError:
+                if not infer:
+                    raise
+                convert = converters[col_index] = (float if convert is int
+                                                   else str)
+            else:
+                for columns, column in zip(chunks, values):
+                    columns[col_index] = column
+                break
+
+
+## Aggregates ################################################################
+
+# aggregate functions take a list of sequences of values (e.g. columns). Arrays
+# of floats are handed to numpy when it's available; arrays of integers aren't
+# since numpy would silently overflow.
+
+def _numpy_array(values):
+    """returns a numpy array on `values` if it's an array of floats and numpy
+    is available, else None
+    """
+    if numpy is not None and isinstance(values, array) \
+           and values.typecode == 'd':
+        return numpy.frombuffer(values, 'd')
+    return None
+
+def _sum(vectors):
+    total = 0
+    for values in vectors:
+        nparray = _numpy_array(values)
+        if nparray is not None:
+            total += nparray.sum().item()
+        else:
+            total += sum(values)
+    return total
+
+def _count(vectors):
+    return sum(len(values) for values in vectors)
+
+def _avg(vectors):
+    count = _count(vectors)
+    if not count:
+        return None
+    return _sum(vectors) / float(count)
+
+def _min(vectors):
+    vectors = [values for values in vectors if len(values)]
+    if not vectors:
+        return None
+    return min(min(values) for values in vectors)
+
+def _max(vectors):
+    vectors = [values for values in vectors if len(values)]
+    if not vectors:
+        return None
+    return max(max(values) for values in vectors)
+
+def percentile(percent):
+    """returns an aggregate function computing the given percentile (between 0
+    and 100) of values, interpolating linearly between closest values.
+    """
+    def _percentile(vectors):
+        if numpy is not None and vectors \
+               and all(isinstance(values, array) for values in vectors):
+            values = numpy.concatenate([numpy.asarray(values)
+                                        for values in vectors])
+            if not len(values):
+                return None
+            return numpy.percentile(values, percent).item()
+        values = sorted(chain(*vectors))
+        if not values:
+            return None
+        rank = (len(values) - 1) * percent / 100.
+        lower = int(rank)
+        if lower == rank:
+            return values[lower]
+        return values[lower] + (values[lower + 1] - values[lower]) * (rank - lower)
+    _percentile.__name__ = 'percentile%s' % percent
+    return _percentile
+
+#: aggregate functions available by name to :meth:`Table.aggregate`
+AGGREGATES = {
+    'sum': _sum,
+    'avg': _avg,
+    'min': _min,
+    'max': _max,
+    'count': _count,
+    'median': percentile(50),
+    }
+
+
+# accumulators compute an aggregate from values given one by one (see
+# GroupBy.agg)
+
+class _Accumulator(object):
+    """keeps values to compute an aggregate function on them at once"""
+    __slots__ = ('func', 'values')
+
+    def __init__(self, func):
+        self.func = func
+        self.values = []
+
+    def add(self, value):
+        self.values.append(value)
+
+    def result(self):
+        return self.func([self.values])
+
+class _SumAccumulator(object):
+    __slots__ = ('total',)
+
+    def __init__(self):
+        self.total = 0
+
+    def add(self, value):
+        self.total += value
+
+    def result(self):
+        return self.total
+
+class _CountAccumulator(object):
+    __slots__ = ('count',)
+
+    def __init__(self):
+        self.count = 0
+
+    def add(self, value):
+        self.count += 1
+
+    def result(self):
+        return self.count
+
+class _AvgAccumulator(object):
+    __slots__ = ('total', 'count')
+
+    def __init__(self):
+        self.total = 0
+        self.count = 0
+
+    def add(self, value):
+        self.total += value
+        self.count += 1
+
+    def result(self):
+        if not self.count:
+            return None
+        return self.total / float(self.count)
+
+class _MinAccumulator(object):
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = None
+
+    def add(self, value):
+        if self.value is None or value < self.value:
+            self.value = value
+
+    def result(self):
+        return self.value
+
+class _MaxAccumulator(_MinAccumulator):
+    __slots__ = ()
+
+    def add(self, value):
+        if self.value is None or value > self.value:
+            self.value = value
+
+_ACCUMULATORS = {
+    'sum': _SumAccumulator,
+    'count': _CountAccumulator,
+    'avg': _AvgAccumulator,
+    'min': _MinAccumulator,
+    'max': _MaxAccumulator,
+    }
+
+
+class _AggregateCell(object):
+    """a cell of a table holding the aggregate of a range of cells (see
+    Table.add_aggregate_cell)
+    """
+    __slots__ = ('func', 'row', 'col', 'axis', 'index', 'start', 'stop',
+                 'total', 'count')
+
+    def __init__(self, func, row, col, axis, index, start, stop):
+        self.func = func
+        # position of the aggregate cell
+        self.row = row
+        self.col = col
+        # the range is the [start, stop[ part of the 'index' column if axis
+        # is 0, else of the 'index' row. A stop of None includes appended rows
+        self.axis = axis
+        self.index = index
+        self.start = start
+        self.stop = stop
+        self.total = 0
+        self.count = 0
+
+    def covers(self, row_index, col_index):
+        """tells whether the cell at 'row_index', 'col_index' is in the range
+        """
+        if self.axis == 0:
+            position, index = row_index, col_index
+        else:
+            position, index = col_index, row_index
+        return index == self.index and self.start <= position \
+               and (self.stop is None or position < self.stop)
+
+    def add(self, value):
+        if self.func != 'count':
+            self.total += value
+        self.count += 1
+
+    def added(self, total, values):
+        """returns `total` once `values` have been added to the range"""
+        if self.func != 'count':
+            for value in values:
+                total += value
+        return total
+
+    def replaced(self, total, old, new):
+        """returns `total` once `old` has been replaced by `new` in the range
+        """
+        if self.func == 'count':
+            return total
+        return total + new - old
+
+    def value(self):
+        if self.func == 'sum':
+            return self.total
+        if self.func == 'count':
+            return self.count
+        if not self.count:
+            return None
+        return self.total / float(self.count)
+
+
+## Views #####################################################################
+
+class TableView(Table):
+    """A view on the cells of a table, or a part of it, possibly transposed.
+
+    Views have the :class:`Table` api, but reads and writes are done on the
+    viewed table's cells: no data is copied until the :meth:`copy` method is
+    called. Views can't be resized, sorted or indexed, and should not be used
+    anymore once rows or columns of the viewed table have been inserted,
+    deleted or sorted.
+    """
+
+    def __init__(self, table, rows=slice(None), cols=slice(None),
+                 transposed=False):
+        # rows and cols are slices or lists of indexes of the viewed table,
+        # before transposition
+        self._table = table
+        if isinstance(rows, slice):
+            rows = range(*rows.indices(len(table)))
+        if isinstance(cols, slice):
+            cols = range(*cols.indices(table.shape[1]))
+        self._rows = rows
+        self._cols = cols
+        self._transposed = transposed
+        self.default_value = table.default_value
+        self._row_indexes = None
+        self._col_indexes = None
+        self._value_indexes = {}
+        self._aggregates = []
+        self._aggregate_vectors = {}
+
+    def _get_row_names(self):
+        if self._transposed:
+            names, indexes = self._table.col_names, self._cols
+        else:
+            names, indexes = self._table.row_names, self._rows
+        return [names[index] for index in indexes]
+    row_names = property(_get_row_names)
+
+    def _get_col_names(self):
+        if self._transposed:
+            names, indexes = self._table.row_names, self._rows
+        else:
+            names, indexes = self._table.col_names, self._cols
+        return [names[index] for index in indexes]
+    col_names = property(_get_col_names)
+
+    def _get_data(self):
+        return _TableRows(self)
+    data = property(_get_data)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def get_shape(self):
+        """Returns a tuple which represents the table's shape
+        """
+        if self._transposed:
+            return len(self._cols), len(self._rows)
+        return len(self._rows), len(self._cols)
+    shape = property(get_shape)
+
+    def _resize(self, *args, **kwargs):
+        raise TypeError("table views can't be resized nor sorted, use copy()")
+    create_rows = create_row = create_column = _resize
+    append_row = insert_row = delete_row = _resize
+    append_column = insert_column = delete_column = _resize
+    sort_by_column_index = sort = _permute = remove = _extend = _resize
+
+    def create_index(self, colname):
+        raise TypeError("table views can't be indexed, use copy()")
+
+    def add_aggregate_cell(self, dest_cell, func, rows=None, cols=None):
+        raise TypeError("table views can't hold aggregate cells, use copy()")
+
+    def get_cell(self, row_index, col_index):
+        """Returns the element at [row_index][col_index]
+        """
+        if self._transposed:
+            row_index, col_index = col_index, row_index
+        return self._table.get_cell(self._rows[row_index],
+                                    self._cols[col_index])
+
+    def set_cell(self, row_index, col_index, data):
+        """sets value of cell 'row_indew', 'col_index' to data
+        """
+        if self._transposed:
+            row_index, col_index = col_index, row_index
+        self._table.set_cell(self._rows[row_index], self._cols[col_index],
+                             data)
+
+    def set_row(self, row_index, row_data):
+        """sets the 'row_index' row
+        """
+        for col_index, cell_data in enumerate(row_data):
+            self.set_cell(row_index, col_index, cell_data)
+
+    def get_column(self, col_index, distinct=False):
+        """get a column by index"""
+        col = [self.get_cell(row_index, col_index)
+               for row_index in range(len(self))]
+        if distinct:
+            col = list(set(col))
+        return col
+
+    def copy(self):
+        """Returns a table holding a copy of the viewed cells, of the same
+        class as the viewed table.
+        """
+        return self._new_table(self.col_names, self.row_names,
+                               [list(row) for row in self.data])
+
+    def _new_table(self, col_names, row_names, rows):
+        """returns a new table of the same class as the viewed table, holding
+        `rows`
+        """
+        return self._table._new_table(col_names, row_names, rows)
+
+
+class _VectorView(object):
+    """base class for views on a row or a column of a table"""
+    __slots__ = ('_table', '_index')
+
+    def __init__(self, table, index):
+        self._table = table
+        self._index = index
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return self._get(index)
+
+    def __setitem__(self, index, value):
+        self._set(index, value)
+
+    def __eq__(self, other):
+        if isinstance(other, (_VectorView, tuple)):
+            other = list(other)
+        return list(self) == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def copy(self):
+        """Returns the viewed values as a list"""
+        return list(self)
+
+
+class RowView(_VectorView):
+    """A view on a row of a table: reads and writes are done on the table's
+    cells.
+    """
+    __slots__ = ()
+
+    def __len__(self):
+        return self._table.shape[1]
+
+    def _get(self, col_index):
+        return self._table.get_cell(self._index, col_index)
+
+    def _set(self, col_index, value):
+        self._table.set_cell(self._index, col_index, value)
+
+
+class ColumnView(_VectorView):
+    """A view on a column of a table: reads and writes are done on the
+    table's cells.
+    """
+    __slots__ = ()
+
+    def __len__(self):
+        return len(self._table)
+
+    def _get(self, row_index):
+        return self._table.get_cell(row_index, self._index)
+
+    def _set(self, row_index, value):
+        self._table.set_cell(row_index, self._index, value)
+
+
+class _TableRows(object):
+    """the sequence of rows of a table which doesn't store its data as a
+    list of rows, as views on them
+    """
+    __slots__ = ('_table',)
+
+    def __init__(self, table):
+        self._table = table
+
+    def __len__(self):
+        return len(self._table)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield RowView(self._table, index)
+
+    def __getitem__(self, index):
+        nrows = len(self)
+        if isinstance(index, slice):
+            return [RowView(self._table, i)
+                    for i in range(*index.indices(nrows))]
+        if index < 0:
+            index += nrows
+        if not 0 <= index < nrows:
+            raise IndexError('row index out of range')
+        return RowView(self._table, index)
+
+    def __setitem__(self, index, row_data):
+        self._table.set_row(index, row_data)
+
+    def __eq__(self, other):
+        try:
+            return [list(row) for row in self] == [list(row) for row in other]
+        except TypeError:
+            return False
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr([list(row) for row in self])
+
+
+## Columnar storage ###########################################################
+
+try:
+    array('q')
+    INT_TYPECODE = 'q'
+except ValueError: # python 2
+    INT_TYPECODE = 'l'
+
+# python types of values which may be stored in arrays of a given type code
+# without loss of information
+_ARRAY_TYPES = {INT_TYPECODE: integer_types, 'd': (float,)}
+
+def _make_column(values, typecode=None):
+    """returns a column container for the `values` list: an array of the given
+    `typecode`, else an array of integers or floats if all values have that
+    type, else `values` itself
+    """
+    if typecode is not None:
+        return array(typecode, values)
+    types = set(map(type, values))
+    for typecode, valuetypes in _ARRAY_TYPES.items():
+        if types and types.issubset(valuetypes):
+            try:
+                return array(typecode, values)
+            except OverflowError:
+                break
+    return values
+
+def _take(column, indices):
+    """returns a column container holding values of `column` at `indices`"""
+    if isinstance(column, list):
+        return [column[index] for index in indices]
+    return array(column.typecode, [column[index] for index in indices])
+
+
+class ColumnarTable(Table):
+    """A :class:`Table` storing its data by column.
+
+    Columns holding only integers or only floats are stored in compact arrays
+    (see the :mod:`array` module, arrays support the buffer protocol so
+    e.g. `numpy.frombuffer` may use them without copy); other columns are
+    stored in lists. A column whose type has been inferred turns into a list as
+    soon as a value of another type is stored in it, so that values are always
+    returned unchanged. A column whose type code is given explicitly (see
+    :meth:`create_column`) converts values, and raises TypeError for values of
+    incompatible type.
+
+    The `data` attribute is a read-write sequence of :class:`RowView` and the
+    table iterates on rows views as well, they should not be kept once rows
+    have been inserted, deleted or sorted.
+    """
+
+    def __init__(self, default_value=0, col_names=None, row_names=None):
+        self._columns = []
+        self._col_types = []
+        self._nrows = 0
+        super(ColumnarTable, self).__init__(default_value, col_names, row_names)
+
+    def _get_data(self):
+        return _TableRows(self)
+    def _set_data(self, data):
+        data = [tuple(row) for row in data]
+        ncols = len(self._columns)
+        if any(len(row) != ncols for row in data):
+            raise ValueError('rows should have %s values' % ncols)
+        if data:
+            self._columns = [_make_column(list(column), typecode)
+                             for column, typecode in zip(zip(*data),
+                                                         self._col_types)]
+        else:
+            self._columns = [_make_column([], typecode)
+                             for typecode in self._col_types]
+        self._nrows = len(data)
+        self._rows_reordered()
+    data = property(_get_data, _set_data)
+
+    def _column_for(self, col_index, value):
+        """returns the container of the 'col_index' column, turned into a list
+        if its type has been inferred and doesn't match value's type
+        """
+        column = self._columns[col_index]
+        if self._col_types[col_index] is None:
+            if isinstance(column, list):
+                if not column:
+                    # nothing stored yet, infer type from this value
+                    column = _make_column([value])
+                    del column[:]
+                    self._columns[col_index] = column
+            elif type(value) not in _ARRAY_TYPES[column.typecode]:
+                column = self._columns[col_index] = list(column)
+        return column
+
+    def _store(self, col_index, method, *args):
+        """stores a value (the last of `args`) in the 'col_index' column using
+        the given container's method
+        """
+        column = self._column_for(col_index, args[-1])
+        try:
+            getattr(column, method)(*args)
+        except OverflowError:
+            if self._col_types[col_index] is not None:
+                raise
+            column = self._columns[col_index] = list(column)
+            getattr(column, method)(*args)
+
+    ## Rows / Columns creation #################################################
+    def create_rows(self, row_names):
+        """Appends row_names to the list of existing rows
+        """
+        row_names = list(row_names)
+        self.row_names.extend(row_names)
+        self._rows_appended(row_names)
+        for col_index in range(len(self._columns)):
+            for row_name in row_names:
+                self._store(col_index, 'append', self.default_value)
+        self._nrows += len(row_names)
+        if self._aggregates:
+            self._aggregate_rows_added(self._nrows - len(row_names))
+
+    def create_row(self, row_name=None):
+        """Creates a rowname to the row_names list
+        """
+        self.create_rows([row_name or self._next_row_name()])
+
+    def create_column(self, col_name, typecode=None):
+        """Creates a colname to the col_names list, with values of the type
+        given by `typecode` (see the :mod:`array` module) or inferred
+        """
+        self.col_names.append(col_name)
+        self._cols_appended((col_name,))
+        self._col_types.append(typecode)
+        self._columns.append(_make_column([self.default_value] * self._nrows,
+                                          typecode))
+
+    ## Sort by column ##########################################################
+    def _permute(self, order):
+        """reorders rows so that the row at index i is the one which was at
+        index order[i]
+        """
+        self._columns = [_take(column, order) for column in self._columns]
+        self.row_names = list(map(self.row_names.__getitem__, order))
+        self._rows_reordered()
+
+    def remove(self, colname, value):
+        """Deletes rows whose value in the 'colname' column equals value
+        """
+        column = self._columns[self._col_index(colname)]
+        kept = [index for index in range(self._nrows)
+                if not column[index] == value]
+        self._columns = [_take(col, kept) for col in self._columns]
+        self._nrows = len(kept)
+        self.row_names = [self.row_names[index] for index in kept]
+        self._rows_reordered()
+
+    ## The 'setter' part #######################################################
+    def set_cell(self, row_index, col_index, data):
+        """sets value of cell 'row_indew', 'col_index' to data
+        """
+        changed = None
+        if self._value_indexes or self._aggregates:
+            changed = self._cells_changing(row_index, [(col_index, data)])
+        self._store(col_index, '__setitem__', row_index, data)
+        if changed:
+            self._write_aggregates(changed)
+
+    def set_row(self, row_index, row_data):
+        """sets the 'row_index' row
+        pre:
+            len(row_data) == len(self.col_names)
+        """
+        row_data = tuple(row_data)
+        self._check_length(row_data, len(self._columns), 'row')
+        changed = None
+        if self._value_indexes or self._aggregates:
+            changed = self._cells_changing(row_index, enumerate(row_data))
+        for col_index, cell_data in enumerate(row_data):
+            self._store(col_index, '__setitem__', row_index, cell_data)
+        if changed:
+            self._write_aggregates(changed)
+
+    def append_row(self, row_data, row_name=None):
+        """Appends a row to the table
+        pre:
+            len(row_data) == len(self.col_names)
+        """
+        row_data = tuple(row_data)
+        self._check_length(row_data, len(self._columns), 'row')
+        row_name = row_name or self._next_row_name()
+        self.row_names.append(row_name)
+        self._rows_appended((row_name,))
+        for col_index, cell_data in enumerate(row_data):
+            self._store(col_index, 'append', cell_data)
+        self._nrows += 1
+        if self._aggregates:
+            self._aggregate_rows_added(self._nrows - 1)
+        return self._nrows - 1
+
+    def insert_row(self, index, row_data, row_name=None):
+        """Appends row_data before 'index' in the table. To make 'insert'
+        behave like 'list.insert', inserting in an out of range index will
+        insert row_data to the end of the list
+        pre:
+            len(row_data) == len(self.col_names)
+        """
+        row_data = tuple(row_data)
+        self._check_length(row_data, len(self._columns), 'row')
+        row_name = row_name or self._next_row_name()
+        changed = None
+        if self._value_indexes or self._aggregates:
+            changed = self._row_inserting(index, row_data)
+        self.row_names.insert(index, row_name)
+        self._row_name_inserted(index)
+        for col_index, cell_data in enumerate(row_data):
+            self._store(col_index, 'insert', index, cell_data)
+        self._nrows += 1
+        if changed:
+            self._write_aggregates(changed)
+
+    def delete_row(self, index):
+        """Deletes the 'index' row in the table, and returns it.
+        Raises an IndexError if index is out of range
+        """
+        if not -self._nrows <= index < self._nrows:
+            raise IndexError('row index out of range')
+        changed = self._aggregates and self._aggregate_row_deleting(index)
+        if self._value_indexes:
+            self._index_row_deleting(index)
+        self._row_name_deleted(index, self.row_names.pop(index))
+        self._nrows -= 1
+        row = [column.pop(index) for column in self._columns]
+        if changed:
+            self._write_aggregates(changed)
+        return row
+
+    def set_column(self, col_index, col_data):
+        """sets the 'col_index' column
+        pre:
+            len(col_data) == len(self.row_names)
+        """
+        col_data = list(col_data)
+        self._column_changed(col_index)
+        if len(col_data) == self._nrows and not self._aggregates:
+            typecode = self._col_types[col_index]
+            self._columns[col_index] = _make_column(col_data, typecode)
+        else:
+            for row_index, cell_data in enumerate(col_data):
+                self.set_cell(row_index, col_index, cell_data)
+
+    def append_column(self, col_data, col_name):
+        """Appends the 'col_index' column
+        pre:
+            len(col_data) == len(self.row_names)
+        """
+        self.insert_column(len(self._columns), col_data, col_name)
+
+    def insert_column(self, index, col_data, col_name):
+        """Appends col_data before 'index' in the table. To make 'insert'
+        behave like 'list.insert', inserting in an out of range index will
+        insert col_data to the end of the list
+        pre:
+            len(col_data) == len(self.row_names)
+        """
+        col_data = list(col_data)
+        self._check_length(col_data, self._nrows, 'column')
+        if self._aggregates and index < len(self._columns):
+            self._drop_aggregates()
+        self.col_names.insert(index, col_name)
+        self._col_name_inserted(index)
+        self._col_types.insert(index, None)
+        self._columns.insert(index, _make_column(col_data))
+
+    def delete_column(self, index):
+        """Deletes the 'index' column in the table, and returns it.
+        Raises an IndexError if index is out of range
+        """
+        col_name = self.col_names.pop(index)
+        self._value_indexes.pop(col_name, None)
+        self._col_name_deleted(index, col_name)
+        self._drop_aggregates()
+        self._col_types.pop(index)
+        return list(self._columns.pop(index))
+
+    ## The 'getter' part #######################################################
+    def get_columns(self):
+        """Returns all the columns in the table
+        """
+        return [list(column) for column in self._columns]
 
-from six.moves import range
+    def get_column(self, col_index, distinct=False):
+        """get a column by index"""
+        col = list(self._columns[col_index])
+        if distinct:
+            col = list(set(col))
+        return col
 
-class Table(object):
-    """Table defines a data table with column and row names.
-    inv:
-        len(self.data) <= len(self.row_names)
-        forall(self.data, lambda x: len(x) <= len(self.col_names))
-    """
+    def get_cell(self, row_index, col_index):
+        """Returns the element at [row_index][col_index]
+        """
+        return self._columns[col_index][row_index]
 
-    def __init__(self, default_value=0, col_names=None, row_names=None):
-        self.col_names = []
-        self.row_names = []
-        self.data = []
-        self.default_value = default_value
-        if col_names:
-            self.create_columns(col_names)
-        if row_names:
-            self.create_rows(row_names)
+    def _cells(self, rows, cols):
+        """returns the list of columns of the block of cells selected by the
+        `rows` and `cols` slices, each as a sequence of values
+        """
+        return [column[rows] for column in self._columns[cols]]
 
-    def _next_row_name(self):
-        return 'row%s' % (len(self.row_names)+1)
+    def copy(self):
+        """Returns a copy of this table, sharing no data with it
+        """
+        table = ColumnarTable(default_value=self.default_value)
+        table.col_names = list(self.col_names)
+        table.row_names = list(self.row_names)
+        table._col_types = list(self._col_types)
+        table._columns = [column[:] for column in self._columns]
+        table._nrows = self._nrows
+        return table
+
+    def _extend(self, columns, row_names):
+        """appends rows whose values are given by column"""
+        for col_index, values in enumerate(columns):
+            self._check_length(values, len(row_names), 'column')
+            column = self._columns[col_index]
+            if self._col_types[col_index] is None and values:
+                if isinstance(column, list):
+                    if not column:
+                        self._columns[col_index] = _make_column(values)
+                        continue
+                elif not set(map(type, values)).issubset(
+                        _ARRAY_TYPES[column.typecode]):
+                    column = self._columns[col_index] = list(column)
+            length = len(column)
+            try:
+                column.extend(values)
+            except OverflowError:
+                # values before the faulty one have been appended
+                del column[length:]
+                if self._col_types[col_index] is not None:
+                    raise
+                column = self._columns[col_index] = list(column)
+                column.extend(values)
+        self.row_names.extend(row_names)
+        self._rows_appended(row_names)
+        self._nrows += len(row_names)
+        if self._aggregates:
+            self._aggregate_rows_added(self._nrows - len(row_names))
 
-    def __iter__(self):
-        return iter(self.data)
 
-    def __eq__(self, other):
-        if other is None:
-            return False
-        else:
-            return list(self) == list(other)
+## Sparse storage #############################################################
 
-    __hash__ = object.__hash__
+class SparseTable(Table):
+    """A :class:`Table` storing only cells whose value isn't its default value.
 
-    def __ne__(self, other):
-        return not self == other
+    Each row is stored as a dictionary mapping indexes of columns to values of
+    non-default cells, or None if all its cells hold the default value, so
+    that creating rows or columns doesn't allocate cells. A cell holds the
+    default value if it is the same object or an equal value of the same type.
 
-    def __len__(self):
-        return len(self.row_names)
+    As with :class:`ColumnarTable`, the `data` attribute is a read-write
+    sequence of :class:`RowView`.
+    """
+
+    def __init__(self, default_value=0, col_names=None, row_names=None):
+        self._row_cells = []
+        super(SparseTable, self).__init__(default_value, col_names, row_names)
+
+    def _get_data(self):
+        return _TableRows(self)
+    def _set_data(self, data):
+        ncols = len(self.col_names)
+        rows = []
+        for row in data:
+            row = tuple(row)
+            self._check_length(row, ncols, 'row')
+            rows.append(self._sparse_row(row))
+        self._row_cells = rows
+        self._rows_reordered()
+    data = property(_get_data, _set_data)
+
+    def _is_default(self, value):
+        default = self.default_value
+        return value is default or (type(value) is type(default)
+                                    and value == default)
+
+    def _sparse_row(self, row_data):
+        """returns the stored form of `row_data`"""
+        cells = dict((col_index, value)
+                     for col_index, value in enumerate(row_data)
+                     if not self._is_default(value))
+        return cells or None
+
+    def _dense_row(self, row_index):
+        """returns the 'row_index' row as a list"""
+        row = [self.default_value] * len(self.col_names)
+        cells = self._row_cells[row_index]
+        if cells:
+            for col_index, value in cells.items():
+                row[col_index] = value
+        return row
+
+    def _check_col_index(self, col_index):
+        """returns the positive index of the 'col_index' column
+        Raises an IndexError if col_index is out of range
+        """
+        ncols = len(self.col_names)
+        if not -ncols <= col_index < ncols:
+            raise IndexError('column index out of range')
+        return col_index % ncols
+
+    def _shift_columns(self, index, shift):
+        """shifts indexes of columns from 'index' by 'shift' in stored rows"""
+        for cells in self._row_cells:
+            if cells:
+                moved = [col_index for col_index in cells
+                         if col_index >= index]
+                for col_index in sorted(moved, reverse=shift > 0):
+                    cells[col_index + shift] = cells.pop(col_index)
+
+    def count_cells(self):
+        """Returns the number of stored (non-default) cells
+        """
+        return sum(len(cells) for cells in self._row_cells if cells)
 
     ## Rows / Columns creation #################################################
     def create_rows(self, row_names):
         """Appends row_names to the list of existing rows
         """
+        row_names = list(row_names)
         self.row_names.extend(row_names)
-        for row_name in row_names:
-            self.data.append([self.default_value]*len(self.col_names))
-
-    def create_columns(self, col_names):
-        """Appends col_names to the list of existing columns
-        """
-        for col_name in col_names:
-            self.create_column(col_name)
+        self._rows_appended(row_names)
+        self._row_cells.extend([None] * len(row_names))
+        if self._aggregates:
+            self._aggregate_rows_added(len(self) - len(row_names))
 
     def create_row(self, row_name=None):
         """Creates a rowname to the row_names list
         """
-        row_name = row_name or self._next_row_name()
-        self.row_names.append(row_name)
-        self.data.append([self.default_value]*len(self.col_names))
-
+        self.create_rows([row_name or self._next_row_name()])
 
     def create_column(self, col_name):
         """Creates a colname to the col_names list
         """
         self.col_names.append(col_name)
-        for row in self.data:
-            row.append(self.default_value)
+        self._cols_appended((col_name,))
 
     ## Sort by column ##########################################################
-    def sort_by_column_id(self, col_id, method = 'asc'):
-        """Sorts the table (in-place) according to data stored in col_id
-        """
-        try:
-            col_index = self.col_names.index(col_id)
-            self.sort_by_column_index(col_index, method)
-        except ValueError:
-            raise KeyError("Col (%s) not found in table" % (col_id))
-
-
-    def sort_by_column_index(self, col_index, method = 'asc'):
-        """Sorts the table 'in-place' according to data stored in col_index
-
-        method should be in ('asc', 'desc')
-        """
-        sort_list = sorted([(row[col_index], row, row_name)
-                     for row, row_name in zip(self.data, self.row_names)])
-        # Sorting sort_list will sort according to col_index
-        # If we want reverse sort, then reverse list
-        if method.lower() == 'desc':
-            sort_list.reverse()
-
-        # Rebuild data / row names
-        self.data = []
-        self.row_names = []
-        for val, row, row_name in sort_list:
-            self.data.append(row)
-            self.row_names.append(row_name)
-
-    def groupby(self, colname, *others):
-        """builds indexes of data
-        :returns: nested dictionaries pointing to actual rows
+    def _permute(self, order):
+        """reorders rows so that the row at index i is the one which was at
+        index order[i]
         """
-        groups = {}
-        colnames = (colname,) + others
-        col_indexes = [self.col_names.index(col_id) for col_id in colnames]
-        for row in self.data:
-            ptr = groups
-            for col_index in col_indexes[:-1]:
-                ptr = ptr.setdefault(row[col_index], {})
-            ptr = ptr.setdefault(row[col_indexes[-1]],
-                                 Table(default_value=self.default_value,
-                                       col_names=self.col_names))
-            ptr.append_row(tuple(row))
-        return groups
-
-    def select(self, colname, value):
-        grouped = self.groupby(colname)
-        try:
-            return grouped[value]
-        except KeyError:
-            return []
+        self._row_cells = list(map(self._row_cells.__getitem__, order))
+        self.row_names = list(map(self.row_names.__getitem__, order))
+        self._rows_reordered()
 
     def remove(self, colname, value):
-        col_index = self.col_names.index(colname)
-        for row in self.data[:]:
-            if row[col_index] == value:
-                self.data.remove(row)
-
+        """Deletes rows whose value in the 'colname' column equals value
+        """
+        column = self.get_column(self._col_index(colname))
+        kept = [index for index in range(len(self._row_cells))
+                if not column[index] == value]
+        self._row_cells = [self._row_cells[index] for index in kept]
+        self.row_names = [self.row_names[index] for index in kept]
+        self._rows_reordered()
 
     ## The 'setter' part #######################################################
     def set_cell(self, row_index, col_index, data):
         """sets value of cell 'row_indew', 'col_index' to data
         """
-        self.data[row_index][col_index] = data
-
-
-    def set_cell_by_ids(self, row_id, col_id, data):
-        """sets value of cell mapped by row_id and col_id to data
-        Raises a KeyError if row_id or col_id are not found in the table
-        """
-        try:
-            row_index = self.row_names.index(row_id)
-        except ValueError:
-            raise KeyError("Row (%s) not found in table" % (row_id))
+        col_index = self._check_col_index(col_index)
+        cells = self._row_cells[row_index]
+        changed = None
+        if self._value_indexes or self._aggregates:
+            changed = self._cells_changing(row_index, [(col_index, data)])
+        if self._is_default(data):
+            if cells:
+                cells.pop(col_index, None)
+                if not cells:
+                    self._row_cells[row_index] = None
+        elif cells:
+            cells[col_index] = data
         else:
-            try:
-                col_index = self.col_names.index(col_id)
-                self.data[row_index][col_index] = data
-            except ValueError:
-                raise KeyError("Column (%s) not found in table" % (col_id))
-
+            self._row_cells[row_index] = {col_index: data}
+        if changed:
+            self._write_aggregates(changed)
 
     def set_row(self, row_index, row_data):
         """sets the 'row_index' row
         pre:
-            type(row_data) == types.ListType
             len(row_data) == len(self.col_names)
         """
-        self.data[row_index] = row_data
-
-
-    def set_row_by_id(self, row_id, row_data):
-        """sets the 'row_id' column
-        pre:
-            type(row_data) == types.ListType
-            len(row_data) == len(self.row_names)
-        Raises a KeyError if row_id is not found
-        """
-        try:
-            row_index = self.row_names.index(row_id)
-            self.set_row(row_index, row_data)
-        except ValueError:
-            raise KeyError('Row (%s) not found in table' % (row_id))
-
+        row_data = tuple(row_data)
+        self._check_length(row_data, len(self.col_names), 'row')
+        changed = None
+        if self._value_indexes or self._aggregates:
+            changed = self._cells_changing(row_index, enumerate(row_data))
+        self._row_cells[row_index] = self._sparse_row(row_data)
+        if changed:
+            self._write_aggregates(changed)
 
     def append_row(self, row_data, row_name=None):
         """Appends a row to the table
         pre:
-            type(row_data) == types.ListType
             len(row_data) == len(self.col_names)
         """
+        row_data = tuple(row_data)
+        self._check_length(row_data, len(self.col_names), 'row')
         row_name = row_name or self._next_row_name()
         self.row_names.append(row_name)
-        self.data.append(row_data)
-        return len(self.data) - 1
+        self._rows_appended((row_name,))
+        self._row_cells.append(self._sparse_row(row_data))
+        if self._aggregates:
+            self._aggregate_rows_added(len(self._row_cells) - 1)
+        return len(self._row_cells) - 1
 
     def insert_row(self, index, row_data, row_name=None):
         """Appends row_data before 'index' in the table. To make 'insert'
         behave like 'list.insert', inserting in an out of range index will
         insert row_data to the end of the list
         pre:
-            type(row_data) == types.ListType
             len(row_data) == len(self.col_names)
         """
+        row_data = tuple(row_data)
+        self._check_length(row_data, len(self.col_names), 'row')
         row_name = row_name or self._next_row_name()
+        changed = None
+        if self._value_indexes or self._aggregates:
+            changed = self._row_inserting(index, row_data)
         self.row_names.insert(index, row_name)
-        self.data.insert(index, row_data)
-
+        self._row_name_inserted(index)
+        self._row_cells.insert(index, self._sparse_row(row_data))
+        if changed:
+            self._write_aggregates(changed)
 
     def delete_row(self, index):
         """Deletes the 'index' row in the table, and returns it.
         Raises an IndexError if index is out of range
         """
-        self.row_names.pop(index)
-        return self.data.pop(index)
-
-
-    def delete_row_by_id(self, row_id):
-        """Deletes the 'row_id' row in the table.
-        Raises a KeyError if row_id was not found.
-        """
-        try:
-            row_index = self.row_names.index(row_id)
-            self.delete_row(row_index)
-        except ValueError:
-            raise KeyError('Row (%s) not found in table' % (row_id))
-
+        row = self._dense_row(index)
+        changed = self._aggregates and self._aggregate_row_deleting(index)
+        if self._value_indexes:
+            self._index_row_deleting(index)
+        self._row_name_deleted(index, self.row_names.pop(index))
+        self._row_cells.pop(index)
+        if changed:
+            self._write_aggregates(changed)
+        return row
 
     def set_column(self, col_index, col_data):
         """sets the 'col_index' column
         pre:
-            type(col_data) == types.ListType
             len(col_data) == len(self.row_names)
         """
-
+        self._column_changed(col_index)
         for row_index, cell_data in enumerate(col_data):
-            self.data[row_index][col_index] = cell_data
-
-
-    def set_column_by_id(self, col_id, col_data):
-        """sets the 'col_id' column
-        pre:
-            type(col_data) == types.ListType
-            len(col_data) == len(self.col_names)
-        Raises a KeyError if col_id is not found
-        """
-        try:
-            col_index = self.col_names.index(col_id)
-            self.set_column(col_index, col_data)
-        except ValueError:
-            raise KeyError('Column (%s) not found in table' % (col_id))
-
+            self.set_cell(row_index, col_index, cell_data)
 
     def append_column(self, col_data, col_name):
         """Appends the 'col_index' column
         pre:
-            type(col_data) == types.ListType
             len(col_data) == len(self.row_names)
         """
-        self.col_names.append(col_name)
-        for row_index, cell_data in enumerate(col_data):
-            self.data[row_index].append(cell_data)
-
+        self.insert_column(len(self.col_names), col_data, col_name)
 
     def insert_column(self, index, col_data, col_name):
         """Appends col_data before 'index' in the table. To make 'insert'
         behave like 'list.insert', inserting in an out of range index will
         insert col_data to the end of the list
         pre:
-            type(col_data) == types.ListType
             len(col_data) == len(self.row_names)
         """
+        col_data = list(col_data)
+        self._check_length(col_data, len(self._row_cells), 'column')
+        ncols = len(self.col_names)
+        if index < 0:
+            index = max(index + ncols, 0)
+        index = min(index, ncols)
+        if index < ncols:
+            self._drop_aggregates()
+        self._shift_columns(index, 1)
         self.col_names.insert(index, col_name)
+        self._col_name_inserted(index)
         for row_index, cell_data in enumerate(col_data):
-            self.data[row_index].insert(index, cell_data)
-
+            self.set_cell(row_index, index, cell_data)
 
     def delete_column(self, index):
         """Deletes the 'index' column in the table, and returns it.
         Raises an IndexError if index is out of range
         """
-        self.col_names.pop(index)
-        return [row.pop(index) for row in self.data]
-
-
-    def delete_column_by_id(self, col_id):
-        """Deletes the 'col_id' col in the table.
-        Raises a KeyError if col_id was not found.
-        """
-        try:
-            col_index = self.col_names.index(col_id)
-            self.delete_column(col_index)
-        except ValueError:
-            raise KeyError('Column (%s) not found in table' % (col_id))
-
+        index = self._check_col_index(index)
+        column = self.get_column(index)
+        col_name = self.col_names.pop(index)
+        self._value_indexes.pop(col_name, None)
+        self._col_name_deleted(index, col_name)
+        self._drop_aggregates()
+        for row_index, cells in enumerate(self._row_cells):
+            if cells:
+                cells.pop(index, None)
+                if not cells:
+                    self._row_cells[row_index] = None
+        self._shift_columns(index + 1, -1)
+        return column
 
     ## The 'getter' part #######################################################
-
-    def get_shape(self):
-        """Returns a tuple which represents the table's shape
-        """
-        return len(self.row_names), len(self.col_names)
-    shape = property(get_shape)
-
-    def __getitem__(self, indices):
-        """provided for convenience"""
-        rows, multirows = None, False
-        cols, multicols = None, False
-        if isinstance(indices, tuple):
-            rows = indices[0]
-            if len(indices) > 1:
-                cols = indices[1]
-        else:
-            rows = indices
-        # define row slice
-        if isinstance(rows, str):
-            try:
-                rows = self.row_names.index(rows)
-            except ValueError:
-                raise KeyError("Row (%s) not found in table" % (rows))
-        if isinstance(rows, int):
-            rows = slice(rows, rows+1)
-            multirows = False
-        else:
-            rows = slice(None)
-            multirows = True
-        # define col slice
-        if isinstance(cols, str):
-            try:
-                cols = self.col_names.index(cols)
-            except ValueError:
-                raise KeyError("Column (%s) not found in table" % (cols))
-        if isinstance(cols, int):
-            cols = slice(cols, cols+1)
-            multicols = False
-        else:
-            cols = slice(None)
-            multicols = True
-        # get sub-table
-        tab = Table()
-        tab.default_value = self.default_value
-        tab.create_rows(self.row_names[rows])
-        tab.create_columns(self.col_names[cols])
-        for idx, row in enumerate(self.data[rows]):
-            tab.set_row(idx, row[cols])
-        if multirows :
-            if multicols:
-                return tab
-            else:
-                return [item[0] for item in tab.data]
-        else:
-            if multicols:
-                return tab.data[0]
-            else:
-                return tab.data[0][0]
-
-    def get_cell_by_ids(self, row_id, col_id):
-        """Returns the element at [row_id][col_id]
+    def get_cell(self, row_index, col_index):
+        """Returns the element at [row_index][col_index]
         """
-        try:
-            row_index = self.row_names.index(row_id)
-        except ValueError:
-            raise KeyError("Row (%s) not found in table" % (row_id))
-        else:
+        cells = self._row_cells[row_index]
+        if cells:
             try:
-                col_index = self.col_names.index(col_id)
-            except ValueError:
-                raise KeyError("Column (%s) not found in table" % (col_id))
-        return self.data[row_index][col_index]
-
-    def get_row_by_id(self, row_id):
-        """Returns the 'row_id' row
-        """
-        try:
-            row_index = self.row_names.index(row_id)
-        except ValueError:
-            raise KeyError("Row (%s) not found in table" % (row_id))
-        return self.data[row_index]
-
-    def get_column_by_id(self, col_id, distinct=False):
-        """Returns the 'col_id' col
-        """
-        try:
-            col_index = self.col_names.index(col_id)
-        except ValueError:
-            raise KeyError("Column (%s) not found in table" % (col_id))
-        return self.get_column(col_index, distinct)
+                return cells[col_index]
+            except KeyError:
+                pass
+        if col_index < 0:
+            col_index = self._check_col_index(col_index)
+            if cells and col_index in cells:
+                return cells[col_index]
+        elif col_index >= len(self.col_names):
+            raise IndexError('column index out of range')
+        return self.default_value
 
     def get_columns(self):
         """Returns all the columns in the table
         """
-        return [self[:, index] for index in range(len(self.col_names))]
+        return self._cells(slice(None), slice(None))
 
     def get_column(self, col_index, distinct=False):
         """get a column by index"""
-        col = [row[col_index] for row in self.data]
+        col_index = self._check_col_index(col_index)
+        col = self._cells(slice(None), slice(col_index, col_index + 1))[0]
         if distinct:
             col = list(set(col))
         return col
 
-    def apply_stylesheet(self, stylesheet):
-        """Applies the stylesheet to this table
+    def _cells(self, rows, cols):
+        """returns the list of columns of the block of cells selected by the
+        `rows` and `cols` slices, each as a sequence of values
         """
-        for instruction in stylesheet.instructions:
-            eval(instruction)
-
-
-    def transpose(self):
-        """Keeps the self object intact, and returns the transposed (rotated)
-        table.
+        col_indexes = range(*cols.indices(len(self.col_names)))
+        positions = dict((col_index, position)
+                         for position, col_index in enumerate(col_indexes))
+        stored = self._row_cells[rows]
+        columns = [[self.default_value] * len(stored)
+                   for col_index in col_indexes]
+        for row_index, cells in enumerate(stored):
+            if cells:
+                for col_index, value in cells.items():
+                    position = positions.get(col_index)
+                    if position is not None:
+                        columns[position][row_index] = value
+        return columns
+
+    def copy(self):
+        """Returns a copy of this table, sharing no data with it
         """
-        transposed = Table()
-        transposed.create_rows(self.col_names)
-        transposed.create_columns(self.row_names)
-        for col_index, column in enumerate(self.get_columns()):
-            transposed.set_row(col_index, column)
-        return transposed
-
+        table = SparseTable(default_value=self.default_value)
+        table.col_names = list(self.col_names)
+        table.row_names = list(self.row_names)
+        table._row_cells = [cells and dict(cells) for cells in self._row_cells]
+        return table
+
+    def _extend(self, columns, row_names):
+        """appends rows whose values are given by column"""
+        for values in columns:
+            self._check_length(values, len(row_names), 'column')
+        self.row_names.extend(row_names)
+        self._rows_appended(row_names)
+        if columns:
+            self._row_cells.extend([self._sparse_row(row) for row in zip(*columns)])
+        else:
+            self._row_cells.extend([None] * len(row_names))
+        if self._aggregates:
+            self._aggregate_rows_added(len(self) - len(row_names))
+
+
+## Binary storage #############################################################
+
+# binary files start with this magic string and the length of the JSON header
+# (a little-endian 64 bits integer), then the header, padded so that blocks of
+# values start on 8 bytes boundaries. The header gives the number of rows, the
+# default value, columns names and, for each column then for row names, the
+# type of values ('q' for integers, 'd' for floats, 's' for strings), their
+# width and the offset of their block from the end of the header. Strings are
+# followed by a byte which can't appear in UTF-8, then padded with null bytes,
+# so that they may end with null characters.
+_BINARY_MAGIC = b'LCTABLE1'
+_BINARY_STRING_END = b'\xff'
+# number of values packed or unpacked at once
+_BINARY_CHUNK = 65536
+
+def _binary_kind(values, what):
+    """returns the binary type of `values`"""
+    types = set(map(type, values))
+    if types.issubset(integer_types):
+        if values and not -2**63 <= min(values) <= max(values) < 2**63:
+            raise OverflowError("%s can't be stored: integers should fit in "
+                                "64 bits" % what)
+        return 'q'
+    if types.issubset((float,)):
+        return 'd'
+    if all(issubclass(valuetype, string_types) for valuetype in types):
+        return 's'
+    raise TypeError("%s can't be stored: values should be all integers, all "
+                    "floats or all strings" % what)
+
+def _write_binary(path, table):
+    """writes `table` to the file at `path`, see :meth:`Table.to_binary`"""
+    nrows = len(table)
+    blocks = []
+    layout = []
+    offset = 0
+    for col_index, col_name in enumerate(table.col_names):
+        blocks.append((table._column_values(col_index),
+                       'column %r' % col_name))
+    blocks.append((list(table.row_names), 'row names'))
+    for index, (values, what) in enumerate(blocks):
+        kind = _binary_kind(values, what)
+        if kind == 's':
+            values = [value.encode('utf-8') + _BINARY_STRING_END
+                      for value in values]
+            width = max([1] + [len(value) for value in values])
+        else:
+            width = 8
+        blocks[index] = values
+        layout.append({'type': kind, 'width': width, 'offset': offset})
+        offset += width * nrows + (-width * nrows % 8)
+    header = json.dumps({'nrows': nrows,
+                         'default_value': table.default_value,
+                         'col_names': list(table.col_names),
+                         'blocks': layout}).encode('utf-8')
+    with open(path, 'wb') as stream:
+        stream.write(_BINARY_MAGIC)
+        stream.write(struct.pack('<Q', len(header)))
+        stream.write(header + b'\0' * (-len(header) % 8))
+        for values, block in zip(blocks, layout):
+            kind, width = block['type'], block['width']
+            for start in range(0, nrows, _BINARY_CHUNK):
+                chunk = values[start:start + _BINARY_CHUNK]
+                if kind == 's':
+                    stream.write(b''.join([value.ljust(width, b'\0')
+                                           for value in chunk]))
+                else:
+                    stream.write(struct.pack('<%s%s' % (len(chunk), kind),
+                                             *chunk))
+            stream.write(b'\0' * (-width * nrows % 8))
+
+def _unpack_array(kind, data):
+    """returns an array of the values packed in `data`"""
+    values = array(INT_TYPECODE if kind == 'q' else 'd')
+    if sys.byteorder == 'little' and values.itemsize == 8:
+        if hasattr(values, 'frombytes'):
+            values.frombytes(data)
+        else: # python 2
+            values.fromstring(data)
+    else:
+        values.extend(struct.unpack('<%s%s' % (len(data) // 8, kind), data))
+    return values
+
+
+class _MmapColumn(object):
+    """a read-only column of fixed-width values in a memory map"""
+    __slots__ = ('_mmap', '_offset', '_length', '_kind', '_width')
+
+    def __init__(self, mmap, offset, length, kind, width):
+        self._mmap = mmap
+        self._offset = offset
+        self._length = length
+        self._kind = kind
+        self._width = width
 
-    def pprint(self):
-        """returns a string representing the table in a pretty
-        printed 'text' format.
-        """
-        # The maximum row name (to know the start_index of the first col)
-        max_row_name = 0
-        for row_name in self.row_names:
-            if len(row_name) > max_row_name:
-                max_row_name = len(row_name)
-        col_start = max_row_name + 5
+    def __len__(self):
+        return self._length
 
-        lines = []
-        # Build the 'first' line <=> the col_names one
-        # The first cell <=> an empty one
-        col_names_line = [' '*col_start]
-        for col_name in self.col_names:
-            col_names_line.append(col_name + ' '*5)
-        lines.append('|' + '|'.join(col_names_line) + '|')
-        max_line_length = len(lines[0])
-
-        # Build the table
-        for row_index, row in enumerate(self.data):
-            line = []
-            # First, build the row_name's cell
-            row_name = self.row_names[row_index]
-            line.append(row_name + ' '*(col_start-len(row_name)))
-
-            # Then, build all the table's cell for this line.
-            for col_index, cell in enumerate(row):
-                col_name_length = len(self.col_names[col_index]) + 5
-                data = str(cell)
-                line.append(data + ' '*(col_name_length - len(data)))
-            lines.append('|' + '|'.join(line) + '|')
-            if len(lines[-1]) > max_line_length:
-                max_line_length = len(lines[-1])
+    def __eq__(self, other):
+        if isinstance(other, (_MmapColumn, tuple)):
+            other = list(other)
+        return list(self) == other
 
-        # Wrap the table with '-' to make a frame
-        lines.insert(0, '-'*max_line_length)
-        lines.append('-'*max_line_length)
-        return '\n'.join(lines)
+    def __ne__(self, other):
+        return not self == other
 
+    __hash__ = None
 
     def __repr__(self):
-        return repr(self.data)
+        return repr(list(self))
 
-    def as_text(self):
-        data = []
-        # We must convert cells into strings before joining them
-        for row in self.data:
-            data.append([str(cell) for cell in row])
-        lines = ['\t'.join(row) for row in data]
-        return '\n'.join(lines)
+    def __iter__(self):
+        for start in range(0, self._length, _BINARY_CHUNK):
+            for value in self._read(start, start + _BINARY_CHUNK):
+                yield value
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            indexes = range(*index.indices(self._length))
+            if not indexes:
+                return self._read(0, 0)
+            lower, upper = min(indexes), max(indexes) + 1
+            values = self._read(lower, upper)
+            if index.step in (None, 1):
+                return values
+            return values[indexes[0] - lower::index.step]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('column index out of range')
+        offset = self._offset + index * self._width
+        if self._kind == 's':
+            value = self._mmap[offset:offset + self._width]
+            return value.rstrip(b'\0')[:-1].decode('utf-8')
+        return struct.unpack_from('<' + self._kind, self._mmap, offset)[0]
+
+    def _read(self, start, stop):
+        """returns values from `start` to `stop` as an array of numbers or a
+        list of strings
+        """
+        width = self._width
+        stop = min(stop, self._length)
+        offset = self._offset + start * width
+        data = self._mmap[offset:offset + max(stop - start, 0) * width]
+        if self._kind == 's':
+            return [data[index:index + width].rstrip(b'\0')[:-1]
+                    .decode('utf-8') for index in range(0, len(data), width)]
+        return _unpack_array(self._kind, data)
+
+
+class MmapTable(ColumnarTable):
+    """A read-only :class:`ColumnarTable` on a file written by
+    :meth:`Table.to_binary`, see :meth:`Table.open_mmap`.
+
+    Opening it only reads the file's header: values are read from the memory
+    mapped file when accessed, and its pages are shared between processes
+    mapping it. Use :meth:`copy` to get a table which may be modified.
+    """
 
+    def __init__(self, path):
+        with open(path, 'rb') as stream:
+            self._mmap = mmap.mmap(stream.fileno(), 0,
+                                   access=mmap.ACCESS_READ)
+        if self._mmap[:len(_BINARY_MAGIC)] != _BINARY_MAGIC:
+            self._mmap.close()
+            raise ValueError('%s is not a binary table file' % path)
+        start = len(_BINARY_MAGIC) + 8
+        header_length = struct.unpack_from('<Q', self._mmap, start - 8)[0]
+        header = json.loads(self._mmap[start:start + header_length]
+                            .decode('utf-8'))
+        start += header_length + (-header_length % 8)
+        nrows = header['nrows']
+        columns = [_MmapColumn(self._mmap, start + block['offset'], nrows,
+                               block['type'], block['width'])
+                   for block in header['blocks']]
+        self.default_value = header['default_value']
+        self._row_names = columns.pop()
+        self._col_names = header['col_names']
+        self._row_indexes = None
+        self._col_indexes = None
+        self._value_indexes = {}
+        self._aggregates = []
+        self._aggregate_vectors = {}
+        self._columns = columns
+        self._col_types = [None] * len(columns)
+        self._nrows = nrows
+
+    def close(self):
+        """Closes the memory map, the table can't be used afterwards"""
+        self._mmap.close()
+
+    row_names = property(Table._get_row_names)
+    col_names = property(Table._get_col_names)
+    data = property(ColumnarTable._get_data)
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("memory mapped tables are read-only, use copy()")
+    create_rows = create_row = create_column = _read_only
+    set_cell = set_row = set_column = _extend = _read_only
+    append_row = insert_row = delete_row = _read_only
+    append_column = insert_column = delete_column = _read_only
+    sort_by_column_index = sort = _permute = remove = _read_only
+    add_aggregate_cell = _read_only
+
+    def _new_table(self, col_names, row_names, rows):
+        table = ColumnarTable(default_value=self.default_value,
+                              col_names=col_names)
+        table.row_names = row_names
+        table.data = rows
+        return table
 
 
 class TableStyle:
@@ -623,6 +3023,7 @@ class TableStyle:
 
 import re
 CELL_PROG = re.compile("([0-9]+)_([0-9]+)")
+ASSIGN_PROG = re.compile(r"\s*([0-9]+)_([0-9]+)\s*=(?!=)(.*)$", re.S)
 
 class TableStyleSheet:
     """A simple Table stylesheet
@@ -634,6 +3035,8 @@ class TableStyleSheet:
         2_5 = 2_3 + 2_4
     You can also use all the math.* operations you want. For example:
         2_5 = sqrt(2_3**2 + 2_4**2)
+    Sums and averages over rows or columns are rather computed using
+    :meth:`Table.aggregate` (see :meth:`add_aggregate_rule`).
     """
 
     def __init__(self, rules = None):
@@ -648,14 +3051,59 @@ class TableStyleSheet:
         """Adds a rule to the stylesheet rules
         """
         try:
-            source_code = ['from math import *']
-            source_code.append(CELL_PROG.sub(r'self.data[\1][\2]', rule))
-            self.instructions.append(compile('\n'.join(source_code),
-                'table.py', 'exec'))
+            self.instructions.append(self._compile(rule))
             self.rules.append(rule)
         except SyntaxError:
             print("Bad Stylesheet Rule : %s [skipped]" % rule)
 
+    def _compile(self, rule):
+        """compiles `rule`. A rule assigning a single cell sets it through
+        :meth:`Table.set_cell`, so that indexes and aggregate cells of the
+        table are kept up to date, others modify its data directly
+        """
+        match = ASSIGN_PROG.match(rule)
+        if match is not None:
+            row, col, expression = match.groups()
+            source = 'self.set_cell(%s, %s, %s)' % (
+                row, col, CELL_PROG.sub(r'self.get_cell(\1, \2)', expression))
+            try:
+                return compile('from math import *\n' + source,
+                               'table.py', 'exec')
+            except SyntaxError:
+                pass
+        return compile('from math import *\n'
+                       + CELL_PROG.sub(r'self.data[\1][\2]', rule),
+                       'table.py', 'exec')
+
+
+    def add_aggregate_rule(self, dest_cell, func, rows, cols):
+        """Creates and adds a rule setting dest_cell to the `func` aggregate of
+        cells selected by `rows` and `cols` (see :meth:`Table.aggregate`).
+        dest_cell is a tuple of two elements (x,y) of the destination cell
+
+        The rule is kept in `rules` as a call to :meth:`Table.aggregate`, so
+        that it may be given back to the constructor, unless it can't be
+        written as text (e.g. `func` is a function).
+        """
+        self.instructions.append(_AggregateInstruction(dest_cell, func,
+                                                       rows, cols))
+        args = '%r, %r, %r' % (func, rows, cols)
+        if isinstance(func, string_types) and not CELL_PROG.search(args):
+            self.rules.append('%d_%d = self.aggregate(%s)'
+                              % (dest_cell + (args,)))
+
+    def _add_range_rule(self, dest_cell, func, rows, cols, cells):
+        """adds an aggregate rule for `cells`, a list of (row, col), keeping
+        its arithmetic expression in `rules` so that they may be given back to
+        the constructor
+        """
+        self.instructions.append(_AggregateInstruction(dest_cell, func,
+                                                       rows, cols))
+        expr = '+'.join(['%d_%d' % cell for cell in cells])
+        if func == 'avg':
+            expr = '(%s)/%f' % (expr, len(cells))
+        self.rules.append('%d_%d=' % dest_cell + expr)
+
 
     def add_rowsum_rule(self, dest_cell, row_index, start_col, end_col):
         """Creates and adds a rule to sum over the row at row_index from
@@ -666,10 +3114,10 @@ class TableStyleSheet:
             start_col >= 0
             end_col > start_col
         """
-        cell_list = ['%d_%d'%(row_index, index) for index in range(start_col,
-                                                                   end_col + 1)]
-        rule = '%d_%d=' % dest_cell + '+'.join(cell_list)
-        self.add_rule(rule)
+        self._add_range_rule(dest_cell, 'sum', row_index,
+                             slice(start_col, end_col + 1),
+                             [(row_index, index)
+                              for index in range(start_col, end_col + 1)])
 
 
     def add_rowavg_rule(self, dest_cell, row_index, start_col, end_col):
@@ -681,11 +3129,10 @@ class TableStyleSheet:
             start_col >= 0
             end_col > start_col
         """
-        cell_list = ['%d_%d'%(row_index, index) for index in range(start_col,
-                                                                   end_col + 1)]
-        num = (end_col - start_col + 1)
-        rule = '%d_%d=' % dest_cell + '('+'+'.join(cell_list)+')/%f'%num
-        self.add_rule(rule)
+        self._add_range_rule(dest_cell, 'avg', row_index,
+                             slice(start_col, end_col + 1),
+                             [(row_index, index)
+                              for index in range(start_col, end_col + 1)])
 
 
     def add_colsum_rule(self, dest_cell, col_index, start_row, end_row):
@@ -697,10 +3144,10 @@ class TableStyleSheet:
             start_row >= 0
             end_row > start_row
         """
-        cell_list = ['%d_%d'%(index, col_index) for index in range(start_row,
-                                                                   end_row + 1)]
-        rule = '%d_%d=' % dest_cell + '+'.join(cell_list)
-        self.add_rule(rule)
+        self._add_range_rule(dest_cell, 'sum',
+                             slice(start_row, end_row + 1), col_index,
+                             [(index, col_index)
+                              for index in range(start_row, end_row + 1)])
 
 
     def add_colavg_rule(self, dest_cell, col_index, start_row, end_row):
@@ -712,11 +3159,25 @@ class TableStyleSheet:
             start_row >= 0
             end_row > start_row
         """
-        cell_list = ['%d_%d'%(index, col_index) for index in range(start_row,
-                                                                   end_row + 1)]
-        num = (end_row - start_row + 1)
-        rule = '%d_%d=' % dest_cell + '('+'+'.join(cell_list)+')/%f'%num
-        self.add_rule(rule)
+        self._add_range_rule(dest_cell, 'avg',
+                             slice(start_row, end_row + 1), col_index,
+                             [(index, col_index)
+                              for index in range(start_row, end_row + 1)])
+
+
+class _AggregateInstruction(object):
+    """stylesheet instruction setting a cell to an aggregate of other cells"""
+
+    def __init__(self, dest_cell, func, rows, cols):
+        self.dest_cell = dest_cell
+        self.func = func
+        self.rows = rows
+        self.cols = cols
+
+    def __call__(self, table):
+        row_index, col_index = self.dest_cell
+        table.set_cell(row_index, col_index,
+                       table.aggregate(self.func, self.rows, self.cols))
 
 
 
@@ -739,7 +3200,7 @@ class TableCellRenderer:
         """Renders the cell at 'cell_coord' in the table, using table_style
         """
         row_index, col_index = cell_coord
-        cell_value = table.data[row_index][col_index]
+        cell_value = table.get_cell(row_index, col_index)
         final_content = self._make_cell_content(cell_value,
                                                 table_style, col_index  +1)
         return self._render_cell_content(final_content,
@@ -757,7 +3218,7 @@ class TableCellRenderer:
         """Renders the cell for 'col_id' row
         """
         cell_value = col_name
-        col_index = table.col_names.index(col_name)
+        col_index = table._col_index(col_name)
         return self._render_cell_content(cell_value, table_style, col_index +1)
 
 
@@ -896,20 +3357,18 @@ class DocbookTableWriter(TableWriter):
         """
         self._stream.write('<tbody>\n')
 
-        for row_index, row in enumerate(self._table.data):
-            self._stream.write('<row>\n')
-            row_name = self._table.row_names[row_index]
-            # Write the first entry (row_name)
-            self._stream.write(self.renderer.render_row_cell(row_name,
-                                                            self._table,
-                                                            self.style))
-
-            for col_index, cell in enumerate(row):
-                self._stream.write(self.renderer.render_cell(
-                    (row_index, col_index),
-                    self._table, self.style))
-
-            self._stream.write('</row>\n')
+        table = self._table
+        col_indexes = range(len(table.col_names))
+        for row_index, row_name in enumerate(table.row_names):
+            # Write the first entry (row_name), then the row's cells
+            entries = ['<row>\n', self.renderer.render_row_cell(row_name,
+                                                                table,
+                                                                self.style)]
+            for col_index in col_indexes:
+                entries.append(self.renderer.render_cell(
+                    (row_index, col_index), table, self.style))
+            entries.append('</row>\n')
+            self._stream.write(''.join(entries))
 
         self._stream.write('</tbody>\n')
 
@@ -24,6 +24,7 @@
 __docformat__ = "restructuredtext en"
 
 import sys
+from collections import deque
 
 from logilab.common import flatten
 from logilab.common.visitor import VisitedMixIn, FilteredIterator, no_filter
@@ -40,8 +41,36 @@ EX_NODE_NOT_FOUND = "No such node as '%s'"
 
 # Base node ###################################################################
 
+class _IdIndex(dict):
+    """nodes of a tree by id, see :meth:`Node.index_ids` (several nodes may
+    share an id)
+    """
+
+    def add(self, node):
+        """index `node` and its descendants"""
+        for descendant in pre_order_iter(node):
+            descendant._index = self
+            self.setdefault(descendant.id, []).append(descendant)
+
+    def discard(self, node):
+        """unindex `node` and its descendants"""
+        for descendant in pre_order_iter(node):
+            descendant._index = None
+            nodes = self[descendant.id]
+            for i, indexed in enumerate(nodes):
+                if indexed is descendant:
+                    del nodes[i]
+                    break
+            if not nodes:
+                del self[descendant.id]
+
+
 class Node(object):
     """a basic tree node, characterized by an id"""
+    # index of the tree, shared by its nodes (see index_ids)
+    _index = None
+    # cached position of the node in its parent's children
+    _position = 0
 
     def __init__(self, nid=None) :
         self.id = nid
@@ -65,27 +94,72 @@ class Node(object):
     def is_leaf(self):
         return not self.children
 
+    def index_ids(self):
+        """index nodes of the whole tree by id, so that
+        :meth:`get_node_by_id` and :meth:`get_child_by_id` don't walk the
+        tree anymore. The index is maintained by :meth:`append`,
+        :meth:`insert`, :meth:`remove` and :meth:`replace`, so ids must be
+        hashable and neither ids nor children lists should be modified
+        directly once indexed.
+        """
+        root = self.root()
+        if root._index is None:
+            _IdIndex().add(root)
+
     def append(self, child):
         """add a node to children"""
         self.children.append(child)
         child.parent = self
+        self._index_child(child)
 
     def remove(self, child):
         """remove a child node"""
         self.children.remove(child)
         child.parent = None
+        if child._index is not None:
+            child._index.discard(child)
 
     def insert(self, index, child):
         """insert a child node"""
         self.children.insert(index, child)
         child.parent = self
+        self._index_child(child)
 
     def replace(self, old_child, new_child):
         """replace a child node with another"""
-        i = self.children.index(old_child)
+        i = old_child._sibling_position(self.children)
         self.children.pop(i)
         self.children.insert(i, new_child)
         new_child.parent = self
+        new_child._position = i
+        if old_child._index is not None:
+            old_child._index.discard(old_child)
+        self._index_child(new_child)
+
+    def _index_child(self, child):
+        """move the subtree of `child`, just attached to this node, from the
+        index of its former tree (if any) to the index of this tree (if any)
+        """
+        if child._index is not self._index:
+            if child._index is not None:
+                child._index.discard(child)
+            if self._index is not None:
+                self._index.add(child)
+
+    def _sibling_position(self, siblings):
+        """return the position of this node in `siblings`, its parent's
+        children. Positions of all siblings are cached at once, until nodes
+        are inserted or removed before them.
+        """
+        i = self._position
+        if i >= len(siblings) or siblings[i] is not self:
+            for i, sibling in enumerate(siblings):
+                sibling._position = i
+            i = self._position
+            if i >= len(siblings) or siblings[i] is not self:
+                # not a sibling, raise ValueError
+                i = siblings.index(self)
+        return i
 
     def get_sibling(self, nid):
         """return the sibling node that has given id"""
@@ -102,7 +176,7 @@ class Node(object):
         if parent is None:
             # root node has no sibling
             return None
-        index = parent.children.index(self)
+        index = self._sibling_position(parent.children)
         try:
             return parent.children[index+1]
         except IndexError:
@@ -116,7 +190,7 @@ class Node(object):
         if parent is None:
             # root node has no sibling
             return None
-        index = parent.children.index(self)
+        index = self._sibling_position(parent.children)
         if index > 0:
             return parent.children[index-1]
         return None
@@ -125,6 +199,12 @@ class Node(object):
         """
         return node in whole hierarchy that has given id
         """
+        if self._index is not None:
+            nodes = self._index.get(nid)
+            if not nodes:
+                raise NodeNotFound(EX_NODE_NOT_FOUND % nid)
+            if len(nodes) == 1:
+                return nodes[0]
         root = self.root()
         try:
             return root.get_child_by_id(nid, 1)
@@ -137,14 +217,24 @@ class Node(object):
         """
         if self.id == nid:
             return self
-        for c in self.children :
-            if recurse:
-                try:
-                    return c.get_child_by_id(nid, 1)
-                except NodeNotFound :
-                    continue
-            if c.id == nid :
-                return c
+        if self._index is not None:
+            nodes = self._index.get(nid, ())
+            if len(nodes) == 1:
+                node = nodes[0].parent
+                while recurse and node is not None and node is not self:
+                    node = node.parent
+                if node is self:
+                    return nodes[0]
+            if len(nodes) < 2:
+                raise NodeNotFound(EX_CHILD_NOT_FOUND % nid)
+        if recurse:
+            for node in pre_order_iter(self):
+                if node.id == nid:
+                    return node
+        else:
+            for c in self.children :
+                if c.id == nid :
+                    return c
         raise NodeNotFound(EX_CHILD_NOT_FOUND % nid)
 
     def get_child_by_path(self, path):
@@ -166,44 +256,39 @@ class Node(object):
         """
         return depth of this node in the tree
         """
-        if self.parent is not None:
-            return 1 + self.parent.depth()
-        else :
-            return 0
+        return len(self.lineage()) - 1
 
     def depth_down(self):
         """
         return depth of the tree from this node
         """
-        if self.children:
-            return 1 + max([c.depth_down() for c in self.children])
-        return 1
+        depth = 0
+        level = [self]
+        while level:
+            depth += 1
+            level = [child for node in level for child in node.children]
+        return depth
 
     def width(self):
         """
         return the width of the tree from this node
         """
-        return len(self.leaves())
+        return sum(1 for leaf in leaves_iter(self))
 
     def root(self):
         """
         return the root node of the tree
         """
-        if self.parent is not None:
-            return self.parent.root()
-        return self
+        node = self
+        while node.parent is not None:
+            node = node.parent
+        return node
 
     def leaves(self):
         """
         return a list with all the leaves nodes descendant from this node
         """
-        leaves = []
-        if self.children:
-            for child in self.children:
-                leaves += child.leaves()
-            return leaves
-        else:
-            return [self]
+        return list(leaves_iter(self))
 
     def flatten(self, _list=None):
         """
@@ -211,9 +296,7 @@ class Node(object):
         """
         if _list is None:
             _list = []
-        _list.append(self)
-        for c in self.children:
-            c.flatten(_list)
+        _list.extend(pre_order_iter(self))
         return _list
 
     def lineage(self):
@@ -221,8 +304,8 @@ class Node(object):
         return list of parents up to root node
         """
         lst = [self]
-        if self.parent is not None:
-            lst.extend(self.parent.lineage())
+        while lst[-1].parent is not None:
+            lst.append(lst[-1].parent)
         return lst
 
 class VNode(Node, VisitedMixIn):
@@ -245,6 +328,8 @@ class BinaryNode(VNode):
         """remove the child and replace this node with the other child
         """
         self.children.remove(child)
+        if child._index is not None:
+            child._index.discard(child)
         self.parent.replace(self, self.children[0])
 
     def get_parts(self):
@@ -277,83 +362,133 @@ class ListNode(VNode, list_class):
         """add a node to children"""
         list_class.append(self, child)
         child.parent = self
+        self._index_child(child)
 
     def insert(self, index, child):
         """add a node to children"""
         list_class.insert(self, index, child)
         child.parent = self
+        self._index_child(child)
 
     def remove(self, child):
         """add a node to children"""
         list_class.remove(self, child)
         child.parent = None
+        if child._index is not None:
+            child._index.discard(child)
 
     def pop(self, index):
         """add a node to children"""
         child = list_class.pop(self, index)
         child.parent = None
+        if child._index is not None:
+            child._index.discard(child)
 
     def __iter__(self):
         return list_class.__iter__(self)
 
+# iterate over tree ##########################################################
+
+def pre_order_iter(node, filter_func=no_filter):
+    """
+    generate tree nodes for which the <filter> function returned true in a pre
+    order fashion (the subtree of a node for which it returned false is
+    skipped). Deep trees are walked without recursion.
+    """
+    if not filter_func(node):
+        return
+    yield node
+    filtered = filter_func is not no_filter
+    stack = [iter(node.children)]
+    while stack:
+        for node in stack[-1]:
+            if filtered and not filter_func(node):
+                continue
+            yield node
+            if node.children:
+                stack.append(iter(node.children))
+                break
+        else:
+            stack.pop()
+
+def post_order_iter(node, filter_func=no_filter):
+    """
+    generate tree nodes for which the <filter> function returned true in a
+    post order fashion (the subtree of a node for which it returned false is
+    skipped). Deep trees are walked without recursion.
+    """
+    if not filter_func(node):
+        return
+    filtered = filter_func is not no_filter
+    stack = [(node, iter(node.children))]
+    while stack:
+        node, children = stack[-1]
+        for child in children:
+            if not filtered or filter_func(child):
+                stack.append((child, iter(child.children)))
+                break
+        else:
+            stack.pop()
+            yield node
+
+def breadth_first_iter(node, filter_func=no_filter):
+    """
+    generate tree nodes for which the <filter> function returned true level by
+    level (the subtree of a node for which it returned false is skipped)
+    """
+    filtered = filter_func is not no_filter
+    queue = deque([node])
+    while queue:
+        node = queue.popleft()
+        if filtered and not filter_func(node):
+            continue
+        yield node
+        queue.extend(node.children)
+
+def leaves_iter(node, filter_func=no_filter):
+    """
+    generate leaves of the tree from left to right, provided the <filter>
+    function returned true for them and their ancestors
+    """
+    if not filter_func(node):
+        return
+    if not node.children:
+        yield node
+        return
+    filtered = filter_func is not no_filter
+    stack = [iter(node.children)]
+    while stack:
+        for node in stack[-1]:
+            if filtered and not filter_func(node):
+                continue
+            if node.children:
+                stack.append(iter(node.children))
+                break
+            yield node
+        else:
+            stack.pop()
+
 # construct list from tree ####################################################
 
 def post_order_list(node, filter_func=no_filter):
     """
     create a list with tree nodes for which the <filter> function returned true
-    in a post order fashion
+    in a post order fashion (see :func:`post_order_iter`).
+
+    Only the subtree of a rejected node is skipped, the walk goes on with its
+    next siblings.
     """
-    l, stack = [], []
-    poped, index = 0, 0
-    while node:
-        if filter_func(node):
-            if node.children and not poped:
-                stack.append((node, index))
-                index = 0
-                node = node.children[0]
-            else:
-                l.append(node)
-                index += 1
-                try:
-                    node = stack[-1][0].children[index]
-                except IndexError:
-                    node = None
-        else:
-            node = None
-        poped = 0
-        if node is None and stack:
-            node, index = stack.pop()
-            poped = 1
-    return l
+    return list(post_order_iter(node, filter_func))
 
 def pre_order_list(node, filter_func=no_filter):
     """
     create a list with tree nodes for which the <filter> function returned true
-    in a pre order fashion
+    in a pre order fashion (see :func:`pre_order_iter`).
+
+    Only the subtree of a rejected node is skipped, the walk goes on with its
+    next siblings.
     """
-    l, stack = [], []
-    poped, index = 0, 0
-    while node:
-        if filter_func(node):
-            if not poped:
-                l.append(node)
-            if node.children and not poped:
-                stack.append((node, index))
-                index = 0
-                node = node.children[0]
-            else:
-                index += 1
-                try:
-                    node = stack[-1][0].children[index]
-                except IndexError:
-                    node = None
-        else:
-            node = None
-        poped = 0
-        if node is None and len(stack) > 1:
-            node, index = stack.pop()
-            poped = 1
-    return l
+    return list(pre_order_iter(node, filter_func))
 
 class PostfixedDepthFirstIterator(FilteredIterator):
     """a postfixed depth first iterator, designed to be used with visitors
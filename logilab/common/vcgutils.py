@@ -32,6 +32,10 @@ __docformat__ = "restructuredtext en"
 
 import string
 
+from six import string_types
+
+from logilab.common.graph import GraphEmitter
+
 ATTRS_VAL = {
     'algos':       ('dfs', 'tree', 'minbackward',
                     'left_to_right', 'right_to_left',
@@ -142,68 +146,119 @@ def latin_to_vcg(st):
     return st
 
 
+def _attribute_formatter(attributes_dict):
+    """returns a function formatting a graph, node or edge attribute, given
+    as a (key, value) item, according to the attributes dictionary for this
+    kind of element
+    """
+    def format_attribute(item):
+        key, value = item
+        try:
+            _type =  attributes_dict[key]
+        except KeyError:
+            raise Exception('''no such attribute %s
+possible attributes are %s''' % (key, attributes_dict.keys()))
+
+        if not _type:
+            return '%s:"%s"\n' % (key, value)
+        elif _type == 1:
+            return '%s:%s\n' % (key, int(value))
+        elif value in _type:
+            return '%s:%s\n' % (key, value)
+        else:
+            raise Exception('''value %s isn\'t correct for attribute %s
+correct values are %s''' % (value, key, _type))
+    return format_attribute
+
+def _cacheable_attribute(attributes_dict):
+    """returns a function telling whether a formatted attribute may be
+    cached: integer attributes are formatted the same from equal values (1,
+    1.0 and True), as text ones
+    """
+    def cacheable(item):
+        key, value = item
+        return isinstance(value, string_types) or attributes_dict[key] == 1
+    return cacheable
+
+_GRAPH_ATTRIBUTE = _attribute_formatter(GRAPH_ATTRS)
+_NODE_ATTRIBUTE = _attribute_formatter(NODE_ATTRS)
+_EDGE_ATTRIBUTE = _attribute_formatter(EDGE_ATTRS)
+
+
 class VCGPrinter:
     """A vcg graph writer.
+
+    Output is buffered (see :class:`logilab.common.graph.GraphEmitter`) and
+    written to the stream when a graph is closed, after nodes and edges drawn
+    outside of any graph, or on :meth:`flush`.
     """
 
     def __init__(self, output_stream):
         self._stream = output_stream
+        self._emitter = GraphEmitter(output_stream)
+        self._ids = self._emitter.ids
+        attributes = self._emitter.attributes
+        self._graph_attributes = attributes(
+            _GRAPH_ATTRIBUTE, _cacheable_attribute(GRAPH_ATTRS))
+        self._node_attributes = attributes(
+            _NODE_ATTRIBUTE, _cacheable_attribute(NODE_ATTRS))
+        self._edge_attributes = attributes(
+            _EDGE_ATTRIBUTE, _cacheable_attribute(EDGE_ATTRS))
         self._indent = ''
 
     def open_graph(self, **args):
         """open a vcg graph
         """
-        self._stream.write('%sgraph:{\n'%self._indent)
+        self._emitter.write('%sgraph:{\n'%self._indent)
         self._inc_indent()
-        self._write_attributes(GRAPH_ATTRS, **args)
+        self._emitter.write(
+            self._attributes_text(self._graph_attributes, args))
 
     def close_graph(self):
         """close a vcg graph
         """
         self._dec_indent()
-        self._stream.write('%s}\n'%self._indent)
+        self._emitter.write('%s}\n'%self._indent)
+        self.flush()
+
+    def flush(self):
+        """write buffered output to the stream
+        """
+        self._emitter.flush()
 
 
     def node(self, title, **args):
         """draw a node
         """
-        self._stream.write('%snode: {title:"%s"' % (self._indent, title))
-        self._write_attributes(NODE_ATTRS, **args)
-        self._stream.write('}\n')
+        self._emitter.write('%snode: {title:%s%s}\n' % (
+            self._indent, self._ids.lookup(title),
+            self._attributes_text(self._node_attributes, args)))
+        if not self._indent:
+            self.flush()
 
 
     def edge(self, from_node, to_node, edge_type='', **args):
         """draw an edge from a node to another.
         """
-        self._stream.write(
-            '%s%sedge: {sourcename:"%s" targetname:"%s"' % (
-            self._indent, edge_type, from_node, to_node))
-        self._write_attributes(EDGE_ATTRS, **args)
-        self._stream.write('}\n')
+        self._emitter.write(
+            '%s%sedge: {sourcename:%s targetname:%s%s}\n' % (
+            self._indent, edge_type, self._ids.lookup(from_node),
+            self._ids.lookup(to_node),
+            self._attributes_text(self._edge_attributes, args)))
+        if not self._indent:
+            self.flush()
 
 
     # private ##################################################################
 
-    def _write_attributes(self, attributes_dict, **args):
-        """write graph, node or edge attributes
+    def _attributes_text(self, attributes, args):
+        """return graph, node or edge attributes formatted by `attributes`
+        (see :meth:`GraphEmitter.attributes`)
         """
-        for key, value in args.items():
-            try:
-                _type =  attributes_dict[key]
-            except KeyError:
-                raise Exception('''no such attribute %s
-possible attributes are %s''' % (key, attributes_dict.keys()))
-
-            if not _type:
-                self._stream.write('%s%s:"%s"\n' % (self._indent, key, value))
-            elif _type == 1:
-                self._stream.write('%s%s:%s\n' % (self._indent, key,
-                                                  int(value)))
-            elif value in _type:
-                self._stream.write('%s%s:%s\n' % (self._indent, key, value))
-            else:
-                raise Exception('''value %s isn\'t correct for attribute %s
-correct values are %s''' % (value, key, _type))
+        if not args:
+            return ''
+        indent = self._indent
+        return indent + indent.join(attributes.lookup_all(args.items()))
 
     def _inc_indent(self):
         """increment indentation
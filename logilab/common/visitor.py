@@ -33,13 +33,10 @@ class FilteredIterator(object):
         self._next = [(node, 0)]
         if filter_func is None:
             filter_func = no_filter
-        self._list = list_func(node, filter_func)
+        self._list = iter(list_func(node, filter_func))
 
     def __next__(self):
-        try:
-            return self._list.pop(0)
-        except :
-            return None
+        return next(self._list, None)
 
     next = __next__
 
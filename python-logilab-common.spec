@@ -25,6 +25,7 @@ BuildRequires:  python-devel python-setuptools python-unittest2 pytz
 %{?el6:Requires:       python-egenix-mx-base}
 Requires:       python-setuptools
 Requires:       %{python}-six >= 1.4.0
+Requires:       %{python}-futures
 
 
 %description
@@ -0,0 +1,70 @@
+# copyright 2003-2016 LOGILAB S.A. (Paris, FRANCE), all rights reserved.
+# contact http://www.logilab.fr/ -- mailto:contact@logilab.fr
+#
+# This file is part of logilab-common.
+#
+# logilab-common is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation, either version 2.1 of the License, or (at your option) any
+# later version.
+#
+# logilab-common is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with logilab-common.  If not, see <http://www.gnu.org/licenses/>.
+"""times sorts of tables, e.g. to compare storages or versions:
+
+  python test/bench_table.py [nrows]
+
+Columns 'a' and 'b' hold integers with 100 and 10 distinct values, column 'c'
+distinct ones. Each sort is timed on a freshly built table, the best of 3
+runs is printed.
+"""
+from __future__ import print_function
+
+import random
+import sys
+import time
+
+from logilab.common.table import Table, ColumnarTable, SparseTable
+
+SORTS = [
+    ("sort_by_column_index(0)", lambda table: table.sort_by_column_index(0)),
+    ("sort_by_column_index(0, 'desc')",
+     lambda table: table.sort_by_column_index(0, 'desc')),
+    ("sort(['a'])", lambda table: table.sort(['a'])),
+    ("sort(['a', 'b'])", lambda table: table.sort(['a', 'b'])),
+    ("sort(['c'], reverse=True)",
+     lambda table: table.sort(['c'], reverse=True)),
+    ]
+
+def build(table_class, nrows, seed=0):
+    rand = random.Random(seed)
+    table = table_class(col_names=['a', 'b', 'c'])
+    table.data = [[rand.randint(0, 99), rand.randint(0, 9), index]
+                  for index in range(nrows)]
+    table.row_names = ['row%s' % (index + 1) for index in range(nrows)]
+    return table
+
+def best_time(table_class, nrows, sort, repeat=3):
+    best = None
+    for run in range(repeat):
+        table = build(table_class, nrows)
+        start = time.time()
+        sort(table)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+def main(nrows=200000):
+    for table_class in (Table, ColumnarTable, SparseTable):
+        for title, sort in SORTS:
+            print('%-14s %-32s %.3fs' % (table_class.__name__, title,
+                                        best_time(table_class, nrows, sort)))
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
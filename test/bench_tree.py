@@ -0,0 +1,76 @@
+# copyright 2003-2016 LOGILAB S.A. (Paris, FRANCE), all rights reserved.
+# contact http://www.logilab.fr/ -- mailto:contact@logilab.fr
+#
+# This file is part of logilab-common.
+#
+# logilab-common is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation, either version 2.1 of the License, or (at your option) any
+# later version.
+#
+# logilab-common is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with logilab-common.  If not, see <http://www.gnu.org/licenses/>.
+"""times traversals of trees, e.g. to compare versions:
+
+  python test/bench_tree.py [nnodes]
+
+Each traversal is timed on a wide tree (every node has 10 children) and on a
+deep one (a single branch), both of `nnodes` nodes (1M by default). Trees are
+built once, the best of 3 runs is printed.
+"""
+from __future__ import print_function
+
+import sys
+import time
+
+from logilab.common.tree import Node, pre_order_list, post_order_list
+
+TRAVERSALS = [
+    ("flatten()", lambda root: root.flatten()),
+    ("leaves()", lambda root: root.leaves()),
+    ("depth_down()", lambda root: root.depth_down()),
+    ("pre_order_list()", pre_order_list),
+    ("post_order_list()", post_order_list),
+    ]
+
+def build_wide(nnodes, fanout=10):
+    root = Node(0)
+    nodes = [root]
+    for index in range(1, nnodes):
+        child = Node(index)
+        nodes[(index - 1) // fanout].append(child)
+        nodes.append(child)
+    return root
+
+def build_deep(nnodes):
+    root = node = Node(0)
+    for index in range(1, nnodes):
+        child = Node(index)
+        node.append(child)
+        node = child
+    return root
+
+def best_time(root, traversal, repeat=3):
+    best = None
+    for run in range(repeat):
+        start = time.time()
+        traversal(root)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+def main(nnodes=1000000):
+    for shape, build in (('wide', build_wide), ('deep', build_deep)):
+        root = build(nnodes)
+        for title, traversal in TRAVERSALS:
+            print('%-5s %-20s %.3fs' % (shape, title,
+                                       best_time(root, traversal)))
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -17,8 +17,17 @@
 # You should have received a copy of the GNU Lesser General Public License along
 # with logilab-common.  If not, see <http://www.gnu.org/licenses/>.
 
+import os
+import os.path as osp
+import shutil
+import sys
+import tempfile
+import time
+
 from logilab.common.testlib import TestCase, unittest_main
-from logilab.common.graph import get_cycles, has_path, ordered_nodes, UnorderableGraph
+from logilab.common.graph import get_cycles, has_path, ordered_nodes, UnorderableGraph, \
+     strongly_connected_components, shortest_path, ReachabilityIndex, run_dag, \
+     CompactGraph, DynamicDAG, DotBackend, generate_graphs, GraphEmitter
 
 class getCyclesTC(TestCase):
 
@@ -31,6 +40,38 @@ class getCyclesTC(TestCase):
     def test_known2(self):
         self.assertEqual(get_cycles({1:[2], 2:[3], 3:[0], 0:[]}), [])
 
+    def test_self_loop(self):
+        self.assertEqual(get_cycles({1:[1, 2], 2:[1, 2]}), [[1], [1, 2], [2]])
+
+    def test_all_cycles(self):
+        self.assertEqual(get_cycles({1:[2, 3], 2:[1, 3], 3:[1]}),
+                         [[1, 2], [1, 2, 3], [1, 3]])
+
+    def test_vertices(self):
+        graph = {1:[2], 2:[1], 3:[4], 4:[3, 1]}
+        self.assertEqual(get_cycles(graph, [1]), [[1, 2]])
+        self.assertEqual(get_cycles(graph, [4]), [[1, 2], [3, 4]])
+
+    def test_deep_cycle(self):
+        graph = dict((i, [i + 1]) for i in range(100000))
+        graph[100000] = [0]
+        self.assertEqual(get_cycles(graph), [list(range(100001))])
+
+
+class stronglyConnectedComponentsTC(TestCase):
+
+    def test_components(self):
+        graph = {1:[2], 2:[3, 4], 3:[1], 4:[5], 5:[4, 6], 6:[]}
+        components = strongly_connected_components(graph)
+        self.assertEqual([sorted(component) for component in components],
+                         [[6], [4, 5], [1, 2, 3]])
+
+    def test_vertices(self):
+        graph = {1:[2], 2:[1], 3:[1]}
+        components = strongly_connected_components(graph, [2])
+        self.assertEqual([sorted(component) for component in components],
+                         [[1, 2]])
+
 
 class hasPathTC(TestCase):
 
@@ -46,6 +87,38 @@ class hasPathTC(TestCase):
     def test_cycle(self):
         self.assertEqual(has_path({'A': ['A']}, 'A', 'B'), None)
 
+    def test_deep_graph(self):
+        graph = dict((i, [i + 1]) for i in range(100000))
+        graph[100000] = []
+        self.assertEqual(has_path(graph, 0, 100000), list(range(1, 100001)))
+
+
+class shortestPathTC(TestCase):
+
+    def test_shortest(self):
+        graph = {'A': ['B', 'C'], 'B': ['C'], 'C': ['D'], 'D': []}
+        self.assertEqual(has_path(graph, 'A', 'D'), ['B', 'C', 'D'])
+        self.assertEqual(shortest_path(graph, 'A', 'D'), ['C', 'D'])
+
+    def test_no_connection(self):
+        self.assertEqual(shortest_path({'A': ['B'], 'B': ['A']}, 'A', 'C'), None)
+
+    def test_cycle(self):
+        self.assertEqual(shortest_path({'A': ['B'], 'B': ['A']}, 'A', 'A'), ['B', 'A'])
+
+
+class ReachabilityIndexTC(TestCase):
+
+    def test_reachable(self):
+        graph = {'A': ['B'], 'B': ['C', 'D'], 'C': ['B'], 'D': [], 'E': ['E']}
+        index = ReachabilityIndex(graph)
+        for fromnode in graph:
+            for tonode in graph:
+                self.assertEqual(index.reachable(fromnode, tonode),
+                                 has_path(graph, fromnode, tonode) is not None,
+                                 (fromnode, tonode))
+        self.assertRaises(KeyError, index.reachable, 'A', 'F')
+
 class ordered_nodesTC(TestCase):
 
     def test_one_item(self):
@@ -85,5 +158,285 @@ class ordered_nodesTC(TestCase):
         graph = {'a':['b']}
         self.assertRaises(UnorderableGraph, ordered_nodes, graph)
 
+    def test_cycle(self):
+        graph = {'a': ['b'], 'b': ['c'], 'c': ['b'], 'd': []}
+        with self.assertRaises(UnorderableGraph) as cm:
+            ordered_nodes(graph)
+        self.assertEqual(str(cm.exception), 'cycles in graph: b -> c')
+
+    def test_levels(self):
+        graph = {'a': ['b', 'd'], 'b': ['c'], 'c': [], 'd': [], 'e': ['c']}
+        ordered = ordered_nodes(graph)
+        self.assertEqual(ordered, ('a', 'b', 'e', 'c', 'd'))
+        # the graph is left untouched
+        self.assertEqual(len(graph), 5)
+
+    def test_deep_graph(self):
+        graph = dict((i, [i + 1]) for i in range(100000))
+        graph[100000] = []
+        ordered = ordered_nodes(graph)
+        self.assertEqual(ordered, tuple(range(100001)))
+
+class runDagTC(TestCase):
+
+    def test_order(self):
+        graph = {'a': ['b', 'c'], 'b': ['d'], 'c': ['d'], 'd': [], 'e': []}
+        done = []
+        def func(node):
+            for dep in graph[node]:
+                self.assertIn(dep, done)
+            done.append(node)
+            return node.upper()
+        run = run_dag(graph, func, max_workers=2)
+        self.assertEqual(sorted(done), ['a', 'b', 'c', 'd', 'e'])
+        self.assertEqual(run.results['a'], 'A')
+        self.assertEqual(run.errors, {})
+        self.assertEqual(run.skipped, set())
+
+    def test_failure(self):
+        graph = {'a': ['b'], 'b': ['c'], 'c': [], 'd': ['c'], 'e': []}
+        def func(node):
+            if node == 'c':
+                raise ValueError(node)
+            return node
+        run = run_dag(graph, func)
+        self.assertEqual(list(run.errors), ['c'])
+        self.assertIsInstance(run.errors['c'], ValueError)
+        self.assertEqual(run.skipped, set(['a', 'b', 'd']))
+        self.assertEqual(run.results, {'e': 'e'})
+
+    def test_critical_path(self):
+        graph = {'a': ['b', 'c'], 'b': ['d'], 'c': [], 'd': []}
+        durations = {'a': 0.01, 'b': 0.01, 'c': 0.1, 'd': 0.01}
+        run = run_dag(graph, lambda node: time.sleep(durations[node]))
+        duration, nodes = run.critical_path()
+        self.assertEqual(nodes, ['c', 'a'])
+        self.assertGreaterEqual(duration, 0.11)
+
+    def test_bad_graph(self):
+        self.assertRaises(UnorderableGraph, run_dag, {'a': ['a']}, str)
+
+
+class CompactGraphTC(TestCase):
+
+    def setUp(self):
+        self.graph = {'a': ['b', 'c'], 'b': ['d'], 'c': ['d'], 'd': [], 'e': []}
+        self.compact = CompactGraph.from_dict(self.graph)
+
+    def test_dict(self):
+        self.assertEqual(self.compact.to_dict(), self.graph)
+        self.assertEqual(self.compact['a'], ['b', 'c'])
+        self.assertEqual(len(self.compact), 5)
+        self.assertIn('e', self.compact)
+        self.assertEqual(self.compact.get('f'), None)
+        self.assertEqual(CompactGraph.from_dict({'a': ['b']}).to_dict(),
+                         {'a': ['b'], 'b': []})
+
+    def test_from_edges(self):
+        compact = CompactGraph.from_edges([('c', 'd'), ('a', 'b'), ('b', 'd'),
+                                           ('a', 'c')], ['e'])
+        self.assertEqual(compact.to_dict(), self.graph)
+        self.assertEqual(compact.nodes, ['e', 'c', 'd', 'a', 'b'])
+
+    def test_algorithms(self):
+        self.assertEqual(ordered_nodes(self.compact), ordered_nodes(self.graph))
+        self.assertEqual(has_path(self.compact, 'a', 'd'), ['b', 'd'])
+        self.assertEqual(has_path(self.compact, 'a', 'e'), None)
+        self.assertEqual(has_path(self.compact, 'a', 'f'), None)
+        self.assertEqual(shortest_path(self.compact, 'a', 'd'), ['b', 'd'])
+        self.assertEqual(get_cycles(self.compact), [])
+        compact = CompactGraph.from_dict({'c': ['a'], 'a': ['b'], 'b': ['c', 'b']})
+        self.assertEqual(get_cycles(compact), [['a', 'b', 'c'], ['b']])
+        self.assertEqual(get_cycles(compact, ['c']), [['a', 'b', 'c'], ['b']])
+        self.assertEqual(strongly_connected_components(compact, ['a']),
+                         [['c', 'b', 'a']])
+        with self.assertRaises(UnorderableGraph) as cm:
+            ordered_nodes(compact)
+        self.assertEqual(str(cm.exception),
+                         'cycles in graph: a -> b -> c\nb')
+
+
+class DynamicDAGTC(TestCase):
+
+    def check_order(self, dag):
+        order = dag.ordered_nodes()
+        for node, node_deps in dag.to_dict().items():
+            for dep in node_deps:
+                self.assertLess(order.index(node), order.index(dep))
+
+    def test_add_edge(self):
+        dag = DynamicDAG()
+        dag.add_edge('c', 'd')
+        dag.add_edge('a', 'b')
+        dag.add_edge('b', 'c')
+        self.assertEqual(dag.ordered_nodes(), ('a', 'b', 'c', 'd'))
+        dag.add_edge('d', 'e')
+        dag.add_edge('e', 'f')
+        self.check_order(dag)
+        self.assertEqual(len(dag), 6)
+        self.assertIn('f', dag)
+
+    def test_cycle(self):
+        dag = DynamicDAG({'a': ['b'], 'b': ['c'], 'c': []})
+        self.assertEqual(dag.ordered_nodes(), ('a', 'b', 'c'))
+        with self.assertRaises(UnorderableGraph) as cm:
+            dag.add_edge('c', 'a')
+        self.assertEqual(str(cm.exception), 'cycles in graph: c -> a -> b')
+        self.assertRaises(UnorderableGraph, dag.add_edge, 'a', 'a')
+        self.assertEqual(dag.to_dict(), {'a': ['b'], 'b': ['c'], 'c': []})
+        dag.remove_edge('a', 'b')
+        dag.add_edge('c', 'a')
+        self.check_order(dag)
+        self.assertRaises(KeyError, dag.remove_edge, 'a', 'b')
+
+
+class WriteCounter(list):
+    def write(self, text):
+        self.append(text)
+
+class GraphEmitterTC(TestCase):
+
+    def test_chunks(self):
+        stream = WriteCounter()
+        emitter = GraphEmitter(stream, chunk_size=10)
+        for index in range(5):
+            emitter.write('abcd')
+        self.assertEqual(stream, ['abcdabcdabcd'])
+        emitter.flush()
+        self.assertEqual(stream, ['abcdabcdabcd', 'abcdabcd'])
+        emitter.flush()
+        self.assertEqual(len(stream), 2)
+
+    def test_ids(self):
+        emitter = GraphEmitter(id_format='<%s>')
+        self.assertEqual(emitter.ids['a'], '<a>')
+        self.assertEqual(emitter.ids[('a', 1)], "<('a', 1)>")
+        self.assertEqual(emitter.ids[1], '<1>')
+        self.assertEqual(emitter.ids[True], '<True>')
+        self.assertEqual(sorted(emitter.ids), ['a'])
+        self.assertRaises(TypeError, emitter.ids.__getitem__, ['a'])
+        self.assertEqual(emitter.ids.lookup(['a']), "<['a']>")
+        self.assertEqual(emitter.ids.lookup('b'), '<b>')
+        self.assertEqual(sorted(emitter.ids), ['a', 'b'])
+
+    def test_attributes(self):
+        emitter = GraphEmitter()
+        attributes = emitter.attributes('%s=%s'.__mod__)
+        self.assertIs(emitter.attributes('%s=%s'.__mod__), attributes)
+        self.assertEqual(attributes[('width', 1)], 'width=1')
+        self.assertEqual(attributes[('width', True)], 'width=True')
+        self.assertEqual(attributes[('width', 1.0)], 'width=1.0')
+        self.assertEqual(attributes[('color', 'red')], 'color=red')
+        self.assertEqual(list(attributes), [('color', 'red')])
+        attributes = emitter.attributes('%s:%s'.__mod__,
+                                        lambda item: item[0] == 'width')
+        self.assertEqual(attributes[('width', 1)], 'width:1')
+        self.assertEqual(attributes[('color', 'red')], 'color:red')
+        self.assertEqual(list(attributes), [('width', 1)])
+
+    def test_max_cached(self):
+        emitter = GraphEmitter()
+        emitter.max_cached = 2
+        attributes = emitter.attributes('%s=%s'.__mod__)
+        for label in 'abc':
+            self.assertEqual(attributes[('label', label)], 'label=%s' % label)
+        self.assertEqual(len(attributes), 2)
+        for nid in 'abc':
+            emitter.ids[nid]
+        self.assertEqual(len(emitter.ids), 3)
+
+
+FAKE_RENDERER = """#!%s
+import sys
+source = getattr(sys.stdin, 'buffer', sys.stdin).read()
+for index, arg in enumerate(sys.argv):
+    if arg == '-o':
+        with open(sys.argv[index + 1], 'wb') as stream:
+            stream.write(source)
+"""
+
+class DotBackendTC(TestCase):
+
+    def setUp(self):
+        if sys.platform == 'win32':
+            self.skipTest('the fake renderer needs a posix system')
+        self.tmpdir = tempfile.mkdtemp()
+        self.renderer = osp.join(self.tmpdir, 'renderer')
+        with open(self.renderer, 'w') as stream:
+            stream.write(FAKE_RENDERER % sys.executable)
+        os.chmod(self.renderer, 0o755)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def backend(self, name='graph'):
+        backend = DotBackend(name, renderer=self.renderer)
+        backend.emit_node('a', label='A')
+        return backend
+
+    def read(self, filename):
+        with open(osp.join(self.tmpdir, filename)) as stream:
+            return stream.read()
+
+    def test_generate(self):
+        backend = self.backend()
+        source = backend.source
+        self.assertEqual(source, 'digraph "graph" {\ncharset="utf-8"\n'
+                         '"a" [label="A"];\n}\n')
+        outputfile = osp.join(self.tmpdir, 'graph.png')
+        self.assertEqual(backend.generate(outputfile), outputfile)
+        self.assertEqual(self.read('graph.png'), source)
+        backend.generate(osp.join(self.tmpdir, 'graph.dot'))
+        self.assertEqual(self.read('graph.dot'), source)
+
+    def test_stream_to(self):
+        source = self.backend().source
+        backend = self.backend()
+        stream = open(osp.join(self.tmpdir, 'graph.dot'), 'w')
+        backend.stream_to(stream)
+        self.assertRaises(ValueError, backend.get_source)
+        backend.close()
+        stream.close()
+        self.assertEqual(self.read('graph.dot'), source)
+
+    def test_attribute_types(self):
+        backend = DotBackend('graph', charset=None)
+        backend.emit_node(1, width=1)
+        backend.emit_node(True, width=True)
+        backend.emit_edge(1, True, label='1', weight=1.0)
+        self.assertEqual(backend.source, 'digraph "graph" {\n'
+                         '"1" [width="1"];\n"True" [width="True"];\n'
+                         '"1" -> "True" [label="1", weight="1.0"];\n}\n')
+
+    def test_unhashable_values(self):
+        backend = DotBackend('graph', charset=None)
+        backend.emit_node('a', pos=[1, 2], label='A')
+        backend.emit_node(['b'])
+        backend.emit_edge('a', ['b'], pos=[3, 4])
+        self.assertEqual(backend.source, 'digraph "graph" {\n'
+                         '"a" [label="A", pos="[1, 2]"];\n"[\'b\']" [];\n'
+                         '"a" -> "[\'b\']" [pos="[3, 4]"];\n}\n')
+
+    def test_start_rendering(self):
+        source = self.backend().source
+        backend = DotBackend('graph', renderer=self.renderer)
+        outputfile = osp.join(self.tmpdir, 'graph.png')
+        mapfile = osp.join(self.tmpdir, 'graph.map')
+        backend.start_rendering(outputfile, mapfile)
+        backend.emit_node('a', label='A')
+        self.assertEqual(backend.generate(), outputfile)
+        self.assertEqual(self.read('graph.png'), source)
+        self.assertEqual(self.read('graph.map'), source)
+
+    def test_generate_graphs(self):
+        jobs = [(self.backend('graph%s' % index),
+                 osp.join(self.tmpdir, 'graph%s.png' % index))
+                for index in range(5)]
+        outputfiles = generate_graphs(jobs, max_processes=2)
+        self.assertEqual(outputfiles, [outputfile for backend, outputfile in jobs])
+        for backend, outputfile in jobs:
+            self.assertEqual(self.read(outputfile), backend.source)
+
+
 if __name__ == "__main__":
     unittest_main()
@@ -30,6 +30,7 @@ logging.basicConfig(level=logging.ERROR)
 from logilab.common.testlib import TestCase, unittest_main
 
 from logilab.common.registry import *
+from logilab.common.registry import _toload_info
 
 
 class _1_(Predicate):
@@ -166,6 +167,171 @@ class SelectorsTC(TestCase):
         self.assertEqual(s3(None), 0)
         self.assertEqual(self.count, 8)
 
+class _Obj(object):
+    __regid__ = 'obj'
+    __select__ = _1_()
+
+def _make_obj(name, regid='obj'):
+    return type(name, (_Obj,), {'__regid__': regid})
+
+
+class RegistryTC(TestCase):
+
+    def test_unregister(self):
+        registry = Registry(False)
+        objs = [_make_obj('Obj%s' % i) for i in range(10)]
+        for obj in objs:
+            registry.register(obj)
+        registry.unregister(objs[3])
+        self.assertEqual(objs[:3] + objs[4:], registry['obj'])
+        # unknown object
+        registry.unregister(objs[3])
+        self.assertEqual(9, len(registry['obj']))
+
+    def test_unregister_many(self):
+        registry = Registry(False)
+        objs = [_make_obj('Obj%s' % i) for i in range(50)]
+        for obj in objs:
+            registry.register(obj)
+        expected = list(objs)
+        for i in range(50):
+            obj = objs[(i * 7) % 50]
+            registry.unregister(obj)
+            expected.remove(obj)
+            self.assertEqual(expected, registry['obj'])
+            if i % 10 == 0:
+                registry.register(obj)
+                expected.append(obj)
+                self.assertEqual(expected, registry['obj'])
+
+    def test_unregister_identity(self):
+        class Equal(object):
+            __regid__ = 'obj'
+            __select__ = _1_()
+            def __eq__(self, other):
+                return True
+            __hash__ = object.__hash__
+        registry = Registry(False)
+        obj1, obj2 = Equal(), Equal()
+        registry.register(obj1)
+        registry.register(obj2)
+        registry.unregister(obj2)
+        self.assertIs(registry['obj'][0], obj1)
+        self.assertEqual(1, len(registry['obj']))
+
+    def test_unregister_shared_objid(self):
+        registry = Registry(False)
+        objs = [_make_obj('Obj') for i in range(3)]
+        registry.register(objs[0])
+        registry.register(objs[1])
+        registry.unregister(objs[0])
+        self.assertEqual([objs[1]], registry['obj'])
+        registry.register(objs[2])
+        # the first object registered with this identifier is removed, as
+        # found by a scan of the registered objects
+        registry.unregister(objs[2])
+        self.assertEqual([objs[2]], registry['obj'])
+        registry.unregister(objs[1])
+        self.assertEqual([], registry['obj'])
+
+    def test_unregister_other_version(self):
+        registry = Registry(False)
+        obj = _make_obj('Obj')
+        registry.register(obj)
+        # another version of the same object, e.g. after a reload
+        registry.unregister(_make_obj('Obj'))
+        self.assertEqual([], registry['obj'])
+
+    def test_register_and_replace(self):
+        registry = Registry(False)
+        obj1, obj2, obj3 = [_make_obj('Obj%s' % i) for i in range(3)]
+        registry.register(obj1)
+        registry.register(obj2)
+        registry.register_and_replace(obj3, obj1)
+        self.assertEqual([obj2, obj3], registry['obj'])
+        registry.register_and_replace(obj1, registry.objid(obj2))
+        self.assertEqual([obj3, obj1], registry['obj'])
+        registry.unregister(obj3)
+        self.assertEqual([obj1], registry['obj'])
+
+    def test_register_clear(self):
+        registry = Registry(False)
+        obj1, obj2 = _make_obj('Obj1'), _make_obj('Obj2')
+        registry.register(obj1)
+        registry.register(obj2, clear=True)
+        self.assertEqual([obj2], registry['obj'])
+        registry.unregister(obj1)
+        self.assertEqual([obj2], registry['obj'])
+        registry.clear()
+        registry.register(obj1)
+        registry.unregister(obj1)
+        self.assertEqual([], registry['obj'])
+
+    def test_unregister_list_modified(self):
+        registry = Registry(False)
+        obj1, obj2 = _make_obj('Obj1'), _make_obj('Obj2')
+        registry.register(obj1)
+        registry['obj'].append(obj2)
+        registry.unregister(obj2)
+        self.assertEqual([obj1], registry['obj'])
+        del registry['obj'][:]
+        registry.unregister(obj1)
+        self.assertEqual([], registry['obj'])
+
+
+class _kind_is(Predicate):
+    """test predicate whose score only depends on the `kind` context value"""
+    calls = 0
+
+    def __init__(self, kind):
+        self.kind = kind
+
+    def __call__(self, cls, kind=None, **kwargs):
+        _kind_is.calls += 1
+        return int(kind == self.kind)
+
+    def context_key(self, cls, kind=None, **kwargs):
+        return kind
+
+
+class SelectManyTC(TestCase):
+
+    def setUp(self):
+        _kind_is.calls = 0
+        self.registry = Registry(False)
+        self.objs = []
+        for kind in ('a', 'b'):
+            obj = type('Obj%s' % kind, (object,),
+                       {'__regid__': 'obj', '__select__': _kind_is(kind),
+                        '__init__': lambda self, **kwargs: None})
+            self.registry.register(obj)
+            self.objs.append(obj)
+
+    def test_select_many(self):
+        contexts = [((), {'kind': kind}) for kind in 'abab']
+        selected = self.registry.select_many('obj', contexts)
+        self.assertEqual([self.objs[0], self.objs[1], self.objs[0], self.objs[1]],
+                         [obj.__class__ for obj in selected])
+        # each candidate evaluated once per distinct kind
+        self.assertEqual(4, _kind_is.calls)
+
+    def test_select_many_uncacheable(self):
+        obj = type('Objc', (object,),
+                   {'__regid__': 'obj', '__select__': _kind_is('c') & _1_(),
+                    '__init__': lambda self, **kwargs: None})
+        self.registry.register(obj)
+        contexts = [((), {'kind': kind}) for kind in 'cc']
+        selected = self.registry.select_many('obj', contexts)
+        self.assertEqual([obj, obj], [o.__class__ for o in selected])
+        self.assertEqual(6, _kind_is.calls)
+
+    def test_select_many_no_selectable(self):
+        self.assertRaises(NoSelectableObject, self.registry.select_many,
+                          'obj', [((), {'kind': 'a'}), ((), {'kind': 'c'})])
+        self.assertRaises(ObjectNotFound, self.registry.select_many,
+                          'unknown', [])
+
+
 @contextmanager
 def prepended_syspath(path):
     sys.path.insert(0, path)
@@ -196,6 +362,31 @@ class RegistryStoreTC(TestCase):
         self.assertEqual(set(('appobject1', 'appobject2', 'appobject3')),
                          set(store['zereg']))
 
+    def test_load_report(self):
+        store = RegistryStore()
+        with prepended_syspath(self.datadir):
+            store.register_modnames(['regobjects', 'regobjects2'])
+        report = store.load_report()
+        self.assertEqual([('regobjects', 2), ('regobjects2', 1)],
+                         sorted((modname, nbobjects)
+                                for modname, _, nbobjects in report))
+        self.assertGreaterEqual(report[0][1], report[1][1])
+        self.assertEqual(report[:1], store.load_report(1))
+
+    def test_toload_info(self):
+        with prepended_syspath(self.datadir):
+            modnames, filemods = _toload_info([self.datapath('find_test'),
+                                                    self.datapath('module.py')],
+                                            None)
+        self.assertEqual(set(['find_test', 'find_test.module', 'find_test.module2',
+                              'find_test.noendingnewline', 'find_test.nonregr',
+                              'module']),
+                         set(modnames))
+        self.assertEqual(self.datapath('find_test', 'module.py'),
+                         modnames['find_test.module'])
+        self.assertEqual(('module', self.datapath('module.py')),
+                         (filemods[-1][1], filemods[-1][0]))
+
 
 class RegistrableInstanceTC(TestCase):
 
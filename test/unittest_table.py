@@ -22,22 +22,25 @@ Unittests for table management
 
 import sys
 import os
+import tempfile
 
 from six.moves import range
 
 from logilab.common.compat import StringIO
 from logilab.common.testlib import TestCase, unittest_main
 from logilab.common.table import Table, TableStyleSheet, DocbookTableWriter, \
-     DocbookRenderer, TableStyle, TableWriter, TableCellRenderer
+     DocbookRenderer, TableStyle, TableWriter, TableCellRenderer, \
+     ColumnarTable, MmapTable, SparseTable, INT_TYPECODE, percentile
 
 class TableTC(TestCase):
     """Table TestCase class"""
+    table_class = Table
 
     def setUp(self):
         """Creates a default table"""
         # from logilab.common import table
         # reload(table)
-        self.table = Table()
+        self.table = self.table_class()
         self.table.create_rows(['row1', 'row2', 'row3'])
         self.table.create_columns(['col1', 'col2'])
 
@@ -139,6 +142,65 @@ class TableTC(TestCase):
         self.assertEqual(self.table[1], [0, 0])
         self.assertRaises(KeyError, self.table.__getitem__, 'tmprow')
 
+    def test_ids_index(self):
+        """tests access by ids stays consistent when rows / columns change"""
+        self.table.set_column_by_id('col1', [3, 1, 2])
+        self.assertEqual(self.table.get_cell_by_ids('row3', 'col1'), 2)
+        self.table.insert_row(0, [4, 4], 'row4')
+        self.assertEqual(self.table.get_row_by_id('row4'), [4, 4])
+        self.assertEqual(self.table.get_cell_by_ids('row3', 'col1'), 2)
+        self.table.sort_by_column_id('col1')
+        self.assertEqual(self.table.get_row_by_id('row2'), [1, 0])
+        self.assertEqual(self.table['row4', 'col1'], 4)
+        self.table.delete_row(0)
+        self.assertEqual(self.table.get_row_by_id('row3'), [2, 0])
+        self.assertRaises(KeyError, self.table.get_row_by_id, 'row2')
+        self.table.append_row([5, 5], 'row5')
+        self.assertEqual(self.table.get_row_by_id('row5'), [5, 5])
+        self.table.insert_column(0, [7, 8, 9, 10], 'col0')
+        self.assertEqual(self.table.get_column_by_id('col1'), [2, 3, 4, 5])
+        self.table.delete_column_by_id('col0')
+        self.assertRaises(KeyError, self.table.get_column_by_id, 'col0')
+        self.assertEqual(self.table.get_column_by_id('col2'), [0, 0, 4, 5])
+        self.table.row_names = ['a', 'b', 'c', 'd']
+        self.assertEqual(self.table.get_row_by_id('d'), [5, 5])
+        self.assertRaises(KeyError, self.table.get_row_by_id, 'row5')
+
+    def test_duplicated_ids(self):
+        """tests access by ids returns the first matching row"""
+        self.table.append_row([1, 1], 'row1')
+        self.assertEqual(self.table.get_row_by_id('row1'), [0, 0])
+        self.table.delete_row(0)
+        self.assertEqual(self.table.get_row_by_id('row1'), [1, 1])
+
+    def test_ids_index_updated(self):
+        """tests ids indexes are updated, not rebuilt, on insert and delete"""
+        import random
+        from logilab.common.table import _names_index
+        rand = random.Random(0)
+        table = self.table
+        for step in range(200):
+            table.get_row_by_id(table.row_names[0])
+            table.get_column_by_id(table.col_names[0])
+            rows_index, cols_index = table._row_indexes, table._col_indexes
+            index = rand.randint(-len(table) - 1, len(table) + 1)
+            if rand.random() < 0.6 or len(table) < 2:
+                table.insert_row(index, [0] * len(table.col_names),
+                                 'row%s' % rand.randint(1, 4))
+            else:
+                table.delete_row(max(min(index, len(table) - 1), -len(table)))
+            ncols = len(table.col_names)
+            if rand.random() < 0.6 or ncols < 2:
+                table.insert_column(rand.randint(-ncols, ncols),
+                                    [0] * len(table),
+                                    'col%s' % rand.randint(1, 3))
+            else:
+                table.delete_column(rand.randint(-ncols, ncols - 1))
+            self.assertIs(table._row_indexes, rows_index)
+            self.assertIs(table._col_indexes, cols_index)
+            self.assertEqual(rows_index, _names_index(table.row_names))
+            self.assertEqual(cols_index, _names_index(table.col_names))
+
     def test_get_column(self):
         """Tests that table.get_column() works fine.
         """
@@ -193,6 +255,36 @@ class TableTC(TestCase):
         self.assertEqual(self.table.row_names, ['row3', 'row2', 'row1'])
         self.assertEqual(self.table.data, [[2, 3], [1, 2], [3, 1]])
 
+    def test_sort(self):
+        """tests stable sorts on several columns"""
+        self.table.create_row('row4')
+        self.table.set_column(0, [2, 1, 2, 1])
+        self.table.set_column(1, [3, 1, 3, 0])
+        self.table.sort(['col1', 1])
+        self.assertEqual(self.table.row_names, ['row4', 'row2', 'row1', 'row3'])
+        self.table.sort(['col1'], reverse=True)
+        self.assertEqual(self.table.row_names, ['row1', 'row3', 'row4', 'row2'])
+        self.table.sort(reverse=True)
+        self.assertEqual(self.table.data, [[2, 3], [2, 3], [1, 1], [1, 0]])
+        self.assertEqual(self.table.row_names, ['row1', 'row3', 'row2', 'row4'])
+        self.table.set_column(1, [None, 'b', 1, 'a'])
+        self.table.sort([-1], key=str)
+        self.assertEqual(self.table.get_column(1), [1, None, 'a', 'b'])
+        self.assertRaises(IndexError, self.table.sort, [2])
+        self.assertRaises(KeyError, self.table.sort, ['col3'])
+        self.assertRaises(TypeError, self.table[1:].sort)
+
+    def test_sort_by_column_index_ties(self):
+        """tests rows holding equal values are sorted by row then by name,
+        and 'desc' reverses the whole order"""
+        self.table.append_row([1, 0], 'row0')
+        self.table.set_column(0, [1, 1, 0, 1])
+        self.table.set_column(1, [2, 1, 5, 1])
+        self.table.sort_by_column_index(0)
+        self.assertEqual(self.table.row_names, ['row3', 'row0', 'row2', 'row1'])
+        self.table.sort_by_column_index(-2, 'desc')
+        self.assertEqual(self.table.row_names, ['row1', 'row2', 'row0', 'row3'])
+
     def test_sort_by_id(self):
         """tests sort_by_column_id()"""
         self.table.set_column_by_id('col1', [3, 1, 2])
@@ -210,6 +302,565 @@ class TableTC(TestCase):
         self.table.pprint()
         str(self.table)
 
+    def test_write_text(self):
+        """tests text formats written to a stream"""
+        self.table.set_cell(1, 1, 'a long value')
+        lines = self.table.pprint().splitlines()
+        self.assertEqual(lines[0], '-' * 34)
+        self.assertEqual(lines[3], '|row2     |0        |a long value|')
+        stream = StringIO()
+        self.table.write_pprint(stream)
+        self.assertEqual(stream.getvalue(), self.table.pprint())
+        stream = StringIO()
+        self.table.write_pprint(stream, sample_rows=1)
+        self.assertEqual(stream.getvalue().splitlines()[0], '-' * 31)
+        self.assertEqual(stream.getvalue().splitlines()[1:-1], lines[1:-1])
+        stream = StringIO()
+        self.table.write_text(stream)
+        self.assertEqual(stream.getvalue(), '0\t0\n0\ta long value\n0\t0')
+        self.assertEqual(self.table.as_text(), stream.getvalue())
+
+    def test_remove(self):
+        """tests remove() deletes rows and their names"""
+        self.table.set_column(0, [1, 2, 1])
+        self.table.remove('col1', 1)
+        self.assertEqual(self.table.row_names, ['row2'])
+        self.assertEqual(self.table, [[2, 0]])
+        self.assertEqual(self.table.get_row_by_id('row2'), [2, 0])
+
+    def test_views(self):
+        """tests rows, columns and sub-tables are views on the table's cells"""
+        column = self.table[:, 'col2']
+        self.table.set_cell(0, 1, 5)
+        self.assertEqual(column, [5, 0, 0])
+        column[1] = 7
+        self.assertEqual(self.table[1, 1], 7)
+        row = self.table['row2']
+        self.assertEqual(row, [0, 7])
+        row[0] = 1
+        self.assertEqual(self.table.get_cell_by_ids('row2', 'col1'), 1)
+        self.assertEqual(self.table[1, 1:], [7])
+        self.assertEqual(self.table[1:, 'col1'], [1, 0])
+        sub = self.table[1:]
+        self.assertEqual(sub.shape, (2, 2))
+        self.assertEqual(sub.row_names, ['row2', 'row3'])
+        self.assertEqual(sub.get_row_by_id('row3'), [0, 0])
+        sub.set_cell_by_ids('row3', 'col1', 9)
+        self.assertEqual(self.table[2, 0], 9)
+        self.assertEqual(sub[:, 'col1'], [1, 9])
+        self.assertEqual(sub[::-1, 0], [9, 1])
+        self.assertRaises(TypeError, sub.append_row, [1, 2])
+        self.assertRaises(TypeError, sub.sort_by_column_index, 0)
+
+    def test_transpose_view(self):
+        """tests transposed tables are views on the table's cells"""
+        ttable = self.table.transpose()
+        self.assertEqual(ttable.shape, (2, 3))
+        self.table.set_cell(2, 0, 4)
+        self.assertEqual(ttable[0, 2], 4)
+        ttable.set_cell(1, 0, 3)
+        self.assertEqual(self.table[0, 1], 3)
+        self.assertEqual(ttable['col2'], [3, 0, 0])
+        self.assertEqual(ttable.transpose(), self.table)
+        self.assertEqual(ttable[1:, 'row1'], [3])
+
+    def test_copy(self):
+        """tests copies share no data with the table"""
+        for copy in (self.table.copy(), self.table[1:].copy(),
+                     self.table.transpose().copy().transpose().copy()):
+            self.assertIsInstance(copy, self.table_class)
+            copy.set_cell(0, 0, 1)
+            copy.append_row([1, 2], 'new')
+            self.assertEqual(self.table, [[0, 0], [0, 0], [0, 0]])
+        self.assertEqual(copy.row_names, ['row1', 'row2', 'row3', 'new'])
+        column = self.table[:, 0].copy()
+        column[0] = 1
+        self.assertEqual(self.table[0, 0], 0)
+
+    def test_aggregate(self):
+        """tests aggregates over blocks of cells"""
+        self.table.set_column(0, [1, 2, 3])
+        self.table.set_column(1, [4, 5, 9])
+        self.assertEqual(self.table.aggregate('sum'), 24)
+        self.assertEqual(self.table.aggregate('count'), 6)
+        self.assertEqual(self.table.aggregate('sum', cols='col2'), 18)
+        self.assertEqual(self.table.aggregate('avg', rows=-1), 6)
+        self.assertEqual(self.table.aggregate('max', rows=slice(2)), 5)
+        self.assertEqual(self.table.aggregate('min', 'row2', 1), 5)
+        self.assertEqual(self.table.aggregate('median', cols=1), 5)
+        self.assertEqual(self.table.aggregate('sum', axis=0), [6, 18])
+        self.assertEqual(self.table.aggregate('sum', axis=1), [5, 7, 12])
+        self.assertEqual(self.table.aggregate('avg', slice(3, None)), None)
+        self.assertEqual(self.table.aggregate('max', slice(3, None)), None)
+        self.assertEqual(self.table[1:].aggregate('sum', cols=0), 5)
+        self.assertEqual(self.table.transpose().aggregate('sum', axis=0),
+                         [5, 7, 12])
+
+    def test_percentile(self):
+        """tests percentile aggregates interpolate between values"""
+        self.table.append_column([1.5, 3.5, 2.5], 'col3')
+        self.assertEqual(self.table.aggregate(percentile(50), cols=2), 2.5)
+        self.assertEqual(self.table.aggregate(percentile(25), cols=2), 2.0)
+        self.assertEqual(self.table.aggregate(percentile(100), cols=2), 3.5)
+        self.assertEqual(self.table.aggregate('sum', cols=2), 7.5)
+
+    def test_where(self):
+        """tests where() returns views on matching rows, with or without
+        indexes"""
+        self.table.set_column(0, [1, 2, 1])
+        self.table.set_column(1, [3, 3, 4])
+        for indexed in ((), ('col1',), ('col1', 'col2')):
+            for colname in indexed:
+                self.table.create_index(colname)
+            rows = self.table.where(col1=1)
+            self.assertEqual(rows, [[1, 3], [1, 4]])
+            self.assertEqual(rows.row_names, ['row1', 'row3'])
+            self.assertEqual(self.table.where(col1=1, col2=4), [[1, 4]])
+            self.assertEqual(self.table.where(col1=2, col2=4), [])
+            self.assertEqual(self.table.where(col1=5), [])
+            self.assertEqual(len(self.table.where()), 3)
+            self.assertEqual(self.table.select('col2', 3), [[1, 3], [2, 3]])
+            self.assertRaises(KeyError, self.table.where, col3=1)
+        rows[1][1] = 5
+        self.assertEqual(self.table[2, 1], 5)
+        self.assertRaises(TypeError, rows.create_index, 'col1')
+
+    def test_index_maintained(self):
+        """tests indexes are kept up to date as the table is modified"""
+        self.table.create_index('col1')
+        self.assertEqual(len(self.table.select('col1', 0)), 3)
+        self.table.set_cell(0, 0, 1)
+        self.table.set_row(1, [1, 1])
+        self.assertEqual(self.table.select('col1', 1).row_names,
+                         ['row1', 'row2'])
+        self.table.append_row([1, 2], 'row4')
+        self.table.create_row('row5')
+        self.assertEqual(self.table.select('col1', 1).row_names,
+                         ['row1', 'row2', 'row4'])
+        self.assertEqual(self.table.select('col1', 0).row_names,
+                         ['row3', 'row5'])
+        self.table.set_cell(-1, 0, 1)
+        self.table.delete_row(0)
+        self.table.insert_row(0, [1, 0], 'row0')
+        self.assertEqual(self.table.select('col1', 1).row_names,
+                         ['row0', 'row2', 'row4', 'row5'])
+        self.table.sort_by_column_id('col2', 'desc')
+        self.assertEqual(self.table.select('col1', 1).row_names,
+                         ['row4', 'row2', 'row5', 'row0'])
+        self.table.set_column(0, [0, 0, 0, 0, 1])
+        self.assertEqual(self.table.select('col1', 1).row_names, ['row3'])
+        self.table.remove('col1', 1)
+        self.assertEqual(self.table.select('col1', 1), [])
+        self.table.insert_column(0, [1, 1, 1, 1], 'col0')
+        self.assertEqual(len(self.table.select('col1', 0)), 4)
+        self.table.drop_index('col1')
+        self.table.create_index('col2')
+        self.table.delete_column_by_id('col2')
+        self.assertRaises(KeyError, self.table.where, col2=1)
+        self.table.create_index('col1')
+        self.table.col_names = ['a', 'b']
+        self.assertEqual(len(self.table.where(b=0)), 4)
+
+    def test_column_values(self):
+        """tests columns values may be read from a negative index"""
+        self.table.set_column(1, [1, 2, 3])
+        self.assertEqual(list(self.table._column_values(-1)), [1, 2, 3])
+        self.assertEqual(list(self.table._column_values(-1, 1)), [2, 3])
+
+    def test_index_updated(self):
+        """tests indexes are updated, not rebuilt, on insert and delete"""
+        import random
+        rand = random.Random(0)
+        table = self.table
+        table.create_index('col1')
+        for step in range(200):
+            table.select('col1', 0)
+            values_index = table._value_indexes['col1']
+            index = rand.randint(-len(table) - 1, len(table) + 1)
+            if rand.random() < 0.6 or len(table) < 2:
+                table.insert_row(index, [rand.randint(0, 3), 0])
+            else:
+                table.delete_row(max(min(index, len(table) - 1), -len(table)))
+            self.assertIs(table._value_indexes['col1'], values_index)
+            for value in range(4):
+                self.assertEqual(
+                    [row[0] for row in table.select('col1', value)],
+                    [value] * table.get_column(0).count(value))
+        self.assertRaises(IndexError, table.delete_row, len(table))
+        self.assertEqual(values_index.nrows, len(table))
+
+    def test_aggregate_cells_bad_values(self):
+        """tests nothing is updated when a value can't be aggregated or
+        indexed"""
+        table = self.table_class(col_names=['a', 'b', 'sum'])
+        table.append_row([1, 2, 0], 'r1')
+        table.append_row([3, 4, 0], 'r2')
+        table.create_row('total')
+        table.create_index('a')
+        table.add_aggregate_cell(('r1', 'sum'), 'sum', rows='r1',
+                                 cols=slice(0, 2))
+        table.add_aggregate_cell(('total', 'a'), 'sum', rows=slice(0, 2),
+                                 cols='a')
+        expected = [[1, 2, 3], [3, 4, 0], [4, 0, 0]]
+        self.assertEqual(table, expected)
+        self.assertRaises(TypeError, table.set_cell, 0, 0, 'x')
+        self.assertRaises(TypeError, table.set_cell, 0, 1, None)
+        self.assertRaises(TypeError, table.set_row, 0, [5, 'x', 0])
+        self.assertRaises(TypeError, table.set_row, 0, [[5], 2, 0])
+        self.assertRaises(TypeError, table.insert_row, 1, ['x', 0, 0])
+        self.assertRaises(TypeError, table.insert_row, 0, [[1], 0, 0])
+        self.assertEqual(table, expected)
+        self.assertEqual(table.row_names, ['r1', 'r2', 'total'])
+        self.assertEqual(table.select('a', 1).row_names, ['r1'])
+        self.assertEqual(table.select('a', 5), [])
+        table.set_cell(0, 0, 5)
+        table.insert_row(1, [2, 0, 0], 'r3')
+        self.assertEqual(table, [[5, 2, 7], [2, 0, 0], [3, 4, 0], [10, 0, 0]])
+        self.assertEqual(table.select('a', 3).row_names, ['r2'])
+
+    def test_aggregate_cells(self):
+        """tests aggregate cells are kept up to date as the table is modified"""
+        table = self.table_class(col_names=['a', 'b', 'sum'])
+        table.append_row([1, 2, 0], 'r1')
+        table.append_row([3, 4, 0], 'r2')
+        table.create_row('total')
+        table.add_aggregate_cell(('r1', 'sum'), 'sum', rows='r1',
+                                 cols=slice(0, 2))
+        table.add_aggregate_cell((1, 2), 'sum', rows=1, cols=slice(0, 2))
+        table.add_aggregate_cell(('total', 'a'), 'sum', rows=slice(0, 2),
+                                 cols='a')
+        table.add_aggregate_cell(('total', 'sum'), 'sum', rows=slice(0, 2),
+                                 cols='sum')
+        self.assertEqual(table.get_column(2), [3, 7, 10])
+        self.assertEqual(table.get_cell(2, 0), 4)
+        table.set_cell(0, 1, 5)
+        self.assertEqual(table.get_column(2), [6, 7, 13])
+        table.set_row(1, [10, 10, 99])
+        self.assertEqual(table.get_column(2), [6, 20, 26])
+        self.assertEqual(table.get_cell(2, 0), 11)
+        table.delete_row(0)
+        self.assertEqual(table.get_column(2), [20, 20])
+        self.assertEqual(table.get_cell(1, 0), 10)
+        table.insert_row(0, [5, 5, 1], 'r0')
+        self.assertEqual(table.get_column(2), [1, 20, 21])
+        self.assertEqual(table.get_cell(2, 0), 15)
+        table.remove_aggregate_cell(('total', 'a'))
+        table.set_cell(0, 0, 0)
+        self.assertEqual(table.get_cell(2, 0), 15)
+        self.assertRaises(KeyError, table.remove_aggregate_cell, (2, 0))
+
+    def test_aggregate_cells_appended(self):
+        """tests aggregate cells of open ranges follow appended rows"""
+        table = self.table_class(col_names=['v', 'stats'])
+        table.create_rows(['count', 'avg'])
+        table.add_aggregate_cell(('count', 'stats'), 'count', cols='v')
+        table.add_aggregate_cell(('avg', 'stats'), 'avg', rows=slice(2, None),
+                                 cols='v')
+        self.assertEqual(table.get_column(1), [2, None])
+        table.append_row([4, 0])
+        table.append_row([6, 0])
+        table.create_row()
+        self.assertEqual(table.get_column(1)[:2], [5, 10 / 3.])
+        table.delete_row(-1)
+        table.delete_row(2)
+        self.assertEqual(table.get_column(1)[:2], [3, 6.])
+        table.set_column(0, [0, 0, 8])
+        self.assertEqual(table.get_column(1)[:2], [3, 8.])
+        # reordering rows drops aggregate cells
+        table.sort(['v'])
+        table.append_row([1, 0])
+        self.assertEqual(table.get_column(1)[:2], [3, 8.])
+
+    def test_aggregate_cells_errors(self):
+        self.assertRaises(ValueError, self.table.add_aggregate_cell, (0, 1),
+                          'max', cols=0)
+        self.assertRaises(ValueError, self.table.add_aggregate_cell, (0, 1),
+                          'sum', rows=0, cols=0)
+        self.assertRaises(ValueError, self.table.add_aggregate_cell, (0, 1),
+                          'sum', cols=1)
+        self.table.add_aggregate_cell((0, 'col2'), 'sum', rows=slice(1, None),
+                                      cols='col1')
+        self.assertRaises(ValueError, self.table.add_aggregate_cell,
+                          (1, 'col1'), 'sum', rows=slice(0, 1), cols='col2')
+        self.assertRaises(TypeError, self.table.transpose().add_aggregate_cell,
+                          (0, 0), 'sum', cols=1)
+
+    def test_join(self):
+        """tests joining rows of two tables on some columns"""
+        self.table.set_column(0, [1, 2, 3])
+        self.table.set_column(1, ['a', 'b', 'a'])
+        other = self.table_class(col_names=['key', 'col2', 'value'])
+        other.append_row([1, 'a', 10], 'o1')
+        other.append_row([3, 'a', 30], 'o2')
+        other.append_row([1, 'a', 11], 'o3')
+        other.append_row([1, 'b', 12], 'o4')
+        joined = self.table.join(other, 'col2')
+        self.assertIsInstance(joined, self.table_class)
+        self.assertEqual(joined.col_names, ['col1', 'col2', 'key', 'value'])
+        self.assertEqual(joined.row_names,
+                         ['row1', 'row1', 'row1', 'row2', 'row3', 'row3',
+                          'row3'])
+        self.assertEqual(joined.get_column_by_id('value'),
+                         [10, 30, 11, 12, 10, 30, 11])
+        self.table.col_names = ['key', 'col2']
+        joined = self.table.join(other, ['key', 'col2'])
+        self.assertEqual(joined, [[1, 'a', 10], [1, 'a', 11], [3, 'a', 30]])
+        other.create_index('key')
+        joined = self.table[1:].join(other, 'key', how='left')
+        self.assertEqual(joined.col_names, ['key', 'col2', 'col2', 'value'])
+        self.assertEqual(joined, [[2, 'b', 0, 0], [3, 'a', 'a', 30]])
+        self.assertRaises(ValueError, self.table.join, other, 'key', 'outer')
+        self.assertRaises(KeyError, self.table.join, other, 'value')
+
+    def test_csv(self):
+        """tests writing and reading back tables as CSV"""
+        self.table.set_column(0, [1, 2, 3])
+        self.table.append_column([0.5, 2, 3], 'col3')
+        self.table.append_column(['a', 'b', 'c d'], 'col4')
+        stream = StringIO()
+        self.table.to_csv(stream, chunk_rows=2)
+        self.assertEqual(stream.getvalue().splitlines(),
+                         ['col1,col2,col3,col4', '1,0,0.5,a', '2,0,2,b',
+                          '3,0,3,c d'])
+        stream.seek(0)
+        table = self.table_class.from_csv(stream)
+        self.assertIsInstance(table, self.table_class)
+        self.assertEqual(table, self.table)
+        self.assertEqual(table.col_names, self.table.col_names)
+        self.assertEqual(table.row_names, ['row1', 'row2', 'row3'])
+        self.assertEqual([type(value) for value in table[2]],
+                         [int, int, float, str])
+        stream = StringIO()
+        self.table.to_csv(stream, row_names=True, delimiter='\t')
+        stream.seek(0)
+        table = self.table_class.from_csv(stream, row_names=True,
+                                          delimiter='\t')
+        self.assertEqual(table.row_names, self.table.row_names)
+        self.assertEqual(table, self.table)
+        self.assertEqual(self.table_class.from_csv(StringIO()).shape, (0, 0))
+
+    def test_binary(self):
+        """tests writing tables in binary format and memory mapping them"""
+        self.table.set_column(0, [1, -2, 2**40])
+        self.table.append_column([0.5, 2., -3.25], 'col3')
+        self.table.append_column(['a', '', u'\xe9t\xe9'], 'col4')
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            self.table.to_binary(path)
+            table = self.table_class.open_mmap(path)
+            try:
+                self.assertIsInstance(table, MmapTable)
+                self.assertEqual(table.shape, (3, 4))
+                self.assertEqual(table.col_names, self.table.col_names)
+                self.assertEqual(table.row_names, self.table.row_names)
+                self.assertEqual(table, self.table)
+                self.assertEqual(table['row3', 'col1'], 2**40)
+                self.assertEqual(table[:, 'col4'], ['a', '', u'\xe9t\xe9'])
+                self.assertEqual(table[::-2, 'col3'], [-3.25, 0.5])
+                self.assertEqual(table.aggregate('sum', cols='col3'), -0.75)
+                self.assertEqual(table.select('col1', -2).row_names, ['row2'])
+                self.assertRaises(TypeError, table.set_cell, 0, 0, 1)
+                self.assertRaises(TypeError, table.append_row, [1, 2, 3, 4])
+                copy = table.copy()
+                copy.set_cell(0, 0, 5)
+                self.assertEqual(copy[0], [5, 0, 0.5, 'a'])
+                self.assertEqual(table[0], [1, 0, 0.5, 'a'])
+            finally:
+                table.close()
+            self.table.set_cell(0, 0, None)
+            self.assertRaises(TypeError, self.table.to_binary, path)
+            self.table.set_cell(0, 0, 2**63)
+            self.assertRaises(OverflowError, self.table.to_binary, path)
+            self.table.set_cell(0, 0, -2**63)
+            self.table.set_column(3, ['a\0', '\0', u'\xe9\0t\0\0'])
+            self.table.to_binary(path)
+            table = self.table_class.open_mmap(path)
+            try:
+                self.assertEqual(table[0, 0], -2**63)
+                self.assertEqual(table[:, 'col4'], ['a\0', '\0',
+                                                    u'\xe9\0t\0\0'])
+                self.assertEqual(table[1, 'col4'], '\0')
+            finally:
+                table.close()
+            self.table_class().to_binary(path)
+            table = self.table_class.open_mmap(path)
+            self.assertEqual(table.shape, (0, 0))
+            table.close()
+        finally:
+            os.remove(path)
+
+    def test_csv_chunks(self):
+        """tests reading CSV by chunks"""
+        stream = StringIO('a,b,c\n1,x,1\n2,y,2\n\n3,z,3.5\n4,t,a\n')
+        tables = list(self.table_class.iter_csv(stream, chunk_rows=2))
+        self.assertEqual(len(tables), 2)
+        self.assertEqual(tables[0], [[1, 'x', 1], [2, 'y', 2]])
+        self.assertEqual(tables[1], [[3, 'z', '3.5'], [4, 't', 'a']])
+        self.assertEqual(tables[1].row_names, ['row3', 'row4'])
+        # types don't depend on chunk_rows when reading the whole file
+        for chunk_rows in (1, 2, 10):
+            stream.seek(0)
+            table = self.table_class.from_csv(stream, chunk_rows=chunk_rows)
+            self.assertEqual(table.get_column_by_id('a'), [1, 2, 3, 4])
+            self.assertEqual(table.get_column_by_id('c'),
+                             ['1', '2', '3.5', 'a'])
+        floats = StringIO('a,b\n1,2\n3,4.5\n5,6\n')
+        table = self.table_class.from_csv(floats, chunk_rows=1)
+        self.assertEqual([type(value) for value in table[:, 'b']], [float] * 3)
+        stream.seek(0)
+        table = self.table_class.from_csv(stream, types=[float, str, str])
+        self.assertEqual(table.get_column_by_id('a'), [1., 2., 3., 4.])
+        stream.seek(0)
+        self.assertRaises(ValueError, self.table_class.from_csv, stream,
+                          types=[int, int, str])
+        stream.seek(0)
+        self.assertRaises(ValueError, self.table_class.from_csv, stream,
+                          types=[int])
+        stream = StringIO('a,b\n1,2\n\n3\n')
+        with self.assertRaises(ValueError) as cm:
+            self.table_class.from_csv(stream)
+        self.assertEqual(str(cm.exception),
+                         'line 4 should have 2 fields, got 1')
+
+
+class ColumnarTableTC(TableTC):
+    """runs Table tests on ColumnarTable, plus specific ones"""
+    table_class = ColumnarTable
+
+    def test_typed_columns(self):
+        """tests integers and floats columns are stored in arrays"""
+        self.table.append_column([1.5, 2.5, 3.5], 'col3')
+        self.assertEqual(self.table._columns[0].typecode, INT_TYPECODE)
+        self.assertEqual(self.table._columns[2].typecode, 'd')
+        self.table.set_cell(0, 2, 4.5)
+        self.assertEqual(self.table._columns[2].typecode, 'd')
+        # another type: turned into a list, values unchanged
+        self.table.set_cell(1, 0, 'a')
+        self.assertIsInstance(self.table._columns[0], list)
+        self.assertEqual(self.table.get_column(0), [0, 'a', 0])
+        self.table.set_cell(0, 1, 2**70)
+        self.assertEqual(self.table.get_column(1), [2**70, 0, 0])
+        self.table.set_cell(0, 2, True)
+        self.assertIs(self.table[0, 2], True)
+
+    def test_typecode(self):
+        """tests columns with explicit type code"""
+        self.table.create_column('col3', 'd')
+        self.table.set_cell(0, 2, 1)
+        self.assertEqual(self.table.get_column(2), [1., 0., 0.])
+        self.assertIsInstance(self.table[0, 2], float)
+        self.assertRaises(TypeError, self.table.set_cell, 0, 2, 'a')
+
+    def test_empty_column_type(self):
+        """tests type of columns created without rows is inferred later"""
+        tab = ColumnarTable(col_names=['a', 'b'])
+        tab.append_row([1.5, 'x'])
+        tab.append_row([2.5, 'y'])
+        self.assertEqual(tab._columns[0].typecode, 'd')
+        self.assertIsInstance(tab._columns[1], list)
+        self.assertEqual(tab, [[1.5, 'x'], [2.5, 'y']])
+
+    def test_rows_views(self):
+        """tests rows views read and write through columns"""
+        row = self.table.data[1]
+        row[1] = 5
+        self.assertEqual(self.table[1, 1], 5)
+        self.assertEqual(row, [0, 5])
+        self.assertEqual(row[-1:], [5])
+        self.table.data[2] = [3, 4]
+        self.assertEqual(self.table.get_row_by_id('row3'), [3, 4])
+        self.assertEqual(repr(self.table), '[[0, 0], [0, 5], [3, 4]]')
+        self.assertRaises(IndexError, self.table.data.__getitem__, 3)
+
+    def test_rows_length(self):
+        """tests rows with a wrong number of values are refused"""
+        self.assertRaises(ValueError, self.table.append_row, [1])
+        self.assertRaises(ValueError, self.table.insert_row, 0, [1, 2, 3])
+        self.assertRaises(ValueError, self.table.append_column, [1], 'col3')
+        self.assertEqual(self.table.shape, (3, 2))
+
+    def test_delete_row(self):
+        self.table.set_column(0, [1, 2, 3])
+        self.assertEqual(self.table.delete_row(1), [2, 0])
+        self.assertEqual(self.table, [[1, 0], [3, 0]])
+        self.assertEqual(self.table.row_names, ['row1', 'row3'])
+        self.assertRaises(IndexError, self.table.delete_row, 2)
+
+    def test_transpose_columnar(self):
+        self.table.set_column(0, [1, 2, 3])
+        ttable = self.table.transpose().copy()
+        self.assertIsInstance(ttable, ColumnarTable)
+        self.assertEqual(ttable._columns[0].typecode, INT_TYPECODE)
+        ttable.append_row([4, 5, 6], 'col3')
+        self.assertEqual(ttable.data, [[1, 2, 3], [0, 0, 0], [4, 5, 6]])
+
+    def test_sort_ties(self):
+        """tests ties are sorted as with Table"""
+        table = Table(col_names=['col1', 'col2'],
+                      row_names=['row1', 'row2', 'row3'])
+        for tab in (table, self.table):
+            tab.create_row('row4')
+            tab.set_column(0, [2, 1, 2, 1])
+            tab.set_column(1, [3, 1, 2, 1])
+            tab.sort_by_column_index(0, 'desc')
+        self.assertEqual(self.table.data, table.data)
+        self.assertEqual(self.table.row_names, table.row_names)
+
+    def test_stylesheet(self):
+        self.table.set_row(0, [3, 4])
+        self.table.create_column('col3')
+        self.table.apply_stylesheet(TableStyleSheet(['0_2 = 0_0 + 0_1']))
+        self.assertEqual(self.table[0], [3, 4, 7])
+
+
+class SparseTableTC(TableTC):
+    """runs Table tests on SparseTable, plus specific ones"""
+    table_class = SparseTable
+
+    def test_sparse_storage(self):
+        """tests only non-default cells are stored"""
+        self.table.create_rows(['row%s' % index for index in range(4, 1001)])
+        self.table.create_columns(['col%s' % index for index in range(3, 1001)])
+        self.assertEqual(self.table.shape, (1000, 1000))
+        self.assertEqual(self.table.count_cells(), 0)
+        self.table.set_cell(10, 20, 1)
+        self.table.set_cell(-1, -1, 2)
+        self.table.set_cell(10, 21, 0.)
+        self.assertEqual(self.table.count_cells(), 3)
+        self.assertEqual(self.table[999, 999], 2)
+        self.assertEqual(self.table[10, 19:22], [0, 1, 0.])
+        self.assertIsInstance(self.table[10, 21], float)
+        self.table.set_cell(10, 20, 0)
+        self.table.set_cell(10, 21, 0)
+        self.assertEqual(self.table.count_cells(), 1)
+        self.assertRaises(IndexError, self.table.get_cell, 0, 1000)
+        self.assertRaises(IndexError, self.table.set_cell, 0, -1001, 1)
+        self.assertRaises(IndexError, self.table.get_cell, 1000, 0)
+
+    def test_sparse_columns(self):
+        """tests columns insertion and deletion move stored cells"""
+        self.table.set_row(1, [1, 2])
+        self.table.insert_column(1, [0, 3, 0], 'new')
+        self.assertEqual(self.table, [[0, 0, 0], [1, 3, 2], [0, 0, 0]])
+        self.assertEqual(self.table.delete_column(0), [0, 1, 0])
+        self.assertEqual(self.table, [[0, 0], [3, 2], [0, 0]])
+        self.table.insert_column(-10, [4, 0, 0], 'first')
+        self.assertEqual(self.table, [[4, 0, 0], [0, 3, 2], [0, 0, 0]])
+        self.assertEqual(self.table.count_cells(), 3)
+
+    def test_sparse_text(self):
+        """tests text outputs are those of a dense table"""
+        self.table.set_cell(1, 0, 1)
+        dense = Table(col_names=self.table.col_names,
+                      row_names=self.table.row_names)
+        dense.set_cell(1, 0, 1)
+        self.assertEqual(self.table.pprint(), dense.pprint())
+        self.assertEqual(self.table.as_text(), dense.as_text())
+        self.assertEqual(self.table.transpose().as_text(),
+                         dense.transpose().as_text())
+        self.assertEqual(self.table.transpose().copy().count_cells(), 1)
+
 
 class GroupByTC(TestCase):
     """specific test suite for groupby()"""
@@ -255,6 +906,44 @@ class GroupByTC(TestCase):
         date3 = grouped['date3']
         self.assertRaises(KeyError, date3.__getitem__, 'task1')
 
+    def test_groupby_dict(self):
+        """tests groupby() returns a dictionary"""
+        grouped = self.table.groupby('date', 'task')
+        self.assertIsInstance(grouped, dict)
+        self.assertIsInstance(grouped['date1'], dict)
+        self.assertEqual(sorted(dict(grouped)), ['date1', 'date2', 'date3'])
+        del grouped['date2']
+        grouped.setdefault('date4', {})
+        self.assertEqual(sorted(grouped), ['date1', 'date3', 'date4'])
+        self.assertEqual(grouped['date3']['task3'].row_names, ['row1'])
+
+    def test_groupby_agg(self):
+        """tests aggregates computed per group"""
+        self.table.set_column_by_id('usage', [0.5, 0.25, 1., 2., 0.5, 4.])
+        totals = self.table.groupby('date').agg(('usage', 'sum'),
+                                                ('task', 'count'),
+                                                ('usage', 'max'),
+                                                ('usage', 'median'))
+        self.assertEqual(totals.col_names, ['date', 'sum_usage', 'count_task',
+                                            'max_usage', 'median_usage'])
+        self.assertEqual(totals, [['date1', 1.25, 3, 0.5, 0.5],
+                                  ['date2', 1., 1, 1., 1.],
+                                  ['date3', 6., 2, 4., 3.]])
+        totals = self.table.groupby('res', 'date').agg(('usage', 'avg'))
+        self.assertEqual(totals.get_column_by_id('avg_usage'),
+                         [0.5, 0.25, 1., 2., 4.])
+        self.assertEqual(totals.get_column_by_id('res'),
+                         ['ing1', 'ing2', 'ing3', 'ing4', 'ing1'])
+        columnar = ColumnarTable(col_names=self.table.col_names)
+        columnar.row_names = list(self.table.row_names)
+        columnar.data = self.table.data
+        totals = columnar.groupby('task').agg(('usage', percentile(100)))
+        self.assertIsInstance(totals, ColumnarTable)
+        self.assertEqual(totals.col_names, ['task', 'percentile100_usage'])
+        self.assertEqual(totals, [['task1', 0.5], ['task2', 2.], ['task3', 4.]])
+        self.assertEqual(sorted(columnar.groupby('task')), ['task1', 'task2',
+                                                            'task3'])
+
 
     def test_select(self):
         """tests Table.select() method"""
@@ -345,6 +1034,51 @@ class TableStyleSheetTC(TestCase):
         val = self.table[2, 0]
         self.assertEqual(val, 22)
 
+    def test_aggregate_rule(self):
+        """Tests that add_aggregate_rule works as expected
+        """
+        self.table.set_row(0, [10, 20, 0])
+        self.table.append_row([12, 8, 3], 'row2')
+        self.stylesheet.add_aggregate_rule((1, 2), 'max', None, slice(2))
+        self.table.apply_stylesheet(self.stylesheet)
+        self.assertEqual(self.table[1, 2], 20)
+
+    def test_rules_update_table(self):
+        """Tests rules keep indexes and aggregate cells up to date
+        """
+        self.table.append_row([1, 2, 0], 'row2')
+        self.table.create_index('a')
+        self.table.add_aggregate_cell((1, 2), 'sum', cols='a')
+        self.table.apply_stylesheet(TableStyleSheet(['0_0 = 5']))
+        self.assertEqual(self.table.select('a', 5).row_names, ['row1'])
+        self.assertEqual(self.table[1, 2], 6)
+        # rules which can't set a single cell write cells directly
+        self.table.apply_stylesheet(TableStyleSheet(['0_0 += 1']))
+        self.assertEqual(self.table.select('a', 6).row_names, ['row1'])
+        self.assertEqual(self.table.select('a', 5), [])
+        self.assertEqual(self.table[1, 2], 7)
+
+    def test_aggregate_rule_text(self):
+        """Tests aggregate rules may be given back to the constructor
+        """
+        self.table.set_row(0, [10, 20, 0])
+        self.table.append_row([12, 8, 3], 'row2')
+        self.stylesheet.add_aggregate_rule((1, 2), 'max', None, slice(2))
+        self.stylesheet.add_aggregate_rule((0, 2), 'sum', 'row2', 'b')
+        self.stylesheet.add_aggregate_rule((0, 0), max, None, None)
+        self.assertEqual(len(self.stylesheet.rules), 2)
+        self.table.apply_stylesheet(TableStyleSheet(self.stylesheet.rules))
+        self.assertEqual(self.table[1, 2], 20)
+        self.assertEqual(self.table[0, 2], 8)
+
+    def test_range_rules_text(self):
+        """Tests rules of range helpers may be given back to the constructor
+        """
+        self.table.set_row(0, [10, 20, 0])
+        self.stylesheet.add_rowavg_rule((0, 2), 0, 0, 1)
+        self.table.apply_stylesheet(TableStyleSheet(self.stylesheet.rules))
+        self.assertEqual(self.table[0, 2], 15)
+
 
 
 class TableStyleTC(TestCase):
@@ -151,6 +151,116 @@ class Node_ClassTest(TestCase):
                                          self.o])
 
 
+class IdIndexTC(TestCase):
+
+    def setUp(self):
+        self.o = make_tree(tree)
+        self.o.children[0].index_ids()
+
+    def test_lookups(self):
+        o = self.o
+        c22 = o.get_node_by_id('child_2_2')
+        self.assertIs(c22, o.children[0].children[1])
+        self.assertIs(c22.get_node_by_id('child_2_3'), o.children[1].children[0])
+        self.assertIs(o.get_child_by_id('child_3_1', True), c22.children[0])
+        self.assertIs(c22.get_child_by_id('child_3_1'), c22.children[0])
+        self.assertRaises(NodeNotFound, o.get_child_by_id, 'child_3_1')
+        self.assertRaises(NodeNotFound, c22.get_child_by_id, 'child_2_3', True)
+        self.assertRaises(NodeNotFound, o.get_node_by_id, 'houhou')
+
+    def test_updates(self):
+        o = self.o
+        c11 = o.get_node_by_id('child_1_1')
+        o.remove(c11)
+        self.assertRaises(NodeNotFound, o.get_node_by_id, 'child_2_1')
+        self.assertRaises(NodeNotFound, c11.get_node_by_id, 'child_1_2')
+        o.insert(0, make_tree(('new', (('new_child', ()),))))
+        self.assertIs(o.get_node_by_id('new_child'), o.children[0].children[0])
+        o.children[0].append(c11)
+        self.assertIs(o.get_child_by_id('child_3_1', True),
+                      c11.children[1].children[0])
+        o.replace(o.children[1], Node('hoho'))
+        self.assertIs(o.get_node_by_id('hoho'), o.children[1])
+        self.assertRaises(NodeNotFound, o.get_node_by_id, 'child_2_3')
+        self.assertEqual(sorted(o._index), sorted(n.id for n in o.flatten()))
+
+    def test_shared_ids(self):
+        o = self.o
+        c22 = o.get_node_by_id('child_2_2')
+        o.children[1].append(Node('child_2_2'))
+        # the first node in pre order is returned, as without index
+        self.assertIs(o.get_node_by_id('child_2_2'), c22)
+        self.assertIs(o.children[1].get_child_by_id('child_2_2'),
+                      o.children[1].children[1])
+        o.remove(o.children[0])
+        self.assertIs(o.get_node_by_id('child_2_2'), o.children[0].children[1])
+
+    def test_attach_to_unindexed_tree(self):
+        c11 = self.o.get_node_by_id('child_1_1')
+        c31 = self.o.get_node_by_id('child_3_1')
+        self.o.remove(c11)
+        c11.index_ids()
+        parent = Node('parent')
+        parent.append(c11)
+        # the subtree left its index, lookups walk the tree again
+        self.assertIs(c31.get_node_by_id('parent'), parent)
+        self.assertIs(parent.get_child_by_id('child_3_1', True), c31)
+        self.assertIsNone(c31._index)
+        parent = ListNode()
+        parent.id = 'list_parent'
+        parent.insert(0, c11)
+        self.assertIs(c31.get_node_by_id('list_parent'), parent)
+        c11.parent.remove(c11)
+        c11.index_ids()
+        parent = make_tree(('parent', (('old', ()),)))
+        parent.replace(parent.children[0], c11)
+        self.assertIs(c31.get_node_by_id('parent'), parent)
+
+    def test_move_to_other_tree(self):
+        o = self.o
+        c11 = o.get_node_by_id('child_1_1')
+        other = make_tree(('other', ()))
+        other.index_ids()
+        other.append(c11)
+        # c11's subtree moved from o's index to other's one
+        self.assertRaises(NodeNotFound, o.get_node_by_id, 'child_3_1')
+        self.assertRaises(NodeNotFound, o.get_child_by_id, 'child_1_1', True)
+        self.assertIs(other.get_node_by_id('child_3_1'),
+                      c11.children[1].children[0])
+        self.assertEqual(sorted(o._index), ['child_1_2', 'child_2_3', 'root'])
+        self.assertEqual(sorted(other._index),
+                         sorted(n.id for n in other.flatten()))
+
+    def test_binary_node(self):
+        lhs, rhs = VNode('lhs'), VNode('rhs')
+        root = VNode('root')
+        root.append(BinaryNode(lhs, rhs))
+        root.index_ids()
+        root.children[0].remove(lhs)
+        self.assertIs(root.get_node_by_id('rhs'), rhs)
+        self.assertRaises(NodeNotFound, root.get_node_by_id, 'lhs')
+        self.assertRaises(NodeNotFound, root.get_node_by_id, None)
+
+
+class SiblingsTC(TestCase):
+
+    def test_siblings(self):
+        o = make_tree(tree)
+        c11, c12 = o.children
+        self.assertIs(c11.next_sibling(), c12)
+        self.assertIs(c12.previous_sibling(), c11)
+        self.assertIs(c12.next_sibling(), None)
+        self.assertIs(o.next_sibling(), None)
+        new = Node('new')
+        o.insert(0, new)
+        self.assertIs(c11.previous_sibling(), new)
+        self.assertIs(new.next_sibling(), c11)
+        o.remove(new)
+        self.assertIs(c11.previous_sibling(), None)
+        o.children.reverse()
+        self.assertIs(c11.previous_sibling(), c12)
+
+
 class post_order_list_FunctionTest(TestCase):
     """"""
     def setUp(self):
@@ -243,5 +353,76 @@ class PrefixedDepthFirstIterator_ClassTest(TestCase):
             i += 1
 
 
+class TraversalsTC(TestCase):
+
+    def setUp(self):
+        self.o = make_tree(tree)
+
+    def ids(self, nodes):
+        return [n.id for n in nodes]
+
+    def test_generators(self):
+        self.assertEqual(self.ids(pre_order_iter(self.o)),
+                         self.ids(pre_order_list(self.o)))
+        self.assertEqual(self.ids(post_order_iter(self.o)),
+                         self.ids(post_order_list(self.o)))
+        self.assertEqual(self.ids(breadth_first_iter(self.o)),
+                         ['root', 'child_1_1', 'child_1_2', 'child_2_1',
+                          'child_2_2', 'child_2_3', 'child_3_1'])
+        self.assertEqual(self.ids(leaves_iter(self.o)),
+                         self.ids(self.o.leaves()))
+
+    def test_filter(self):
+        """a rejected node and its subtree are skipped, not its siblings"""
+        def filter(node):
+            return node.id != 'child_1_1'
+        self.assertEqual(self.ids(pre_order_iter(self.o, filter)),
+                         ['root', 'child_1_2', 'child_2_3'])
+        self.assertEqual(self.ids(post_order_list(self.o, filter)),
+                         ['child_2_3', 'child_1_2', 'root'])
+        self.assertEqual(self.ids(breadth_first_iter(self.o, filter)),
+                         ['root', 'child_1_2', 'child_2_3'])
+        self.assertEqual(self.ids(leaves_iter(self.o, filter)), ['child_2_3'])
+        self.assertEqual(self.ids(post_order_iter(self.o, lambda n: False)), [])
+
+    def test_list_filter(self):
+        """the list builders skip the subtree of a rejected node only, unlike
+        before 1.4 where it ended the walk of its next siblings too
+        """
+        def filter(node):
+            return node.id != 'child_2_1'
+        self.assertEqual(self.ids(pre_order_list(self.o, filter)),
+                         ['root', 'child_1_1', 'child_2_2', 'child_3_1',
+                          'child_1_2', 'child_2_3'])
+        self.assertEqual(self.ids(post_order_list(self.o, filter)),
+                         ['child_3_1', 'child_2_2', 'child_1_1', 'child_2_3',
+                          'child_1_2', 'root'])
+
+    def test_empty_list_nodes(self):
+        """empty ListNode instances are false but don't end the walk"""
+        root, empty, full = ListNode(), ListNode(), ListNode()
+        leaf = Node('leaf')
+        root.append(empty)
+        root.append(full)
+        full.append(leaf)
+        self.assertEqual(pre_order_list(root), [root, empty, full, leaf])
+        self.assertEqual(post_order_list(root), [empty, leaf, full, root])
+
+    def test_deep_tree(self):
+        root = node = Node(0)
+        for index in range(1, 100000):
+            child = Node(index)
+            node.append(child)
+            node = child
+        self.assertEqual(len(root.flatten()), 100000)
+        self.assertEqual(len(post_order_list(root)), 100000)
+        self.assertEqual(root.leaves(), [node])
+        self.assertEqual(root.width(), 1)
+        self.assertEqual(root.depth_down(), 100000)
+        self.assertEqual(node.depth(), 99999)
+        self.assertIs(node.root(), root)
+        self.assertEqual(len(node.lineage()), 100000)
+
+
 if __name__ == '__main__':
     unittest_main()
@@ -0,0 +1,91 @@
+# unit tests for the vcgutils module
+# copyright 2003-2012 LOGILAB S.A. (Paris, FRANCE), all rights reserved.
+# contact http://www.logilab.fr/ -- mailto:contact@logilab.fr
+#
+# This file is part of logilab-common.
+#
+# logilab-common is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation, either version 2.1 of the License, or (at your option) any
+# later version.
+#
+# logilab-common is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with logilab-common.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+
+from six.moves import StringIO
+
+from logilab.common.testlib import TestCase, unittest_main
+from logilab.common.vcgutils import VCGPrinter
+
+
+class VCGPrinterTC(TestCase):
+
+    def setUp(self):
+        self.stream = StringIO()
+        self.printer = VCGPrinter(self.stream)
+
+    def test_graph(self):
+        printer = self.printer
+        printer.open_graph(title='graph')
+        printer.node('a', label='A')
+        printer.node('b', width=10.0)
+        printer.edge('a', 'b', 'back', thickness=True)
+        # output is buffered until a graph is closed
+        self.assertEqual(self.stream.getvalue(), '')
+        printer.open_graph(title='sub')
+        printer.node('c')
+        printer.close_graph()
+        self.assertTrue(self.stream.getvalue().endswith(
+            '    node: {title:"c"}\n  }\n'))
+        printer.close_graph()
+        self.assertMultiLineEqual(self.stream.getvalue(), '''\
+graph:{
+  title:"graph"
+  node: {title:"a"  label:"A"
+}
+  node: {title:"b"  width:10
+}
+  backedge: {sourcename:"a" targetname:"b"  thickness:"True"
+}
+  graph:{
+    title:"sub"
+    node: {title:"c"}
+  }
+}
+''')
+
+    def test_attributes_order(self):
+        if sys.version_info < (3, 6):
+            self.skipTest('keyword arguments order is not kept')
+        self.printer.node('a', width=10, label='A')
+        self.assertEqual(self.stream.getvalue(),
+                         'node: {title:"a"width:10\nlabel:"A"\n}\n')
+
+    def test_flush(self):
+        self.printer.open_graph()
+        self.printer.node('a')
+        self.printer.flush()
+        self.assertEqual(self.stream.getvalue(), 'graph:{\n  node: {title:"a"}\n')
+
+    def test_unhashable_values(self):
+        # nodes and edges drawn outside of any graph are written at once
+        self.printer.node(['a'], label=['A'])
+        self.assertEqual(self.stream.getvalue(),
+                         'node: {title:"[\'a\']"label:"[\'A\']"\n}\n')
+
+    def test_bad_attributes(self):
+        self.assertRaises(Exception, self.printer.node, 'a', bad='value')
+        self.assertRaises(Exception, self.printer.edge, 'a', 'b',
+                          linestyle='bad')
+        self.assertRaises(ValueError, self.printer.node, 'a', width='bad')
+
+
+if __name__ == '__main__':
+    unittest_main()